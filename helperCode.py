@@ -40,3 +40,40 @@ class Ball:
         self.rect.y = self.startYpos
         self.xVel = -5 if nowGoing == "left" else 5
         self.yVel = 0
+
+# Moves a paddle one frame in the direction it is moving, stopping it at the walls
+def movePaddle(paddle:Paddle, screenHeight:int) -> None:
+    if paddle.moving == "down":
+        if paddle.rect.bottomleft[1] < screenHeight-10:
+            paddle.rect.y += paddle.speed
+    elif paddle.moving == "up":
+        if paddle.rect.topleft[1] > 10:
+            paddle.rect.y -= paddle.speed
+
+# Advances the ball one frame, resetting it when it leaves the screen and bouncing it off the paddles and walls.
+# Returns what happened in order: "left" / "right" when that side scored a point, "bounce" for every hit
+def stepBall(ball:Ball, leftPaddle:Paddle, rightPaddle:Paddle, topWall:pygame.Rect, bottomWall:pygame.Rect, screenWidth:int) -> list[str]:
+    events = []
+    ball.updatePos()
+
+    # If the ball makes it past the edge of the screen, update score, etc.
+    if ball.rect.x > screenWidth:
+        events.append("left")
+        ball.reset(nowGoing="left")
+    elif ball.rect.x < 0:
+        events.append("right")
+        ball.reset(nowGoing="right")
+
+    # If the ball hits a paddle
+    if ball.rect.colliderect(leftPaddle.rect):
+        events.append("bounce")
+        ball.hitPaddle(leftPaddle.rect.center[1])
+    elif ball.rect.colliderect(rightPaddle.rect):
+        events.append("bounce")
+        ball.hitPaddle(rightPaddle.rect.center[1])
+
+    # If the ball hits a wall
+    if ball.rect.colliderect(topWall) or ball.rect.colliderect(bottomWall):
+        events.append("bounce")
+        ball.hitWall()
+    return events
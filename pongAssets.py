@@ -0,0 +1,117 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Loads what the game window needs (pygame itself, the fonts and the sounds) on a
+#                           background thread, started while the connect screen is still up, so clicking Join
+#                           goes straight to the first frame instead of waiting for pygame to import and the
+#                           audio to start and decode.
+# Misc:                     With a cache directory the sounds are kept there already converted to the mixer's
+#                           format, named after the source file's size and change time and the mixer format so a
+#                           changed file or mixer never uses a stale copy.
+# =================================================================================================
+
+import importlib
+import os
+import threading
+import time
+
+# Same mixer settings playGame always used: 44.1 kHz, 16 bit, stereo, 2048 sample buffer
+MIXER_SETTINGS = (44100, -16, 2, 2048)
+FONTS = {
+    "score": ("./assets/fonts/pong-score.ttf", 32),
+    "win": ("./assets/fonts/visitor.ttf", 48),
+    "status": ("./assets/fonts/visitor.ttf", 20),
+}
+SOUNDS = {
+    "point": "./assets/sounds/point.wav",
+    "bounce": "./assets/sounds/bounce.wav",
+}
+
+# What the game window draws and plays with
+class Assets:
+    def __init__(self, fonts:dict, sounds:dict, loadTime:float) -> None:
+        self.fonts = fonts
+        self.sounds = sounds
+        # seconds the loading took, on whichever thread did it
+        self.loadTime = loadTime
+
+class AssetLoader:
+    def __init__(self, cacheDir:str | None = None, modules:tuple = ()) -> None:
+        self.cacheDir = cacheDir
+        # modules the game window imports, imported here too so it finds them ready
+        self.modules = modules
+        self.thread = None
+        self.assets = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    # Starts loading in the background, does nothing if it already started
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._load, daemon=True)
+                self.thread.start()
+
+    # The assets, waiting for the background load to finish (or starting it first if nobody did).  An error
+    # loading them (no audio device, a missing file) is raised here, the same as loading them in place would
+    def wait(self) -> Assets:
+        self.start()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.assets
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        try:
+            import pygame
+            pygame.mixer.pre_init(*MIXER_SETTINGS)
+            pygame.font.init()
+            pygame.mixer.init()
+            fonts = {name: pygame.font.Font(path, size) for name, (path, size) in FONTS.items()}
+            sounds = {name: self._loadSound(pygame, path) for name, path in SOUNDS.items()}
+            for module in self.modules:
+                importlib.import_module(module)
+            self.assets = Assets(fonts, sounds, time.perf_counter() - started)
+        except Exception as e:
+            self.error = e
+
+    # A sound from the cache if it has this file in the mixer's format, decoded (and cached) otherwise
+    def _loadSound(self, pygame, path:str):
+        if self.cacheDir is None:
+            return pygame.mixer.Sound(path)
+        info = os.stat(path)
+        frequency, sampleFormat, channels = pygame.mixer.get_init()
+        name = os.path.splitext(os.path.basename(path))[0]
+        cached = os.path.join(self.cacheDir,
+                              f"{name}-{info.st_size}-{info.st_mtime_ns}-{frequency}-{sampleFormat}-{channels}.pcm")
+        try:
+            with open(cached, "rb") as file:
+                return pygame.mixer.Sound(buffer=file.read())
+        except OSError:
+            pass
+        sound = pygame.mixer.Sound(path)
+        try:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            # written under another name first so a half written file is never read
+            partial = f"{cached}.{os.getpid()}"
+            with open(partial, "wb") as file:
+                file.write(sound.get_raw())
+            os.replace(partial, cached)
+        except OSError as e:
+            print(f"Couldn't cache {path} in {self.cacheDir}: {e}")
+        return sound
+
+# The client's one loader, shared by the connect screen (which starts it) and the game window (which waits on it)
+loader = None
+
+def preload(cacheDir:str | None = None, modules:tuple = ()) -> AssetLoader:
+    global loader
+    if loader is None:
+        loader = AssetLoader(cacheDir, modules)
+    loader.start()
+    return loader
+
+def loadAssets(cacheDir:str | None = None) -> Assets:
+    return preload(cacheDir).wait()
@@ -0,0 +1,170 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Runs many matches at once with NumPy: every position and velocity is an array
+#                           with one entry per match and a tick is a handful of array operations, so
+#                           thousands of matches (bots, load tests, rooms) cost about as much per call as one.
+# Misc:                     Needs numpy (pip3 install numpy), nothing else in the game does.
+#                           `python3 pongBatch.py --check` steps random matches here, through pongPhysics.step
+#                           and through helperCode's pygame objects, and fails unless all three agree.
+# =================================================================================================
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from pongPhysics import (BALL_SIZE, BALL_SPEED, PADDLE_H, PADDLE_SPEED, PADDLE_W, SCREEN_H, SCREEN_W, WALL,
+                         PhysicsState, start_state, step)
+
+#a batch of matches on the same screen size, each row of state() is one pongPhysics.PhysicsState
+class BatchSimulation:
+    def __init__(self, count: int, width: int = SCREEN_W, height: int = SCREEN_H) -> None:
+        self.count = count
+        self.width = width
+        self.height = height
+        start = start_state(width, height)
+        #p1_y, p2_y, ball_x, ball_y, ball_xvel, ball_yvel
+        self.fields = [np.full(count, value, dtype=np.int32) for value in start]
+        self.l_score = np.zeros(count, dtype=np.int32)
+        self.r_score = np.zeros(count, dtype=np.int32)
+
+    #the matches as an array of shape (count, 6) in PhysicsState field order
+    def state(self) -> np.ndarray:
+        return np.stack(self.fields, axis=1)
+
+    #one match as a PhysicsState
+    def match(self, index: int) -> PhysicsState:
+        return PhysicsState(*(int(field[index]) for field in self.fields))
+
+    #puts the matches picked by mask (all of them by default) back to the start of a game
+    def reset(self, mask: np.ndarray | None = None) -> None:
+        if mask is None:
+            mask = np.ones(self.count, dtype=bool)
+        for field, value in zip(self.fields, start_state(self.width, self.height)):
+            field[mask] = value
+        self.l_score[mask] = 0
+        self.r_score[mask] = 0
+
+    #advances every match one tick, p1_dir and p2_dir are arrays (or single values) of -1 up, 0, 1 down
+    #returns boolean arrays of which matches the left side scored in, the right side scored in and had a bounce
+    def step(self, p1_dir, p2_dir) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        p1_y, p2_y, x, y, xvel, yvel = self.fields
+        width, height = self.width, self.height
+        for paddle_y, direction in ((p1_y, p1_dir), (p2_y, p2_dir)):
+            direction = np.asarray(direction)
+            paddle_y += np.where((direction > 0) & (paddle_y + PADDLE_H < height - WALL), PADDLE_SPEED, 0)
+            paddle_y -= np.where((direction < 0) & (paddle_y > WALL), PADDLE_SPEED, 0)
+        x += xvel
+        y += yvel
+
+        left = x > width
+        right = ~left & (x < 0)
+        scored = left | right
+        x[scored] = width // 2
+        y[scored] = height // 2
+        xvel[scored] = np.where(left[scored], -BALL_SPEED, BALL_SPEED)
+        yvel[scored] = 0
+
+        #same overlap test as pongPhysics.overlaps, for the ball against each paddle and wall
+        ball_rows = (y < p1_y + PADDLE_H) & (p1_y < y + BALL_SIZE)
+        hit_left = (x < 10 + PADDLE_W) & (10 < x + BALL_SIZE) & ball_rows
+        ball_rows = (y < p2_y + PADDLE_H) & (p2_y < y + BALL_SIZE)
+        hit_right = ~hit_left & (x < width - 20 + PADDLE_W) & (width - 20 < x + BALL_SIZE) & ball_rows
+        hit = hit_left | hit_right
+        paddle_center = np.where(hit_left, p1_y, p2_y) + PADDLE_H // 2
+        xvel[hit] = -xvel[hit]
+        yvel[hit] = ((y + BALL_SIZE // 2 - paddle_center) // 2)[hit]
+
+        #the walls span the whole width plus WALL either side, only the rows matter for a ball on screen
+        across = (x < width + WALL) & (-WALL < x + BALL_SIZE)
+        wall = across & ((y < WALL) | (y + BALL_SIZE > height - WALL))
+        yvel[wall] = -yvel[wall]
+
+        self.l_score += left
+        self.r_score += right
+        return left, right, hit | wall
+
+#steps random matches through all three implementations and reports the first tick where they disagree
+def check(matches: int, ticks: int, seed: int) -> bool:
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from assets.code.helperCode import Ball, Paddle, movePaddle, stepBall
+
+    rng = random.Random(seed)
+    batch = BatchSimulation(matches)
+    scalar = [start_state() for _ in range(matches)]
+    objects = []
+    for _ in range(matches):
+        start = start_state()
+        objects.append((Paddle(pygame.Rect(10, start.p1_y, PADDLE_W, PADDLE_H)),
+                        Paddle(pygame.Rect(SCREEN_W - 20, start.p2_y, PADDLE_W, PADDLE_H)),
+                        Ball(pygame.Rect(start.ball_x, start.ball_y, BALL_SIZE, BALL_SIZE), -BALL_SPEED, 0)))
+    top_wall = pygame.Rect(-WALL, 0, SCREEN_W + 2 * WALL, WALL)
+    bottom_wall = pygame.Rect(-WALL, SCREEN_H - WALL, SCREEN_W + 2 * WALL, WALL)
+    names = {-1: "up", 0: "", 1: "down"}
+    #inputs are held for a while like a player would, and every other match follows the ball so plenty of
+    #paddle hits get checked too
+    dirs = np.array([[rng.choice((-1, 0, 1)) for _ in range(2)] for _ in range(matches)])
+    points = bounces = 0
+
+    for tick in range(1, ticks + 1):
+        for i in range(matches):
+            if i % 2:
+                state = scalar[i]
+                dirs[i] = [np.sign(state.ball_y - paddle_y - PADDLE_H // 2) if rng.random() < 0.9 else 0
+                           for paddle_y in (state.p1_y, state.p2_y)]
+            elif rng.random() < 0.05:
+                dirs[i] = (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+        left, right, bounced = batch.step(dirs[:, 0], dirs[:, 1])
+        points += int(left.sum() + right.sum())
+        bounces += int(bounced.sum())
+        for i in range(matches):
+            p1, p2 = int(dirs[i, 0]), int(dirs[i, 1])
+            scalar[i], events = step(scalar[i], p1, p2)
+            leftPaddle, rightPaddle, ball = objects[i]
+            leftPaddle.moving, rightPaddle.moving = names[p1], names[p2]
+            movePaddle(leftPaddle, SCREEN_H)
+            movePaddle(rightPaddle, SCREEN_H)
+            pygame_events = stepBall(ball, leftPaddle, rightPaddle, top_wall, bottom_wall, SCREEN_W)
+            pygame_state = PhysicsState(leftPaddle.rect.y, rightPaddle.rect.y, ball.rect.x, ball.rect.y,
+                                        ball.xVel, ball.yVel)
+            if not (batch.match(i) == scalar[i] == pygame_state) or events != pygame_events \
+                    or bool(left[i]) != ("left" in events) or bool(right[i]) != ("right" in events) \
+                    or bool(bounced[i]) != ("bounce" in events):
+                print(f"Mismatch in match {i} at tick {tick}:\n  batch   {batch.match(i)}\n  physics {scalar[i]} "
+                      f"{events}\n  pygame  {pygame_state} {pygame_events}")
+                return False
+    print(f"{matches} matches agree for {ticks} ticks ({points} points, {bounces} ticks with a bounce)")
+    return True
+
+#ticks per second for a batch of the given size
+def benchmark(matches: int, ticks: int) -> None:
+    batch = BatchSimulation(matches)
+    dirs = np.random.default_rng(0).integers(-1, 2, size=(ticks, 2, matches))
+    started = time.perf_counter()
+    for tick in range(ticks):
+        batch.step(dirs[tick, 0], dirs[tick, 1])
+    elapsed = time.perf_counter() - started
+    print(f"{matches} matches x {ticks} ticks: {elapsed / ticks * 1e6:.0f} us per tick, "
+          f"{matches * ticks / elapsed:,.0f} match ticks per second")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch Pong simulation")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the batch, pongPhysics and helperCode implementations on random matches")
+    parser.add_argument("--matches", type=int, default=None,
+                        help="matches to run at once (default 200 for --check, 10000 otherwise)")
+    parser.add_argument("--ticks", type=int, default=3000, help="ticks to run")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for --check")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check(args.matches or 200, args.ticks, args.seed) else 1)
+    benchmark(args.matches or 10000, args.ticks)
+
+if __name__ == "__main__":
+    main()
@@ -8,39 +8,75 @@
 # Misc:                     <Not Required.  Anything else you might want to include>
 # =================================================================================================
 
-import pygame
+import argparse
 import tkinter as tk
 import sys
 import socket
+import time
 
-from assets.code.helperCode import *
+from pongAssets import loadAssets, preload
+from pongInterp import InterpolationBuffer, PaddleReconciler
+from pongNet import ServerLink
+from pongProfiler import FrameProfiler, NullProfiler
+from pongProtocol import BINARY_PROTOCOL, MessageReader, choose_protocol, encode_control, encode_input, encode_update, parse_options
+from pongReplay import Playback, Recording
+
+# What the game window imports besides pygame, loaded in the background with the assets
+GAME_MODULES = ("assets.code.helperCode", "pongLockstep", "pongRender")
+
+# How long to keep trying to get back into a game after the connection drops (the server keeps the slot 10 s)
+RESUME_TIMEOUT = 10.0
+
+# The paddles and ball move this many steps a second whatever --fps draws at, the speed the game always had at
+# 60 fps.  After a stall at most MAX_CATCH_UP steps are run at once, the rest of the time is skipped
+PHYSICS_RATE = 60
+MAX_CATCH_UP = 5
 
 # This is the main game loop.  For the most part, you will not need to modify this.  The sections
 # where you should add to the code are marked.  Feel free to change any part of this project
 # to suit your needs.
-def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.socket) -> None:
-    
+def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.socket, welcome:dict[str, str] | None = None,
+             reader:MessageReader | None = None, settings:argparse.Namespace | None = None,
+             joinedAt:float | None = None) -> None:
+    if settings is None:
+        settings = parseArgs([])
+
+    # pygame, the fonts and the sounds were loaded in the background while the connect screen was up
+    gameAssets = loadAssets(settings.asset_cache)
+    import pygame
+    from assets.code.helperCode import Ball, Paddle, movePaddle, stepBall
+    from pongLockstep import LOCKSTEP_MESSAGES, LockstepGame
+    from pongRender import FieldRenderer
+
     # Pygame inits
-    pygame.mixer.pre_init(44100, -16, 2, 2048)
     pygame.init()
 
     # Constants
     WHITE = (255,255,255)
     clock = pygame.time.Clock()
-    scoreFont = pygame.font.Font("./assets/fonts/pong-score.ttf", 32)
-    winFont = pygame.font.Font("./assets/fonts/visitor.ttf", 48)
-    pointSound = pygame.mixer.Sound("./assets/sounds/point.wav")
-    bounceSound = pygame.mixer.Sound("./assets/sounds/bounce.wav")
+    scoreFont = gameAssets.fonts["score"]
+    winFont = gameAssets.fonts["win"]
+    pointSound = gameAssets.sounds["point"]
+    bounceSound = gameAssets.sounds["bounce"]
 
     # Display objects
     screen = pygame.display.set_mode((screenWidth, screenHeight))
-    winMessage = pygame.Rect(0,0,0,0)
     topWall = pygame.Rect(-10,0,screenWidth+20, 10)
     bottomWall = pygame.Rect(-10, screenHeight-10, screenWidth+20, 10)
     centerLine = []
     for i in range(0, screenHeight, 10):
         centerLine.append(pygame.Rect((screenWidth/2)-5,i,5,5))
 
+    spectator = (playerPaddle == "spectator")
+    # The walls and center line are drawn once, each frame only redraws what moves (see pongRender.py)
+    renderer = FieldRenderer(screen, centerLine + ([] if spectator else [topWall, bottomWall]), WHITE,
+                             settings.render == "dirty")
+    # Frame timings for --profile, a profiler that does nothing otherwise
+    if settings.profile is not None:
+        profiler = FrameProfiler(gameAssets.fonts["status"], settings.profile or None)
+    else:
+        profiler = NullProfiler()
+
     # Paddle properties and init
     paddleHeight = 50
     paddleWidth = 10
@@ -50,7 +86,31 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
 
     ball = Ball(pygame.Rect(screenWidth/2, screenHeight/2, 5, 5), -5, 0)
 
-    spectator = (playerPaddle == "spectator")
+    # When the server simulates the game we only send our paddle direction and draw the ball it sends back
+    serverSim = (welcome or {}).get("sim") == "server"
+    # Anything the server sent after the handshake is already waiting in the reader
+    if reader is None:
+        reader = MessageReader()
+    binary = reader.binary
+    # Socket reads and writes happen on the link's own threads, the loop below only polls it
+    udpToken = (welcome or {}).get("udp") if binary else None
+    link = ServerLink(client, reader, udpToken, settings.udp_loss, settings.udp_latency / 1000)
+    link.start()
+    sentMoving = ""
+    lastBallStep = (0, 0)
+    # Remote paddles and the ball are drawn slightly in the past so updates can be smoothed between
+    remote = InterpolationBuffer(int((welcome or {}).get("rate", 60)), not settings.no_interp)
+    ownPaddle = PaddleReconciler()
+    # In lockstep the server sends the inputs of every tick and we run the simulation ourselves
+    lockstep = (welcome or {}).get("lockstep") == "1"
+    lockstepGame = LockstepGame(leftPaddle, rightPaddle, ball, topWall, bottomWall, screenWidth, screenHeight,
+                                lambda: link.send(encode_control("RESYNC", binary)),
+                                (welcome or {}).get("physics") == "swept", int((welcome or {}).get("speed", 1)))
+    # Players get a session from the server, if the connection drops we reconnect and take our paddle back
+    session = (welcome or {}).get("session")
+    serverAddress = client.getpeername()
+    resumeDeadline = None
+    nextResume = 0.0
 
     if spectator:
         opponentPaddleObj = None
@@ -66,19 +126,32 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
     rScore = 0
 
     sync = 0
+    # Sync of the last update we sent, one goes out per physics step rather than per frame
+    sentSync = None
+    # Newest sync the server sent, for the profiler's drift
+    remoteSync = None
+    # Time the physics hasn't caught up with yet, in seconds
+    physicsBehind = 0.0
+    lastPhysics = time.perf_counter()
     game_over = False
     play_again_sent = False
+    # Join was clicked at joinedAt, say how long it took to get the game on screen
+    firstFrame = joinedAt is not None
 
     while True:
-        # Wiping the screen
-        screen.fill((0,0,0))
+        # Wiping what was drawn last frame
+        renderer.begin()
+        profiler.mark("render")
 
         # Getting keypress events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                client.close()
+                link.close()
+                profiler.close()
                 pygame.quit()
                 sys.exit()
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
             if not spectator:
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_DOWN:
@@ -91,13 +164,37 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
                         # send PLAY_AGAIN only once until RESET
                         if not play_again_sent:
                             try:
-                                client.send(b"PLAY_AGAIN\n")
+                                link.send(encode_control("PLAY_AGAIN", binary))
                                 play_again_sent = True
                             except Exception:
                                 pass
 
                 elif event.type == pygame.KEYUP:
                     playerPaddleObj.moving = ""
+        profiler.mark("events")
+
+        # Try once a second to resume a dropped connection until RESUME_TIMEOUT runs out
+        if link.closed and session is not None and time.monotonic() >= nextResume:
+            if resumeDeadline is None:
+                print("Lost the connection to the server, trying to resume")
+                resumeDeadline = time.monotonic() + RESUME_TIMEOUT
+            resumed = resumeSession(serverAddress, session, settings)
+            nextResume = time.monotonic() + 1.0
+            if resumed is not None:
+                client, reader, welcome = resumed
+                binary = reader.binary
+                udpToken = welcome.get("udp") if binary else None
+                link.close()
+                link = ServerLink(client, reader, udpToken, settings.udp_loss, settings.udp_latency / 1000)
+                link.start()
+                remote.reset()
+                ownPaddle.reset()
+                sentMoving = ""
+                resumeDeadline = None
+                print("Resumed the game")
+            elif time.monotonic() >= resumeDeadline:
+                print("Couldn't resume the game")
+                session = None
 
         # =========================================================================================
         # Your code here to send an update to the server on your paddle's information,
@@ -107,19 +204,21 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
             #send data to server
             if spectator:
                 pass
-            else:
+            elif serverSim:
+                # only tell the server when the paddle starts or stops moving
+                if playerPaddleObj.moving != sentMoving:
+                    sentMoving = playerPaddleObj.moving
+                    link.send(encode_input(sentMoving, sync, binary))
+            elif sync != sentSync:
                 # players continue sending their frames even if game_over; server will ignore scoring changes once game_over is set
-                message = f"{playerPaddleObj.rect.y} {ball.rect.x} {ball.rect.y} {lScore} {rScore} {sync}\n"
-                client.send(message.encode())
-
-            #recieve from server
-            client.settimeout(0.016)
-            try:
-                data=client.recv(4096)
-                if data:
-                    #goes through opponents data
-                    parts = data.decode().strip().split()
-
+                sentSync = sync
+                link.sendState(encode_update(playerPaddleObj.rect.y, ball.rect.x, ball.rect.y, lScore, rScore, sync, binary))
+
+            #goes through every message the server has sent since last frame, only the newest state update is applied
+            messages = link.poll()
+            profiler.received(len(messages))
+            for parts in messages:
+                try:
                     # handle server control messages first
                     if parts[0] == "GAME_OVER":
                         game_over = True
@@ -128,6 +227,8 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
                         continue
                     elif parts[0] == "RESET":
                         # server reset — reset local state
+                        remote.reset()
+                        ownPaddle.reset()
                         lScore = 0
                         rScore = 0
                         sync = 0
@@ -137,66 +238,145 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
                         ball.reset(nowGoing="left")
                         leftPaddle.rect.y = (screenHeight//2)-(paddleHeight//2)
                         rightPaddle.rect.y = (screenHeight//2)-(paddleHeight//2)
+                        lockstepGame.reset()
+                        continue
+                    elif parts[0] == "RATE":
+                        # the server changed how often it sends us states
+                        remote.setUpdateRate(int(parts[1]))
+                        continue
+                    elif lockstep and parts[0] in LOCKSTEP_MESSAGES:
+                        for event in lockstepGame.handle(parts):
+                            if event in ("left", "right"):
+                                pointSound.play()
+                            else:
+                                bounceSound.play()
+                        lScore, rScore = lockstepGame.lScore, lockstepGame.rScore
+                        sync = lockstepGame.tick
+                        remoteSync = sync
                         continue
 
                     # SPECTATOR update format (7 values):
                     # p1Y p2Y ballX ballY lScore rScore sync
                     if spectator and len(parts) >= 7:
-                        leftPaddle.rect.y = int(parts[0])
-                        rightPaddle.rect.y = int(parts[1])
-                        ball.rect.x = int(parts[2])
-                        ball.rect.y = int(parts[3])
-                        lScore = int(parts[4])
-                        rScore = int(parts[5])
                         sync = int(parts[6])
+                        remoteSync = sync
+                        remote.add(sync, tuple(int(value) for value in parts[:6]))
 
                     # PLAYER update format (6 values)
                     elif not spectator and len(parts) >= 6:
-                        opponentPaddleObj.rect.y = int(parts[0])
-
-                        if playerPaddle == "right":
-                            ball.rect.x = int(parts[1])
-                            ball.rect.y = int(parts[2])
-                            lScore = int(parts[3])
-                            rScore = int(parts[4])
+                        # binary state frames carry both paddles, drop our own
+                        ownY = None
+                        if len(parts) >= 7:
+                            ownY = int(parts[0] if playerPaddle == "left" else parts[1])
+                            parts = parts[1:] if playerPaddle == "left" else parts[:1] + parts[2:]
 
                         opponent_sync = int(parts[5])
+                        remoteSync = opponent_sync
+                        # only the opponent's paddle is remote, plus the ball and score unless we run them
+                        opponentY = int(parts[0])
+                        if playerPaddle == "right" or serverSim:
+                            ballAndScore = tuple(int(value) for value in parts[1:5])
+                        else:
+                            ballAndScore = (None, None, None, None)
+                        paddles = (None, opponentY) if playerPaddle == "left" else (opponentY, None)
+                        remote.add(opponent_sync, paddles + ballAndScore)
+                        if ownY is not None and serverSim:
+                            ownPaddle.serverUpdate(opponent_sync, ownY)
+
                         if opponent_sync > sync:
                             sync = opponent_sync
 
-            except socket.timeout:
-                pass
-            except (ValueError, IndexError):
-                pass
+                except (ValueError, IndexError):
+                    pass
 
         except Exception as e:
             print(f"Error with communication: {e}")
+        profiler.mark("network")
+
+        # Move everything the server controls to where it was a moment ago, between the updates around then
+        view = remote.sample()
+        if view is not None:
+            p1Y, p2Y, ballX, ballY, newL, newR = view
+            if p1Y is not None:
+                leftPaddle.rect.y = p1Y
+            if p2Y is not None:
+                rightPaddle.rect.y = p2Y
+            if ballX is not None:
+                if serverSim:
+                    # no local collisions to play sounds for, a new score is a point and the
+                    # ball changing direction is a bounce
+                    ballStep = (ballX - ball.rect.x, ballY - ball.rect.y)
+                    if (lScore, rScore) != (newL, newR):
+                        pointSound.play()
+                    elif ballStep[0] * lastBallStep[0] < 0 or ballStep[1] * lastBallStep[1] < 0:
+                        bounceSound.play()
+                    if ballStep != (0, 0):
+                        lastBallStep = ballStep
+                ball.rect.x = ballX
+                ball.rect.y = ballY
+                lScore, rScore = newL, newR
+
+        # Physics steps due since the last frame.  A step is taken once at least half of it is due, so at 60 fps
+        # every frame gets exactly one even though frames are never exactly 1/60 s apart
+        now = time.perf_counter()
+        physicsBehind = min(physicsBehind + now - lastPhysics, MAX_CATCH_UP / PHYSICS_RATE)
+        lastPhysics = now
+        steps = 0
+        while physicsBehind > 0.5 / PHYSICS_RATE:
+            physicsBehind -= 1 / PHYSICS_RATE
+            steps += 1
+
+        if playerPaddleObj is not None:
+            for _ in range(steps):
+                ownPaddle.correct(playerPaddleObj)
 
         
         # =========================================================================================
         # spectator logic ends here — spectators do not simulate physics
         if spectator:
-            # Draw center line
-            for i in centerLine:
-                pygame.draw.rect(screen, WHITE, i)
+            profiler.mark("physics")
+            renderer.rect(leftPaddle.rect)
+            renderer.rect(rightPaddle.rect)
+            renderer.rect(ball.rect)
+
+            renderer.score(lScore, rScore, scoreFont)
+            profiler.draw(renderer)
+            renderer.present()
+            profiler.mark("render")
+            if firstFrame:
+                firstFrame = False
+                reportFirstFrame(joinedAt, gameAssets)
+            clock.tick(settings.fps)
+            profiler.mark("tick")
+            profiler.endFrame(sync, remoteSync)
+            continue
 
-            pygame.draw.rect(screen, WHITE, leftPaddle)
-            pygame.draw.rect(screen, WHITE, rightPaddle)
-            pygame.draw.rect(screen, WHITE, ball)
+        for _ in range(steps):
+            # Update the player paddle and opponent paddle's location on the screen (lockstep moves them per tick)
+            if not lockstep:
+                for paddle in [playerPaddleObj, opponentPaddleObj]:
+                    movePaddle(paddle, screenHeight)
 
-            updateScore(lScore, rScore, screen, WHITE, scoreFont)
-            pygame.display.flip()
-            clock.tick(60)
-            continue
+            # ==== Ball Logic =====================================================================
+            if playerPaddle == "left" and not serverSim and lScore <= 4 and rScore <= 4:
+                for event in stepBall(ball, leftPaddle, rightPaddle, topWall, bottomWall, screenWidth):
+                    # If the ball makes it past the edge of the screen, update score, etc.
+                    if event == "left":
+                        lScore += 1
+                        pointSound.play()
+                    elif event == "right":
+                        rScore += 1
+                        pointSound.play()
+                    # If the ball hits a paddle or a wall
+                    else:
+                        bounceSound.play()
+            # ==== End Ball Logic =================================================================
 
-        # Update the player paddle and opponent paddle's location on the screen
-        for paddle in [playerPaddleObj, opponentPaddleObj]:
-            if paddle.moving == "down":
-                if paddle.rect.bottomleft[1] < screenHeight-10:
-                    paddle.rect.y += paddle.speed
-            elif paddle.moving == "up":
-                if paddle.rect.topleft[1] > 10:
-                    paddle.rect.y -= paddle.speed
+            # This number should be synchronized between you and your opponent.  If your number is larger
+            # then you are ahead of them in time, if theirs is larger, they are ahead of you, and you need to
+            # catch up (use their info)
+            sync += 1
+        profiler.mark("physics")
 
         # If the game is over, display the win message
         if lScore > 4 or rScore > 4:
@@ -204,68 +384,29 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
             winText = "Player 1 Wins! " if lScore > 4 else "Player 2 Wins! "
 
             # WIN TEXT
-            textSurface = winFont.render(winText, True, WHITE)
-            textRect = textSurface.get_rect()
-            textRect.center = (screenWidth/2, screenHeight/2)
-            screen.blit(textSurface, textRect)
+            renderer.text("win", winFont, winText, (screenWidth/2, screenHeight/2))
 
             # HINT TEXT
-            hint = winFont.render("Press R to play again", True, WHITE)
-            hintrect = hint.get_rect()
-            hintrect.center = (screenWidth/2, (screenHeight/2)+40)
-            screen.blit(hint, hintrect)
+            renderer.text("hint", winFont, "Press R to play again", (screenWidth/2, (screenHeight/2)+40))
 
         else:
+            renderer.rect(ball.rect)
 
-            # ==== Ball Logic =====================================================================
-            if playerPaddle == "left":
-                ball.updatePos()
-
-            # If the ball makes it past the edge of the screen, update score, etc.
-                if ball.rect.x > screenWidth:
-                    lScore += 1
-                    pointSound.play()
-                    ball.reset(nowGoing="left")
-                elif ball.rect.x < 0:
-                    rScore += 1
-                    pointSound.play()
-                    ball.reset(nowGoing="right")
-                
-                # If the ball hits a paddle
-                if ball.rect.colliderect(playerPaddleObj.rect):
-                    bounceSound.play()
-                    ball.hitPaddle(playerPaddleObj.rect.center[1])
-                elif ball.rect.colliderect(opponentPaddleObj.rect):
-                    bounceSound.play()
-                    ball.hitPaddle(opponentPaddleObj.rect.center[1])
-                
-                # If the ball hits a wall
-                if ball.rect.colliderect(topWall) or ball.rect.colliderect(bottomWall):
-                    bounceSound.play()
-                    ball.hitWall()
-            
-            pygame.draw.rect(screen, WHITE, ball)
-            # ==== End Ball Logic =================================================================
-
-        # Drawing the dotted line in the center
-        for i in centerLine:
-            pygame.draw.rect(screen, WHITE, i)
-        
-        # Drawing the player's new location
+        # Drawing the player's new location (the center line and walls are in the renderer's background)
         for paddle in [playerPaddleObj, opponentPaddleObj]:
-            pygame.draw.rect(screen, WHITE, paddle)
-
-        pygame.draw.rect(screen, WHITE, topWall)
-        pygame.draw.rect(screen, WHITE, bottomWall)
-        scoreRect = updateScore(lScore, rScore, screen, WHITE, scoreFont)
-        #pygame.display.update([topWall, bottomWall, ball, leftPaddle, rightPaddle, scoreRect, winMessage])
-        pygame.display.flip()
-        clock.tick(60)
+            renderer.rect(paddle.rect)
+
+        renderer.score(lScore, rScore, scoreFont)
+        profiler.draw(renderer)
+        renderer.present()
+        profiler.mark("render")
+        if firstFrame:
+            firstFrame = False
+            reportFirstFrame(joinedAt, gameAssets)
+        clock.tick(settings.fps)
+        profiler.mark("tick")
+        profiler.endFrame(sync, remoteSync)
         
-        # This number should be synchronized between you and your opponent.  If your number is larger
-        # then you are ahead of them in time, if theirs is larger, they are ahead of you, and you need to
-        # catch up (use their info)
-        sync += 1
         # =========================================================================================
         # Send your server update here at the end of the game loop to sync your game with your
         # opponent's game
@@ -275,17 +416,165 @@ def playGame(screenWidth:int, screenHeight:int, playerPaddle:str, client:socket.
 
 
 
+# Plays a recording made by the server's --record option instead of joining a server.  Left and right seek
+# 5 seconds, up and down double or halve the speed, space pauses and Home starts over.  A recording that is
+# still being written keeps growing while it plays.
+def playReplay(path:str, settings:argparse.Namespace) -> None:
+    recording = Recording(path)
+    playback = Playback(recording, settings.speed)
+
+    gameAssets = loadAssets(settings.asset_cache)
+    import pygame
+    from pongRender import FieldRenderer
+
+    pygame.init()
+    WHITE = (255,255,255)
+    clock = pygame.time.Clock()
+    scoreFont = gameAssets.fonts["score"]
+    statusFont = gameAssets.fonts["status"]
+
+    screenWidth, screenHeight = recording.width, recording.height
+    screen = pygame.display.set_mode((screenWidth, screenHeight))
+    pygame.display.set_caption(f"Replay: {path}")
+    topWall = pygame.Rect(-10,0,screenWidth+20, 10)
+    bottomWall = pygame.Rect(-10, screenHeight-10, screenWidth+20, 10)
+    centerLine = []
+    for i in range(0, screenHeight, 10):
+        centerLine.append(pygame.Rect((screenWidth/2)-5,i,5,5))
+    renderer = FieldRenderer(screen, centerLine + [topWall, bottomWall], WHITE, settings.render == "dirty")
+    leftPaddle = pygame.Rect(10, 0, 10, 50)
+    rightPaddle = pygame.Rect(screenWidth-20, 0, 10, 50)
+    ball = pygame.Rect(0, 0, 5, 5)
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                recording.close()
+                pygame.quit()
+                sys.exit()
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    playback.seek(playback.now() - 5)
+                elif event.key == pygame.K_RIGHT:
+                    playback.seek(playback.now() + 5)
+                elif event.key == pygame.K_UP:
+                    playback.set_speed(min(playback.speed * 2, 64))
+                elif event.key == pygame.K_DOWN:
+                    playback.set_speed(max(playback.speed / 2, 1 / 16))
+                elif event.key == pygame.K_SPACE:
+                    playback.toggle_pause()
+                elif event.key == pygame.K_HOME:
+                    playback.seek(0)
+                elif event.key == pygame.K_COMMA:
+                    playback.step(-1)
+                elif event.key == pygame.K_PERIOD:
+                    playback.step(1)
+
+        recording.refresh()
+        renderer.begin()
+        index = playback.current()
+        lScore = rScore = 0
+        if index is not None:
+            leftPaddle.y, rightPaddle.y, ball.x, ball.y, lScore, rScore, _ = recording.state(index)
+            for rect in (leftPaddle, rightPaddle, ball):
+                renderer.rect(rect)
+        renderer.score(lScore, rScore, scoreFont)
+
+        status = f"{min(playback.now(), recording.duration()):6.1f} / {recording.duration():.1f} s   x{playback.speed:g}"
+        if index is not None:
+            status += f"   record {index + 1} / {len(recording)}  tick {recording.tick(index)}"
+        if playback.paused:
+            status += "   paused"
+        renderer.text("status", statusFont, status, (15, screenHeight - 35), topLeft=True)
+        renderer.present()
+        clock.tick(settings.fps)
+
+# Prints how long it took from clicking Join to the first frame being shown
+def reportFirstFrame(joinedAt:float, gameAssets) -> None:
+    print(f"First frame {(time.perf_counter() - joinedAt) * 1000:.0f} ms after Join "
+          f"(loading pygame and the assets took {gameAssets.loadTime * 1000:.0f} ms in the background)")
+
+# Newer servers answer HELLO with a WELCOME line of key=value options describing how the match is run, for
+# example "WELCOME sim=server rate=60 proto=bin2".  Older servers ignore HELLO, so give up after a second and
+# play the original way.  Whatever the server sends after WELCOME is left in reader, switched over to binary
+# frames if the server agreed to them.  Game updates that arrive before WELCOME are dropped, the next one
+# replaces them anyway.
+def requestWelcome(client:socket.socket, reader:MessageReader, timeout:float=1.0, udp:bool=False,
+                   lockstep:bool=False) -> dict[str, str]:
+    # adapt=1: we answer PING and take RATE, so the server can slow our updates down when the link is congested
+    hello = f"HELLO proto={BINARY_PROTOCOL} adapt=1"
+    if udp:
+        # ask for states over UDP, a server that agrees puts a udp=<token> option in WELCOME
+        hello += " udp=1"
+    if lockstep:
+        # ask for tick inputs instead of states, only servers that simulate the game put lockstep=1 in WELCOME
+        hello += " lockstep=1"
+    client.sendall(f"{hello}\n".encode())
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            for parts in reader.messages():
+                if parts[0] == "WELCOME":
+                    welcome = parse_options(parts)
+                    reader.binary = choose_protocol(welcome.get("proto", ""))
+                    return welcome
+            if time.monotonic() >= deadline:
+                break
+            client.settimeout(max(0.001, deadline - time.monotonic()))
+            data = client.recv(4096)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            reader.feed(data)
+    except socket.timeout:
+        pass
+    finally:
+        client.settimeout(None)
+    return {}
+
+# Reconnects to the server after our connection dropped and asks for our paddle back with the session the server
+# gave us in WELCOME.  The server may send other things (a CONFIG for the spot it gave the new connection) before
+# it answers RESUMED or RESUME_FAILED, those are skipped.  Returns the new socket, its reader and the WELCOME
+# options, or None if that didn't work.
+def resumeSession(address:tuple, session:str, settings:argparse.Namespace) -> tuple | None:
+    try:
+        client = socket.create_connection(address, timeout=1.0)
+    except OSError:
+        return None
+    try:
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client.sendall(f"RESUME {session}\n".encode())
+        reader = MessageReader()
+        answer = None
+        while answer is None:
+            data = client.recv(4096)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            reader.feed(data)
+            answer = next((parts for parts in reader.messages() if parts[0] in ("RESUMED", "RESUME_FAILED")), None)
+        if answer[0] != "RESUMED":
+            client.close()
+            return None
+        welcome = requestWelcome(client, reader, udp=settings.udp, lockstep=settings.lockstep)
+        return client, reader, welcome
+    except (OSError, ConnectionError):
+        client.close()
+        return None
+
 # This is where you will connect to the server to get the info required to call the game loop.  Mainly
 # the screen width, height and player paddle (either "left" or "right")
 # If you want to hard code the screen's dimensions into the code, that's fine, but you will need to know
 # which client is which
-def joinServer(ip:str, port:str, errorLabel:tk.Label, app:tk.Tk) -> None:
+def joinServer(ip:str, port:str, errorLabel:tk.Label, app:tk.Tk, settings:argparse.Namespace | None = None) -> None:
     # Purpose:      This method is fired when the join button is clicked
     # Arguments:
     # ip            A string holding the IP address of the server
     # port          A string holding the port the server is using
     # errorLabel    A tk label widget, modify it's text to display messages to the user (example below)
     # app           The tk window object, needed to kill the window
+    # settings      Command line options from parseArgs
+    joinedAt = time.perf_counter()
     if not ip or not port:
         errorLabel.config(text="Please enter both IP and Port")
         errorLabel.update()
@@ -309,17 +598,28 @@ def joinServer(ip:str, port:str, errorLabel:tk.Label, app:tk.Tk) -> None:
 
         #connect to server
         client.connect((ip,port_num))
+        #updates are tiny and sent every frame, don't let Nagle hold one back until the last is acknowledged
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
         errorLabel.config(text="Connected! Waiting for game info")
         errorLabel.update()
 
-        #recieve game config from server
-        data=client.recv(1024).decode().strip()
-
-        if not data.startswith("CONFIG"):
+        #recieve game config from server, anything after it is already game traffic and stays in the reader
+        reader = MessageReader()
+        parts = None
+        while parts is None:
+            data = client.recv(1024)
+            if not data:
+                raise ConnectionError("Server closed the connection")
+            reader.feed(data)
+            #older servers don't end CONFIG with a newline
+            if data.startswith(b"CONFIG") and b"\n" not in data:
+                reader.feed(b"\n")
+            parts = next(reader.messages(), None)
+
+        if parts[0] != "CONFIG":
             raise ValueError("Invalid response from server")
-        
-        parts = data.split()
+
         if len(parts) != 4:
             raise ValueError("CONFIG message is messed up")
 
@@ -327,12 +627,16 @@ def joinServer(ip:str, port:str, errorLabel:tk.Label, app:tk.Tk) -> None:
         screenHeight = int(parts[2])
         playerPaddle = parts[3]
 
+        #find out how the server runs the game
+        welcome = requestWelcome(client, reader, udp=bool(settings and settings.udp),
+                                 lockstep=bool(settings and settings.lockstep))
+
         errorLabel.config(text=f"Starting game as {playerPaddle} player")
         errorLabel.update()
 
         #close start screen and start game
         app.withdraw()
-        playGame(screenWidth, screenHeight, playerPaddle, client)
+        playGame(screenWidth, screenHeight, playerPaddle, client, welcome, reader, settings, joinedAt)
         app.quit()
 
     except ConnectionRefusedError:
@@ -352,8 +656,41 @@ def joinServer(ip:str, port:str, errorLabel:tk.Label, app:tk.Tk) -> None:
         errorLabel.update()
         client.close()
 
+# Command line options for the client
+def parseArgs(argv:list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Networked Pong client")
+    parser.add_argument("--fps", type=int, default=60,
+                        help="frame rate cap, 0 draws as fast as possible (the game itself always moves at 60 steps "
+                             "a second)")
+    parser.add_argument("--no-interp", action="store_true",
+                        help="draw every server update as soon as it arrives instead of smoothing between them")
+    parser.add_argument("--udp", action="store_true",
+                        help="receive state updates over UDP if the server offers it (needs the binary protocol)")
+    parser.add_argument("--udp-loss", type=float, default=0.0,
+                        help="testing: fraction of outgoing UDP datagrams to throw away")
+    parser.add_argument("--udp-latency", type=float, default=0.0,
+                        help="testing: milliseconds to hold outgoing UDP datagrams back (plus up to half again at random)")
+    parser.add_argument("--replay", default=None, metavar="FILE",
+                        help="play a match recording made with the server's --record option instead of joining a game")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 2 plays twice as fast")
+    parser.add_argument("--lockstep", action="store_true",
+                        help="run the game locally from the inputs of every server tick instead of receiving positions "
+                             "(needs a server started with --tick-rate)")
+    parser.add_argument("--render", choices=["dirty", "full"], default="dirty",
+                        help="dirty only redraws what moved each frame, full redraws the whole window (for displays "
+                             "that don't keep the last frame)")
+    parser.add_argument("--asset-cache", default=None, metavar="DIR",
+                        help="keep the sounds in DIR already converted for the mixer so starting a game skips decoding them")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="CSV",
+                        help="show frame rate and where each frame's time goes over the game, and with a file name "
+                             "also write every frame's timings, network gaps and sync drift to it as CSV")
+    return parser.parse_args(argv)
+
 # This displays the opening screen, you don't need to edit this (but may if you like)
-def startScreen():
+def startScreen(settings:argparse.Namespace | None = None):
+    # Get pygame and the game's fonts and sounds ready while the player types in the server
+    preload(settings.asset_cache if settings else None, GAME_MODULES)
+
     app = tk.Tk()
     app.title("Server Info")
 
@@ -377,13 +714,17 @@ def startScreen():
     errorLabel = tk.Label(text="")
     errorLabel.grid(column=0, row=4, columnspan=2)
 
-    joinButton = tk.Button(text="Join", command=lambda: joinServer(ipEntry.get(), portEntry.get(), errorLabel, app))
+    joinButton = tk.Button(text="Join", command=lambda: joinServer(ipEntry.get(), portEntry.get(), errorLabel, app, settings))
     joinButton.grid(column=0, row=3, columnspan=2)
 
     app.mainloop()
 
 if __name__ == "__main__":
-    startScreen()
+    settings = parseArgs()
+    if settings.replay:
+        playReplay(settings.replay, settings)
+    else:
+        startScreen(settings)
     
     # Uncomment the line below if you want to play the game without a server to see how it should work
     # the startScreen() function should call playGame with the arguments given to it by the server this is
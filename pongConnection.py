@@ -0,0 +1,418 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  The server's client connections.  Nothing the match sends is written to a
+#                           socket directly: it goes into the connection's own bounded queue, and a writer
+#                           (a thread per client in threaded mode, the selector in event loop mode) empties
+#                           it.  A slow client only ever holds up its own queue, never the match.
+#                           send() only queues; flush() once everything for a tick or a message has been
+#                           queued, so the client gets it all in a single write.
+# Misc:                     Messages are either bytes (control messages, never dropped) or None, which
+#                           stands for the latest snapshot of the client's match.  A client never has more
+#                           than one of those queued, and the snapshot is only picked and encoded when it
+#                           is written, so it is always the newest one and the delta encoder always works
+#                           from what the client got.
+#                           Every RATE_INTERVAL the server looks at how much is still unsent to each client and
+#                           its round trip time, and steps a congested spectator's update rate down through
+#                           RATE_STEPS (players always get every update).  A state is then held back until the
+#                           client's rate allows it, newer states replacing it meanwhile.
+# =================================================================================================
+
+import abc
+import selectors
+import socket
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+    import termios
+except ImportError:
+    #not on Windows, unsent bytes are then only what the server itself still holds
+    fcntl = termios = None
+
+from pongMetrics import METRICS
+from pongProtocol import MessageReader, StateEncoder, encode_full_state, encode_ping, encode_rate
+
+#a client whose oldest unsent message is older than this many seconds is disconnected
+MAX_LAG = 3.0
+#queued control messages a client may have before it is disconnected
+MAX_QUEUED = 256
+#connections taken off a listener in one go, so a burst of them can't starve everything else waiting on the loop
+ACCEPT_BATCH = 64
+#update rates (states a second) a spectator steps down through while its link is congested, 0 is every update
+RATE_STEPS = (0, 30, 20, 10)
+#seconds between rate checks, clients that said adapt=1 in HELLO are also pinged this often
+RATE_INTERVAL = 1.0
+#a link is congested with more than CONGESTED_BYTES unsent or a round trip over CONGESTED_RTT seconds, and clear
+#with less than CLEAR_BYTES and a round trip under CLEAR_RTT
+CONGESTED_BYTES = 2048
+CONGESTED_RTT = 0.25
+CLEAR_BYTES = 256
+CLEAR_RTT = 0.1
+#checks in a row a link has to be clear before its rate goes back up a step
+CLEAR_CHECKS = 3
+
+#every connection waiting on a non-blocking listener as (socket, address), at most ACCEPT_BATCH of them
+def accept_batch(server: socket.socket) -> list:
+    accepted = []
+    while len(accepted) < ACCEPT_BATCH:
+        try:
+            accepted.append(server.accept())
+        except BlockingIOError:
+            break
+        except OSError as e:
+            #a client that gave up while waiting, or out of file descriptors: try again next time
+            print(f"Accept failed: {e}")
+            break
+    return accepted
+
+#bytes written to a socket that the peer hasn't acknowledged yet (SIOCOUTQ), 0 where the kernel can't be asked
+def kernel_unsent(sock: socket.socket) -> int:
+    if fcntl is None:
+        return 0
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+    except (OSError, ValueError):
+        return 0
+
+#outgoing messages for one connection
+#holds entries of [queued_at, message, binary] where binary is the protocol version the client was on when a
+#control message was queued.  Control messages are queued under the match lock, so that version tells the
+#writer which format the states after it go out in.
+class SendQueue:
+    def __init__(self, max_lag: float = MAX_LAG) -> None:
+        self.max_lag = max_lag
+        self.items = []
+        self.closed = False
+        #states thrown away because a newer one was queued before they were written
+        self.dropped = 0
+        self.ready = threading.Condition()
+
+    #queues a message, returns False once the client has fallen too far behind to keep
+    def put(self, msg, binary: int) -> bool:
+        now = time.monotonic()
+        with self.ready:
+            queued_at = now
+            if msg is None:
+                for i, item in enumerate(self.items):
+                    if item[1] is None:
+                        #the new one goes at the end, but the client has still been waiting since the old one
+                        queued_at = item[0]
+                        del self.items[i]
+                        self.dropped += 1
+                        METRICS.states_dropped.inc()
+                        break
+            self.items.append([queued_at, msg, binary])
+            return now - self.items[0][0] <= self.max_lag and len(self.items) <= MAX_QUEUED
+
+    #lets a waiting writer know there is something to take
+    def wake(self) -> None:
+        with self.ready:
+            self.ready.notify()
+
+    #takes everything queued, waiting for something to arrive when wait is set.  A state with nothing else queued
+    #is left (or waited on) until hold_until, so the client's update rate decides when states go out
+    #returns None once the queue is closed
+    def take(self, wait: bool = False, hold_until: float = 0.0) -> list | None:
+        with self.ready:
+            while not self.closed:
+                held = len(self.items) == 1 and self.items[0][1] is None and time.monotonic() < hold_until
+                if self.items and not held:
+                    break
+                if not wait:
+                    return []
+                self.ready.wait(hold_until - time.monotonic() if held else None)
+            if self.closed:
+                return None
+            items = self.items
+            self.items = []
+            return items
+
+    def close(self) -> None:
+        with self.ready:
+            self.closed = True
+            self.ready.notify()
+
+#what both server modes keep per client
+class Connection(abc.ABC):
+    def __init__(self, sock: socket.socket, addr: tuple[str, int], max_lag: float = MAX_LAG) -> None:
+        self.sock = sock
+        self.addr = addr
+        #every write is a whole batch of small frames that should go out now, Nagle would only hold them back
+        #waiting for the client to acknowledge the last batch
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.player_id = None
+        self.match = None
+        #set by the match to the binary protocol version the client negotiated (0 is text)
+        self.binary = 0
+        self.encoder = StateEncoder()
+        self.queue = SendQueue(max_lag)
+        self.closed = False
+        #bytes read from and written to the socket, for the metrics endpoint
+        self.bytes_in = 0
+        self.bytes_out = 0
+        METRICS.connections.inc()
+        #the protocol version of what has been written so far, only used by the writer
+        self.wire_binary = 0
+        #set by pongUdp.UdpChannel.register when the client asked for UDP, states go there once the client's
+        #address is known
+        self.udp = None
+        self.udp_addr = None
+        #when the last state datagram went out
+        self.udp_sent = 0.0
+        #set by the match once the client agreed to lockstep, it then gets the inputs of every tick instead of
+        #states
+        self.lockstep = False
+        #states a second the client gets (RATE_STEPS, 0 is every update) and when the next one may be written
+        self.rate = 0
+        self.state_due = 0.0
+        #set by the match when the client said adapt=1: it answers PING and is told about rate changes
+        self.pings = False
+        #the newest round trip time in seconds (0 until one is measured) and the PING waiting for its PONG
+        self.rtt = 0.0
+        self.ping = None
+        self.ping_number = 0
+        self.clear_checks = 0
+
+    #queues control bytes, or None for the match's latest snapshot, nothing is written until flush()
+    def send(self, msg) -> None:
+        if self.closed:
+            return
+        if not self.queue.put(msg, self.binary):
+            print(f"Player {self.player_id} ({self.addr}) fell too far behind, disconnecting")
+            METRICS.lag_disconnects.inc()
+            self.close()
+
+    #writes everything queued so far
+    @abc.abstractmethod
+    def flush(self) -> None:
+        ...
+
+    #bytes queued for the client that haven't reached it yet
+    def unsent(self) -> int:
+        return kernel_unsent(self.sock)
+
+    #a PONG from the client, the answer to our last PING times the round trip
+    #self.ping is read once, rate_loop may replace it at any moment in threaded mode
+    def pong(self, parts) -> None:
+        ping = self.ping
+        if ping is not None and len(parts) > 1 and int(parts[1]) == ping[0]:
+            self.rtt = time.monotonic() - ping[1]
+            METRICS.rtt.observe(self.rtt)
+            self.ping = None
+
+    #called every RATE_INTERVAL: pings the client if it answers, and steps a spectator's update rate down while
+    #its link is congested or back up once it has been clear for a while.  Also sends a UDP client the current
+    #state again if no datagram went out for a whole interval, since a lost one isn't resent and a paused or
+    #idle match publishes nothing new.  Returns whether anything was queued
+    def adapt_rate(self) -> bool:
+        now = time.monotonic()
+        queued = False
+        if self.udp_addr is not None and not self.lockstep and now - self.udp_sent >= RATE_INTERVAL:
+            self.send(None)
+            queued = True
+        rtt = self.rtt
+        #read once, the reader thread's pong() may clear it at any moment in threaded mode
+        ping = self.ping
+        if ping is not None:
+            #no answer yet, the round trip is at least this long
+            rtt = max(rtt, now - ping[1])
+        elif self.pings:
+            self.ping_number += 1
+            self.ping = (self.ping_number, now)
+            self.send(encode_ping(self.ping_number, self.binary))
+            queued = True
+        unsent = self.unsent()
+        step = RATE_STEPS.index(self.rate)
+        if self.player_id in (1, 2):
+            step = 0
+        elif unsent > CONGESTED_BYTES or rtt > CONGESTED_RTT:
+            step = min(step + 1, len(RATE_STEPS) - 1)
+            self.clear_checks = 0
+        elif unsent < CLEAR_BYTES and rtt < CLEAR_RTT:
+            self.clear_checks += 1
+            if self.clear_checks >= CLEAR_CHECKS and step:
+                step -= 1
+                self.clear_checks = 0
+        else:
+            self.clear_checks = 0
+        if RATE_STEPS[step] != self.rate:
+            print(f"Player {self.player_id} ({self.addr}): update rate {RATE_STEPS[step] or 'full'} "
+                  f"({unsent} bytes unsent, round trip {rtt * 1000:.0f} ms)")
+            METRICS.rate_changes.inc()
+            self.rate = RATE_STEPS[step]
+            if self.pings:
+                self.send(encode_rate(self.rate, self.binary))
+                queued = True
+        return queued
+
+    #the bytes to write for a batch of queued messages, states skipped when the client already has them
+    #a UDP client's states go out as datagrams of full frames instead, except that a state next to a control
+    #message also goes over TCP so a final score or a reset can't be lost.  Datagrams are sent even when the state
+    #didn't change, the client may never have got the last one
+    def encode(self, items: list) -> bytes:
+        METRICS.messages_out.inc(len(items))
+        METRICS.queue_depth.observe(len(items))
+        chunks = []
+        for _, msg, binary in items:
+            if msg is not None:
+                chunks.append(msg)
+                self.wire_binary = binary
+                continue
+            if self.rate:
+                self.state_due = time.monotonic() + 1 / self.rate
+            snapshot = self.match.snapshot
+            if self.udp_addr is not None and self.wire_binary:
+                if len(items) > 1:
+                    chunks.append(encode_full_state(snapshot))
+                else:
+                    self.udp.send(self, encode_full_state(snapshot))
+                    self.udp_sent = time.monotonic()
+                    #what the client has is unknown now, a state over TCP goes out in full
+                    self.encoder.keyframe()
+                continue
+            data = self.encoder.encode(snapshot, self.wire_binary, self.player_id)
+            if data is not None:
+                chunks.append(data)
+        return b"".join(chunks)
+
+    #encode() for the writers: a batch that can't be encoded closes this connection instead of taking the
+    #writer (the whole event loop, or this connection's thread) down with it.  None when it did
+    def encode_batch(self, items: list) -> bytes | None:
+        try:
+            return self.encode(items)
+        except Exception as e:
+            print(f"Player {self.player_id} ({self.addr}): couldn't encode an update, disconnecting: {e!r}")
+            self.close()
+            return None
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        METRICS.disconnects.inc()
+        self.closed = True
+        self.queue.close()
+        if self.udp is not None:
+            self.udp.forget(self)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+#a client socket in threaded mode, its own writer thread empties the queue with blocking writes
+class ThreadedConnection(Connection):
+    def __init__(self, sock: socket.socket, addr: tuple[str, int], max_lag: float = MAX_LAG) -> None:
+        super().__init__(sock, addr, max_lag)
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    #hands the queue to the writer thread
+    def flush(self) -> None:
+        self.queue.wake()
+
+    def _write_loop(self) -> None:
+        while True:
+            items = self.queue.take(wait=True, hold_until=self.state_due)
+            if items is None:
+                return
+            data = self.encode_batch(items)
+            if data is None:
+                return
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                return
+            self.bytes_out += len(data)
+            METRICS.bytes_out.inc(len(data))
+
+    #shutting the socket down first wakes up the reader thread and a writer stuck in sendall
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        super().close()
+
+#per connection state for the event loop: buffered input and output for a non-blocking socket
+#outbuf holds the part of the last encoded batch the socket didn't take yet, new messages wait in the queue
+#(where states can still be replaced) until it has gone
+class LoopConnection(Connection):
+    def __init__(self, sock: socket.socket, addr: tuple[str, int], selector: selectors.BaseSelector,
+                 max_lag: float = MAX_LAG) -> None:
+        super().__init__(sock, addr, max_lag)
+        self.selector = selector
+        self.reader = MessageReader()
+        self.outbuf = bytearray()
+        self.writing = False
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, self)
+
+    #writes as much queued output as the socket takes, then waits for it to be writable if some is left
+    #called by the event loop once per round for every connection something was queued for, when the
+    #socket becomes writable again, and once a state it is holding() is due
+    def flush(self) -> None:
+        if self.closed:
+            return
+        while True:
+            if not self.outbuf:
+                items = self.queue.take(hold_until=self.state_due)
+                if items:
+                    data = self.encode_batch(items)
+                    if data is None:
+                        return
+                    self.outbuf += data
+                if not self.outbuf:
+                    break
+            try:
+                sent = self.sock.send(self.outbuf)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.close()
+                return
+            self.bytes_out += sent
+            METRICS.bytes_out.inc(sent)
+            del self.outbuf[:sent]
+            if self.outbuf:
+                break
+        if self.writing != bool(self.outbuf):
+            self.writing = bool(self.outbuf)
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if self.writing else 0)
+            self.selector.modify(self.sock, events, self)
+
+    #true when a state is waiting for the client's update rate to allow it, the event loop flushes again at
+    #state_due
+    def holding(self) -> bool:
+        return not self.closed and not self.outbuf and bool(self.queue.items)
+
+    def unsent(self) -> int:
+        return len(self.outbuf) + kernel_unsent(self.sock)
+
+    #reads whatever is available into the message reader, returns False once the client is gone
+    def receive(self) -> bool:
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        self.bytes_in += len(data)
+        METRICS.bytes_in.inc(len(data))
+        self.reader.feed(data)
+        return True
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.selector.unregister(self.sock)
+        except (KeyError, ValueError):
+            pass
+        super().close()
@@ -0,0 +1,127 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Smoothing for what the client draws.  Remote paddles and the ball are drawn a
+#                           little in the past, interpolated between the two server updates around that
+#                           moment, so a late or missing update no longer shows up as a jump.  The
+#                           player's own paddle is predicted locally and pulled back onto the server's
+#                           position when the two disagree.
+# Misc:                     Updates are placed in time by their sync value, which counts game ticks.
+# =================================================================================================
+
+import time
+
+# Field order of the values stored in the buffer: p1Y p2Y ballX ballY lScore rScore.  The positions are
+# interpolated, the scores just switch over when the update they arrived in is reached.
+SMOOTHED_FIELDS = 4
+# A position changing more than this between two updates is a reset (the ball after a point), not movement
+SNAP_DISTANCE = 60
+
+class InterpolationBuffer:
+    def __init__(self, tickRate:float = 60, enabled:bool = True, maxUpdates:int = 32) -> None:
+        self.tickRate = tickRate
+        self.enabled = enabled
+        self.maxUpdates = maxUpdates
+        self.reset()
+
+    # Forget every update, used when the game restarts and sync goes back to 0
+    def reset(self) -> None:
+        self.updates = []
+        # sync - tickRate * arrival time, the newest sync we could have at any moment is tickRate*now + offset
+        self.offset = None
+        # average number of ticks between the updates we get
+        self.spacing = 1.0
+
+    # Stores the values (None for fields this update doesn't carry) the server sent for the given sync
+    def add(self, sync:int, values:tuple, now:float | None = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        if self.updates:
+            lastSync = self.updates[-1][0]
+            if sync == lastSync:
+                # same tick, newer information (the other player's paddle in client run games)
+                self.updates[-1] = (sync, values)
+                return
+            if sync < lastSync:
+                if lastSync - sync < self.tickRate:
+                    return  # arrived out of order, we already have something newer
+                self.reset()
+            else:
+                self.spacing += ((sync - lastSync) - self.spacing) * 0.1
+
+        sample = sync - self.tickRate * now
+        if self.offset is None or sample > self.offset:
+            self.offset = sample
+        else:
+            # updates that arrive late only nudge the clock so one slow packet doesn't delay everything
+            self.offset += (sample - self.offset) * 0.05
+
+        self.updates.append((sync, values))
+        if len(self.updates) > self.maxUpdates:
+            del self.updates[0]
+
+    # The server says it now sends at most hz updates a second (0 for every tick), start drawing far enough
+    # behind for that straight away instead of waiting for the measured spacing to catch up
+    def setUpdateRate(self, hz:int) -> None:
+        self.spacing = max(1.0, self.tickRate / hz) if hz else 1.0
+
+    # How far behind the newest update we draw, in ticks: enough that the next update is normally already here
+    def delay(self) -> float:
+        return max(2.0, 2 * self.spacing)
+
+    # The values to draw right now, or None before the first update
+    def sample(self, now:float | None = None) -> tuple | None:
+        if not self.updates:
+            return None
+        if not self.enabled or len(self.updates) == 1:
+            return self.updates[-1][1]
+        if now is None:
+            now = time.monotonic()
+        renderSync = self.tickRate * now + self.offset - self.delay()
+
+        if renderSync <= self.updates[0][0]:
+            return self.updates[0][1]
+        if renderSync >= self.updates[-1][0]:
+            return self.updates[-1][1]
+        for i in range(len(self.updates) - 1, 0, -1):
+            if self.updates[i - 1][0] <= renderSync:
+                break
+        (syncA, a), (syncB, b) = self.updates[i - 1], self.updates[i]
+        t = (renderSync - syncA) / (syncB - syncA)
+
+        values = []
+        for field, (va, vb) in enumerate(zip(a, b)):
+            if va is None or vb is None:
+                values.append(vb)
+            elif field < SMOOTHED_FIELDS and abs(vb - va) <= SNAP_DISTANCE:
+                values.append(round(va + (vb - va) * t))
+            else:
+                values.append(va)
+        return tuple(values)
+
+# Our own paddle moves as soon as a key is pressed instead of waiting for the server.  The server only starts
+# moving it once our input arrives, so the two can end up a few pixels apart; once the server reports it has
+# stopped in the same place for two ticks in a row and we aren't moving, ease ours onto that position.
+class PaddleReconciler:
+    def __init__(self) -> None:
+        self.serverY = None
+        self.serverSync = -1
+        self.settled = False
+
+    def serverUpdate(self, sync:int, y:int) -> None:
+        if sync <= self.serverSync:
+            return
+        self.settled = (y == self.serverY)
+        self.serverY = y
+        self.serverSync = sync
+
+    def reset(self) -> None:
+        self.__init__()
+
+    # Moves paddle at most one step toward the server's position, only while the player isn't moving it
+    def correct(self, paddle) -> None:
+        if paddle.moving or not self.settled:
+            return
+        error = self.serverY - paddle.rect.y
+        paddle.rect.y += max(-paddle.speed, min(paddle.speed, error))
@@ -0,0 +1,458 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Load generator for pongServer.py.  Starts a local server (or uses a running one),
+#                           connects N headless bot players and M spectators that speak the real protocol
+#                           (CONFIG, HELLO/WELCOME, state updates or paddle INPUT, GAME_OVER, PLAY_AGAIN,
+#                           RESET) and reports message and byte rates, update latency percentiles and the
+#                           server's CPU use and thread count.
+# Misc:                     Every bot runs on one selector thread so thousands fit in one process.  Results
+#                           are written as JSON (see RESULTS_FORMAT), --compare prints the change against an
+#                           earlier results file.  Server CPU/thread/memory figures come from /proc (Linux).
+# =================================================================================================
+
+import argparse
+import json
+import os
+import random
+import selectors
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+import pongPhysics
+from pongProtocol import BINARY_PROTOCOL, MessageReader, choose_protocol, encode_control, encode_input, encode_update, parse_options
+
+#bumped whenever a key in the results file changes meaning, so files from different versions aren't compared
+RESULTS_FORMAT = 1
+#each left player bot numbers its updates from its own multiple of this, so a sync tells which bot sent it
+#(18 minutes of updates at 60 a second).  Syncs are 32 bits, so there are SYNC_BLOCKS of them and bots that
+#many indexes apart share one, which only mixes up whose latency a few samples are
+SYNC_BLOCK = 1 << 16
+SYNC_BLOCKS = (1 << 32) // SYNC_BLOCK
+#chance per frame that a bot changes which way its paddle is going
+TURN_CHANCE = 0.05
+
+#one connection the load generator drives
+class Bot:
+    def __init__(self, sock: socket.socket, index: int, spectator: bool, protocol: str, rng: random.Random) -> None:
+        self.sock = sock
+        self.index = index
+        self.spectator = spectator
+        self.protocol = protocol
+        self.rng = rng
+        self.reader = MessageReader()
+        self.role = None
+        self.welcome = None
+        self.binary = 0
+        self.outbuf = bytearray()
+        self.closed = False
+        self.direction = 0
+        self.sent_moving = ""
+        self.sync = 0
+        self.game_over = False
+        self.physics = pongPhysics.start_state()
+        self.scores = (0, 0)
+        self.own_y = pongPhysics.PADDLE_START_Y
+        #(sent at, own paddle y then) for the INPUT that last started the paddle moving, server simulated matches
+        self.input_sent = None
+
+    @property
+    def playing(self) -> bool:
+        return self.welcome is not None and self.role in ("left", "right")
+
+    def queue(self, data: bytes) -> None:
+        self.outbuf += data
+
+    #one frame of a player: pick a direction now and then and tell the server, like playGame does
+    def frame(self, now: float) -> None:
+        if self.rng.random() < TURN_CHANCE:
+            self.direction = self.rng.choice((-1, 0, 1))
+        names = {-1: "up", 0: "", 1: "down"}
+        if self.welcome.get("sim") == "server":
+            if names[self.direction] != self.sent_moving:
+                #time how long a paddle at rest takes to start moving, unless a wall is in the way
+                if not self.sent_moving and pongPhysics.move_paddle(self.own_y, self.direction) != self.own_y:
+                    self.input_sent = (now, self.own_y)
+                self.sent_moving = names[self.direction]
+                self.queue(encode_input(self.sent_moving, self.sync, self.binary))
+            return
+        if self.role == "left":
+            #the left player runs the ball, numbering its updates from its own block of syncs
+            self.physics, events = pongPhysics.step(self.physics, self.direction, 0)
+            left, right = self.scores
+            self.scores = (left + events.count("left"), right + events.count("right"))
+            #wraps past the last sync to 1, 0 means we haven't sent one
+            if self.sync:
+                self.sync = self.sync % 0xFFFFFFFF + 1
+            else:
+                self.sync = self.index % SYNC_BLOCKS * SYNC_BLOCK + 1
+            p = self.physics
+            self.queue(encode_update(p.p1_y, p.ball_x, p.ball_y, *self.scores, self.sync, self.binary))
+            return
+        self.own_y = pongPhysics.move_paddle(self.own_y, self.direction)
+        self.queue(encode_update(self.own_y, self.physics.ball_x, self.physics.ball_y, *self.scores, self.sync,
+                                 self.binary))
+
+    #handles one message from the server, returns the sync of a state update (None for anything else)
+    def handle(self, parts: list, now: float, stats: "LoadStats"):
+        if parts[0] == "CONFIG" and len(parts) == 4:
+            self.role = parts[3]
+            self.queue(f"HELLO proto={self.protocol}\n".encode())
+            return None
+        if parts[0] == "WELCOME":
+            self.welcome = parse_options(parts)
+            self.binary = self.reader.binary = choose_protocol(self.welcome.get("proto", ""))
+            return None
+        if self.welcome is None:
+            return None
+        if parts[0] == "GAME_OVER":
+            stats.games += self.role == "left"
+            if self.playing and not self.game_over:
+                self.queue(encode_control("PLAY_AGAIN", self.binary))
+            self.game_over = True
+            return None
+        if parts[0] == "RESET":
+            self.game_over = False
+            self.physics = pongPhysics.start_state()
+            self.scores = (0, 0)
+            self.own_y = pongPhysics.PADDLE_START_Y
+            if self.role == "left":
+                self.sync = 0
+            return None
+        if len(parts) < 6 or not str(parts[-1]).isdigit():
+            return None
+        values = [int(value) for value in parts]
+        sync = values[-1]
+        if self.role == "right":
+            #follow the ball and score player 1 reports and echo its sync like the real client
+            self.physics = self.physics._replace(ball_x=values[-5], ball_y=values[-4])
+            self.scores = (values[-3], values[-2])
+            self.sync = max(self.sync, sync)
+        elif self.role == "left":
+            #the other paddle is the first field of a text state and the second of a binary one
+            self.physics = self.physics._replace(p2_y=values[1] if len(values) >= 7 else values[0])
+        if self.playing and len(values) >= 7 and self.welcome.get("sim") == "server":
+            self.own_y = values[0] if self.role == "left" else values[1]
+            if self.input_sent is not None and self.own_y != self.input_sent[1]:
+                stats.latency.append(now - self.input_sent[0])
+                self.input_sent = None
+        return sync
+
+#counters for the whole run
+class LoadStats:
+    def __init__(self) -> None:
+        self.messages = 0
+        self.states = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.games = 0
+        self.disconnects = 0
+        #seconds from an update leaving a bot to a state carrying it reaching another bot
+        self.latency = []
+
+    def snapshot(self) -> tuple:
+        return (self.messages, self.states, self.bytes_in, self.bytes_out, len(self.latency))
+
+#cpu seconds, thread count and resident memory (kB) of a process together with the processes it started (the
+#workers of a sharded server), None where /proc can't tell
+def process_usage(pid: int | None) -> tuple[float | None, int | None, int | None]:
+    if pid is None:
+        return None, None, None
+    try:
+        cpu = threads = rss = 0
+        for process in process_tree(pid):
+            with open(f"/proc/{process}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+            with open(f"/proc/{process}/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss += int(line.split()[1])
+        return cpu, threads, rss
+    except (OSError, ValueError, IndexError):
+        return None, None, None
+
+#pid and every descendant of it
+def process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for process in pids:
+        try:
+            for task in os.listdir(f"/proc/{process}/task"):
+                with open(f"/proc/{process}/task/{task}/children") as f:
+                    pids += [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+    return pids
+
+#the value at fraction q of an already sorted list
+def percentile(values: list, q: float) -> float | None:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+#connects one bot, retrying for a while if the server's accept backlog is full
+def connect(host: str, port: int, timeout: float = 5.0) -> socket.socket:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setblocking(False)
+    return sock
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, server_pid: int | None) -> None:
+        self.args = args
+        self.server_pid = server_pid
+        self.selector = selectors.DefaultSelector()
+        self.stats = LoadStats()
+        self.bots = []
+        #when each left player bot sent the update with a given sync
+        self.sent_at = {}
+        self.rng = random.Random(args.seed)
+
+    def add_bots(self, host: str, port: int, spectator_port: int) -> None:
+        protocol = "text" if self.args.text else BINARY_PROTOCOL
+        for index in range(self.args.players + self.args.spectators):
+            spectator = index >= self.args.players
+            sock = connect(host, spectator_port if spectator else port)
+            bot = Bot(sock, index + 1, spectator, protocol, random.Random(self.rng.random()))
+            self.bots.append(bot)
+            self.selector.register(sock, selectors.EVENT_READ, bot)
+            #keep up with the handshakes while the rest connect
+            self.poll(0)
+
+    #reads and writes whatever is ready, waiting up to timeout
+    def poll(self, timeout: float) -> None:
+        for key, mask in self.selector.select(timeout):
+            bot = key.data
+            if mask & selectors.EVENT_READ:
+                self.receive(bot)
+            if mask & selectors.EVENT_WRITE:
+                self.flush(bot)
+
+    def receive(self, bot: Bot) -> None:
+        try:
+            data = bot.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(bot)
+            return
+        now = time.monotonic()
+        self.stats.bytes_in += len(data)
+        bot.reader.feed(data)
+        for parts in bot.reader.messages():
+            self.stats.messages += 1
+            sync = bot.handle(parts, now, self.stats)
+            if sync is None:
+                continue
+            self.stats.states += 1
+            sent = self.sent_at.get(sync)
+            if sent is not None and bot.role != "left":
+                self.stats.latency.append(now - sent)
+        if bot.outbuf:
+            self.flush(bot)
+
+    def flush(self, bot: Bot) -> None:
+        if bot.closed:
+            return
+        try:
+            sent = bot.sock.send(bot.outbuf)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(bot)
+            return
+        self.stats.bytes_out += sent
+        del bot.outbuf[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if bot.outbuf else 0)
+        self.selector.modify(bot.sock, events, bot)
+
+    def drop(self, bot: Bot) -> None:
+        if bot.closed:
+            return
+        bot.closed = True
+        self.stats.disconnects += 1
+        self.selector.unregister(bot.sock)
+        bot.sock.close()
+
+    #sends one frame from every player bot
+    def frame(self) -> None:
+        now = time.monotonic()
+        for bot in self.bots:
+            if bot.closed or not bot.playing:
+                continue
+            bot.frame(now)
+            if bot.role == "left" and bot.welcome.get("sim") != "server":
+                self.sent_at[bot.sync] = now
+            self.flush(bot)
+
+    #plays for seconds, returns the stats counted over the last measure seconds of it
+    def run(self, warmup: float, measure: float) -> dict:
+        interval = 1 / self.args.rate
+        next_frame = time.monotonic()
+        end_warmup = next_frame + warmup
+        end = end_warmup + measure
+        start = None
+        threads = []
+        next_sample = end_warmup
+        while True:
+            now = time.monotonic()
+            if start is None and now >= end_warmup:
+                start = (now, self.stats.snapshot(), process_usage(self.server_pid)[0])
+                self.stats.latency.clear()
+            if now >= end:
+                break
+            if now >= next_frame:
+                self.frame()
+                next_frame += interval
+                if now - next_frame > 5 * interval:
+                    next_frame = now
+                #forget syncs nobody is going to see any more
+                if len(self.sent_at) > 200 * max(1, self.args.players):
+                    self.sent_at.clear()
+            if start is not None and now >= next_sample:
+                threads.append(process_usage(self.server_pid)[1])
+                next_sample += 1
+            self.poll(max(0.0, min(next_frame, end) - time.monotonic()))
+        return self.summarize(start, threads)
+
+    def summarize(self, start: tuple, threads: list) -> dict:
+        started_at, before, cpu_before = start
+        elapsed = time.monotonic() - started_at
+        messages, states, bytes_in, bytes_out, _ = (now - then for now, then in zip(self.stats.snapshot(), before))
+        cpu, _, rss = process_usage(self.server_pid)
+        latency = sorted(self.stats.latency)
+        threads = [count for count in threads if count is not None]
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "connected": sum(not bot.closed for bot in self.bots),
+            "playing": sum(not bot.closed and bot.playing for bot in self.bots),
+            "spectating": sum(not bot.closed and bot.welcome is not None and bot.role == "spectator" for bot in self.bots),
+            "disconnects": self.stats.disconnects,
+            "games_finished": self.stats.games,
+            "seconds": round(elapsed, 3),
+            "messages_per_s": round(messages / elapsed, 1),
+            "states_per_s": round(states / elapsed, 1),
+            "bytes_in_per_s": round(bytes_in / elapsed, 1),
+            "bytes_out_per_s": round(bytes_out / elapsed, 1),
+            "latency_ms": {
+                "samples": len(latency),
+                "p50": ms(percentile(latency, 0.50)),
+                "p90": ms(percentile(latency, 0.90)),
+                "p99": ms(percentile(latency, 0.99)),
+                "max": ms(latency[-1] if latency else None),
+            },
+            "server": {
+                "cpu_percent": None if cpu is None or cpu_before is None else round(100 * (cpu - cpu_before) / elapsed, 1),
+                "threads": max(threads) if threads else None,
+                "rss_kb": rss,
+            },
+        }
+
+#prints every numeric result next to the same one from an earlier results file
+def compare(results: dict, baseline: dict, prefix: str = "") -> None:
+    for key, value in results.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(value, old or {}, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if isinstance(old, (int, float)) and old:
+                print(f"  {prefix + key:<28} {old:>12} -> {value:<12} ({100 * (value - old) / old:+.1f}%)")
+            else:
+                print(f"  {prefix + key:<28} {str(old):>12} -> {value}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test a Pong server with headless bot clients")
+    parser.add_argument("--players", type=int, default=20, help="bot players to connect (paired into matches)")
+    parser.add_argument("--spectators", type=int, default=0, help="bot spectators to connect")
+    parser.add_argument("--rate", type=int, default=60, help="frames per second every player bot sends")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds to play before measuring")
+    parser.add_argument("--text", action="store_true", help="bots stay on the text protocol")
+    parser.add_argument("--port", type=int, default=5050, help="port for the server this starts")
+    parser.add_argument("--server-args", default="",
+                        help="extra arguments for the server this starts, e.g. \"--mode eventloop --tick-rate 60\"")
+    parser.add_argument("--connect", default=None, metavar="HOST:PORT",
+                        help="use an already running server instead of starting one")
+    parser.add_argument("--spectator-port", type=int, default=None,
+                        help="spectator port of the server given with --connect")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="process id of the server given with --connect, for its CPU and thread figures")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the bots' paddle movement")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="print the change against this earlier results file")
+    args = parser.parse_args()
+
+    server = None
+    if args.connect:
+        host, port = args.connect.rsplit(":", 1)
+        port = int(port)
+        spectator_port = args.spectator_port or port
+        server_pid = args.server_pid
+    else:
+        #every pair of players gets its own match and spectators have a port of their own
+        host, port, spectator_port = "127.0.0.1", args.port, args.port + 1
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "pongServer.py"),
+                   "--host", host, "--port", str(port), "--spectator-port", str(spectator_port),
+                   "--max-matches", "0", *shlex.split(args.server_args)]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        server_pid = server.pid
+        time.sleep(0.5)
+
+    try:
+        test = LoadTest(args, server_pid)
+        print(f"Connecting {args.players} players and {args.spectators} spectators to {host}:{port}")
+        test.add_bots(host, port, spectator_port)
+        results = test.run(args.warmup, args.duration)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "format": RESULTS_FORMAT,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "players": args.players,
+            "spectators": args.spectators,
+            "rate": args.rate,
+            "duration": args.duration,
+            "protocol": "text" if args.text else BINARY_PROTOCOL,
+            "server_args": args.server_args if server is not None else None,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("format") != RESULTS_FORMAT:
+            print(f"{args.compare} is results format {baseline.get('format')}, not {RESULTS_FORMAT}, not comparing")
+        else:
+            print(f"Change against {args.compare}:")
+            compare(results, baseline["results"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Client side of lockstep mode.  Instead of positions every frame the server
+#                           sends the paddle inputs of every tick, and the client runs the same Ball/Paddle
+#                           simulation as the server (helperCode.py, integer math only) with them.  A STEP
+#                           is 4 bytes on the wire against 16 for a full state.
+# Misc:                     Every HASH_INTERVAL ticks the server sends a hash of its simulation.  A client
+#                           that doesn't match it, or that missed a step, asks for the whole simulation again
+#                           with RESYNC.  A server running swept collisions (WELCOME physics=swept) is followed
+#                           with pongPhysics' swept step instead of helperCode.
+# =================================================================================================
+
+from assets.code.helperCode import *
+import pongPhysics
+from pongProtocol import sim_hash
+
+# Messages the lockstep game handles
+LOCKSTEP_MESSAGES = ("STEP", "CHECK", "SIMSTATE")
+
+class LockstepGame:
+    # The paddles, ball and walls are playGame's own objects, this moves them.  requestResync is called (once
+    # per desync) to ask the server for a SIMSTATE.  swept and speed are the server's physics options
+    def __init__(self, leftPaddle:Paddle, rightPaddle:Paddle, ball:Ball, topWall:pygame.Rect, bottomWall:pygame.Rect,
+                 screenWidth:int, screenHeight:int, requestResync, swept:bool = False, speed:int = 1) -> None:
+        self.leftPaddle = leftPaddle
+        self.rightPaddle = rightPaddle
+        self.ball = ball
+        self.topWall = topWall
+        self.bottomWall = bottomWall
+        self.screenWidth = screenWidth
+        self.screenHeight = screenHeight
+        self.requestResync = requestResync
+        self.swept = swept
+        self.speed = speed
+        self.tick = 0
+        self.lScore = 0
+        self.rScore = 0
+        # steps are ignored until a SIMSTATE says where to run them from
+        self.synced = False
+        # the server sends a SIMSTATE after WELCOME on its own
+        self.resyncRequested = True
+        self.desyncs = 0
+
+    # Forget the simulation until the server sends it again (it does after RESET)
+    def reset(self) -> None:
+        self.synced = False
+        self.resyncRequested = True
+
+    # Same order as pongProtocol.encode_sim_state
+    def values(self) -> tuple:
+        return (self.tick, self.leftPaddle.rect.y, self.rightPaddle.rect.y, self.ball.rect.x, self.ball.rect.y,
+                self.ball.xVel, self.ball.yVel, self.lScore, self.rScore)
+
+    # Applies one STEP, CHECK or SIMSTATE message, returns the stepBall events it caused
+    def handle(self, parts:list) -> list[str]:
+        if parts[0] == "SIMSTATE":
+            self._load([int(value) for value in parts[1:10]])
+            return []
+        if not self.synced:
+            return []
+        if parts[0] == "STEP":
+            if int(parts[1]) != (self.tick + 1) & 0xFF:
+                self._desync(f"missed a step before tick {self.tick + 1}")
+                return []
+            return self._step(parts[2], parts[3])
+        if parts[0] == "CHECK":
+            tick, expected = int(parts[1]), int(parts[2])
+            if tick == self.tick and sim_hash(self.values()) != expected:
+                self._desync(f"hash mismatch at tick {tick}")
+        return []
+
+    def _load(self, values:list[int]) -> None:
+        self.tick, leftY, rightY, ballX, ballY, self.ball.xVel, self.ball.yVel, self.lScore, self.rScore = values
+        self.leftPaddle.rect.y = leftY
+        self.rightPaddle.rect.y = rightY
+        self.ball.rect.x = ballX
+        self.ball.rect.y = ballY
+        self.synced = True
+        self.resyncRequested = False
+
+    # Runs one tick exactly like MatchSimulation.step in pongMatch.py.  The paddles' own moving values are the
+    # keys the player is holding, they are put back afterwards
+    def _step(self, leftMove:str, rightMove:str) -> list[str]:
+        if self.swept:
+            events = self._sweptStep(leftMove, rightMove)
+        else:
+            held = (self.leftPaddle.moving, self.rightPaddle.moving)
+            self.leftPaddle.moving = leftMove if leftMove in ("up", "down") else ""
+            self.rightPaddle.moving = rightMove if rightMove in ("up", "down") else ""
+            movePaddle(self.leftPaddle, self.screenHeight)
+            movePaddle(self.rightPaddle, self.screenHeight)
+            events = stepBall(self.ball, self.leftPaddle, self.rightPaddle, self.topWall, self.bottomWall,
+                              self.screenWidth)
+            self.leftPaddle.moving, self.rightPaddle.moving = held
+        for event in events:
+            if event == "left":
+                self.lScore += 1
+            elif event == "right":
+                self.rScore += 1
+        self.tick += 1
+        return events
+
+    # The swept step works on pongPhysics' integer state, so the objects are copied into one and back
+    def _sweptStep(self, leftMove:str, rightMove:str) -> list[str]:
+        directions = {"up": -1, "down": 1}
+        state = pongPhysics.PhysicsState(self.leftPaddle.rect.y, self.rightPaddle.rect.y, self.ball.rect.x,
+                                         self.ball.rect.y, self.ball.xVel, self.ball.yVel)
+        state, events = pongPhysics.step(state, directions.get(leftMove, 0), directions.get(rightMove, 0),
+                                         self.screenWidth, self.screenHeight, swept=True, speed=self.speed)
+        self.leftPaddle.rect.y, self.rightPaddle.rect.y = state.p1_y, state.p2_y
+        self.ball.rect.x, self.ball.rect.y = state.ball_x, state.ball_y
+        self.ball.xVel, self.ball.yVel = state.ball_xvel, state.ball_yvel
+        return events
+
+    def _desync(self, reason:str) -> None:
+        self.synced = False
+        self.desyncs += 1
+        print(f"Lockstep desync ({reason}), asking the server to resync")
+        if not self.resyncRequested:
+            self.resyncRequested = True
+            self.requestResync()
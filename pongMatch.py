@@ -0,0 +1,557 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Per-match game state and the matchmaker that pairs incoming connections
+#                           into matches, so one server process can host many games at once.
+# Misc:                     Both server modes in pongServer.py drive these classes.  A connection is
+#                           any object with player_id, binary and lockstep attributes and a send() method
+#                           taking control bytes, or None for the latest snapshot of its match (see
+#                           pongConnection.py).
+# =================================================================================================
+
+import os
+import secrets
+import time
+from typing import NamedTuple
+
+import pongPhysics
+from pongMetrics import METRICS
+from pongPhysics import PADDLE_H, PADDLE_START_Y, SCREEN_H, SCREEN_W, WALL
+from pongProtocol import (DIRECTIONS, HASH_INTERVAL, POSITION_RANGE, SCORE_RANGE, SYNC_RANGE, choose_protocol,
+                          encode_check, encode_control, encode_sim_state, encode_step, parse_options, sim_hash)
+from pongReplay import MatchRecorder
+
+#a number from a client's message, ValueError (counted as a parse error) if it isn't one or can't go into a state
+def checked_int(value, value_range: tuple) -> int:
+    number = int(value)
+    if not value_range[0] <= number <= value_range[1]:
+        raise ValueError(f"{number} is outside {value_range[0]}..{value_range[1]}")
+    return number
+
+#first game to reach this many points wins
+WIN_SCORE = 5
+#seconds a dropped player's slot is kept for them to RESUME before anyone else can take it
+RESUME_GRACE = 10.0
+
+#role names sent in CONFIG, indexed by player id (3 is a spectator)
+ROLES = {1: "left", 2: "right", 3: "spectator"}
+
+#builds the CONFIG line that tells a client its screen size and role
+def config_message(player_id) -> bytes:
+    return f"CONFIG {SCREEN_W} {SCREEN_H} {ROLES[player_id]}\n".encode()
+
+#one published game state, never changed once made.  Readers take whichever snapshot is current without locking,
+#the match swaps in a new one whenever its state changes.  The field order is the state tuple pongProtocol encodes.
+class Snapshot(NamedTuple):
+    p1_y: int
+    p2_y: int
+    ball_x: int
+    ball_y: int
+    l_score: int
+    r_score: int
+    sync: int
+
+#the server side copy of the game a client would normally simulate, run by pongPhysics.step which moves
+#everything exactly like playGame in pongClient.py, or with swept collisions and speed frames a tick
+class MatchSimulation:
+    def __init__(self, swept: bool = False, speed: int = 1) -> None:
+        self.swept = swept
+        self.speed = speed
+        self.state = pongPhysics.start_state()
+        #which way each player's paddle is moving, as in pongProtocol.DIRECTIONS
+        self.moves = {1: 0, 2: 0}
+
+    #advances one tick and returns the step events ("left"/"right" for points, "bounce")
+    def step(self) -> list[str]:
+        self.state, events = pongPhysics.step(self.state, self.moves[1], self.moves[2], swept=self.swept,
+                                              speed=self.speed)
+        return events
+
+#the full state of one game plus everyone attached to it
+#with a tick_rate the server simulates the game itself and players only send paddle input,
+#otherwise player 1's client runs the ball and the server relays what it reports
+#swept and speed are the simulation's physics options (pongPhysics.step), they need a tick_rate
+class Match:
+    def __init__(self, match_id: int, tick_rate: int = 0, allow_binary: bool = True, udp=None,
+                 record_dir: str | None = None, swept: bool = False, speed: int = 1) -> None:
+        self.match_id = match_id
+        self.tick_rate = tick_rate
+        self.swept = swept
+        self.speed = speed
+        self.allow_binary = allow_binary
+        #the server's pongUdp.UdpChannel, None when it doesn't offer UDP
+        self.udp = udp
+        #every game played here is recorded to a new file in this directory (pongReplay.py)
+        self.record_dir = record_dir
+        self.recorder = None
+        #lock to ensure the match state isnt modified at same time (threaded mode)
+        self.lock = METRICS.lock("match")
+        self.players = {}
+        self.spectators = []
+        #who broadcasts go to: the spectators, and the players once the match has started.  Replaced (never
+        #modified) whenever someone joins or leaves so it can be read without the lock
+        self.audience = ()
+        #the part of the audience running the simulation themselves (lockstep) and the part that gets states
+        self.lockstep_audience = ()
+        self.state_audience = ()
+        #set when a paddle was placed rather than moved by input since the last tick, lockstep clients
+        #can't replay that and get the whole simulation instead of a step
+        self.placed = False
+        #set once both players have been paired, stays set while at least one player is left
+        self.started = False
+        #session token of each player, handed out in WELCOME and good for taking the slot back after a dropped
+        #connection.  "<match id>-<random>", so a sharded server knows which worker has the match
+        self.sessions = {}
+        #slots of players who dropped out, by player id, with when they stop being kept for them
+        self.reserved = {}
+        #the snapshot the last broadcast went out for
+        self.broadcast_snapshot = None
+        self.reset_state()
+
+    #puts the paddles, ball and score back to the start of a game
+    def reset_state(self) -> None:
+        self.paddle_y = {1: PADDLE_START_Y, 2: PADDLE_START_Y}
+        self.ball_x = SCREEN_W // 2
+        self.ball_y = SCREEN_H // 2
+        self.left_score = 0
+        self.right_score = 0
+        self.sync_val = 0
+        # Play-again state
+        self.game_over = False
+        self.ready_flags = {1: False, 2: False}
+        if self.tick_rate:
+            self.sim = MatchSimulation(self.swept, self.speed)
+        self.publish()
+
+    #swaps in a snapshot of the current state, called after every change
+    def publish(self) -> None:
+        self.snapshot = Snapshot(self.paddle_y[1], self.paddle_y[2], self.ball_x, self.ball_y,
+                                 self.left_score, self.right_score, self.sync_val)
+        if self.recorder is not None:
+            self.recorder.append(self.snapshot)
+
+    #marks the match as started once both players are paired, and starts recording it
+    def start(self) -> None:
+        self.started = True
+        if self.record_dir:
+            path = os.path.join(self.record_dir, f"match{self.match_id}-{time.strftime('%Y%m%d-%H%M%S')}.pongrec")
+            self.recorder = MatchRecorder(path, SCREEN_W, SCREEN_H, self.tick_rate)
+            self.recorder.append(self.snapshot)
+            print(f"Match {self.match_id}: recording to {path}")
+
+    #nobody is playing any more, the next pair of players starts over
+    def stop(self) -> None:
+        self.started = False
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        self.reset_state()
+
+    #rebuilds the audience after players or spectators changed, the caller must hold self.lock
+    #everyone added must already have their CONFIG queued, a state must never reach a client before it
+    def update_audience(self) -> None:
+        players = tuple(self.players[pid] for pid in (1, 2) if pid in self.players) if self.started else ()
+        self.audience = players + tuple(self.spectators)
+        self.lockstep_audience = tuple(conn for conn in self.audience if conn.lockstep)
+        self.state_audience = tuple(conn for conn in self.audience if not conn.lockstep)
+
+    #the simulation as a lockstep client holds it, in pongProtocol.encode_sim_state order
+    def sim_values(self) -> tuple:
+        return (self.sync_val, *self.sim.state, self.left_score, self.right_score)
+
+    #every connection that should hear about this match
+    def everyone(self) -> tuple:
+        return self.audience
+
+    #the player slot a new player would take, or None when both are taken (or kept for a player to resume)
+    def open_slot(self):
+        for pid in (1, 2):
+            if pid not in self.players and pid not in self.reserved:
+                return pid
+        return None
+
+    #the player id a session token belongs to, None if it isn't one of this match's
+    def session_player(self, token: str):
+        return next((pid for pid, session in self.sessions.items() if session == token), None)
+
+    #applies one message from a client to the match state
+    #returns a list of (connection, bytes) control messages that need to be sent out because of it, queued while
+    #still holding the lock so they stay in order with the protocol switch.  State changes are only published,
+    #broadcast() sends them.
+    #the caller must hold self.lock (threaded mode) or be the event loop thread
+    def handle_message(self, conn, parts) -> list:
+        player_id = conn.player_id
+        outgoing = []
+
+        # HELLO is sent by newer clients after CONFIG, tell them how this match is run
+        if parts[0] == "HELLO":
+            options = parse_options(parts)
+            welcome = f"WELCOME sim=server rate={self.tick_rate}" if self.tick_rate else "WELCOME sim=client"
+            binary = choose_protocol(options.get("proto", ""), self.allow_binary)
+            if binary:
+                welcome += f" proto=bin{binary}"
+                #states can go over UDP, which only carries binary frames
+                if self.udp is not None and options.get("udp") == "1":
+                    welcome += f" udp={self.udp.register(conn)}"
+            #lockstep clients run the server's simulation from the inputs of every tick
+            lockstep = bool(self.tick_rate) and options.get("lockstep") == "1"
+            if lockstep:
+                welcome += " lockstep=1"
+                #they have to run the same physics
+                if self.swept:
+                    welcome += f" physics=swept speed={self.speed}"
+            #clients that answer PING and take RATE messages are told when their update rate changes
+            if options.get("adapt") == "1":
+                conn.pings = True
+                welcome += " adapt=1"
+            #players get a session to RESUME with if their connection drops
+            if player_id in (1, 2):
+                if player_id not in self.sessions:
+                    self.sessions[player_id] = f"{self.match_id}-{secrets.token_hex(8)}"
+                welcome += f" session={self.sessions[player_id]}"
+            outgoing.append((conn, f"{welcome}\n".encode()))
+            #everything after the WELCOME line goes out as binary frames, starting with a full state
+            conn.binary = binary
+            if lockstep:
+                conn.lockstep = True
+                self.update_audience()
+                outgoing.append((conn, encode_sim_state(self.sim_values(), binary)))
+            elif self.started:
+                #the current state straight away rather than at the next change, which could be a while for
+                #a finished game or someone resuming mid-game
+                outgoing.append((conn, None))
+            return outgoing
+
+        #the answer to the PING pongConnection sends to time the round trip
+        if parts[0] == "PONG":
+            conn.pong(parts)
+            return outgoing
+
+        #a lockstep client whose simulation no longer matches the server's starts again from the server's
+        if parts[0] == "RESYNC":
+            if conn.lockstep:
+                outgoing.append((conn, encode_sim_state(self.sim_values(), conn.binary)))
+            return outgoing
+
+        # Handle PLAY_AGAIN command
+        if parts[0] == "PLAY_AGAIN":
+            # only players (1 or 2) count for rematch
+            if player_id in (1, 2):
+                self.ready_flags[player_id] = True
+                print(f"Match {self.match_id}: player {player_id} requested rematch")
+                # If both players ready -> reset game and notify everyone
+                if self.ready_flags.get(1) and self.ready_flags.get(2):
+                    self.reset_state()
+                    # send RESET to players and spectators
+                    for target in self.everyone():
+                        outgoing.append((target, encode_control("RESET", target.binary)))
+                        target.encoder.keyframe()
+                    for target in self.lockstep_audience:
+                        outgoing.append((target, encode_sim_state(self.sim_values(), target.binary)))
+                    print(f"Match {self.match_id}: rematch, game state reset and RESET broadcasted")
+            return outgoing
+
+        if self.tick_rate:
+            self._handle_input(player_id, parts)
+            return outgoing
+
+        # Regular update message parsing (expected 6 numbers)
+        if len(parts) >= 6 and player_id in (1, 2):
+            #every field is checked before any of them is applied
+            y_val = checked_int(parts[0], POSITION_RANGE)
+            ball_x, ball_y = checked_int(parts[1], POSITION_RANGE), checked_int(parts[2], POSITION_RANGE)
+            left_score, right_score = checked_int(parts[3], SCORE_RANGE), checked_int(parts[4], SCORE_RANGE)
+            their_sync = checked_int(parts[5], SYNC_RANGE)
+            #updates this players paddle position
+            self.paddle_y[player_id] = y_val
+            #player 1 keeps control of the ball and score
+            if player_id == 1:
+                self.ball_x = ball_x
+                self.ball_y = ball_y
+                self.left_score = left_score
+                self.right_score = right_score
+                self.sync_val = their_sync
+            else:
+                #player 2 can advance the sync value still
+                if their_sync > self.sync_val:
+                    self.sync_val = their_sync
+
+            self.publish()
+            outgoing.extend(self._check_game_over())
+        return outgoing
+
+    #paddle input for a server simulated match
+    #INPUT <up|down|none> <sync> sets the direction a paddle is moving, while the old 6 number update from
+    #clients that don't know about server simulation just places their paddle
+    def _handle_input(self, player_id, parts) -> None:
+        if player_id not in (1, 2):
+            return
+        if parts[0] == "INPUT" and len(parts) >= 2:
+            if len(parts) >= 3:
+                checked_int(parts[2], SYNC_RANGE)
+            self.sim.moves[player_id] = DIRECTIONS.get(parts[1], 0)
+        elif len(parts) >= 6:
+            y = max(WALL, min(SCREEN_H - WALL - PADDLE_H, checked_int(parts[0], POSITION_RANGE)))
+            self.sim.state = self.sim.state._replace(**{"p1_y" if player_id == 1 else "p2_y": y})
+            self.placed = True
+
+    #advances a server simulated match by one tick and publishes the new state, returning any control messages
+    #the caller must hold self.lock (threaded mode) or be the event loop thread
+    def tick(self) -> list:
+        if not self.started or len(self.players) < 2:
+            return []
+        outgoing = []
+        if not self.game_over:
+            inputs = (self.sim.moves[1], self.sim.moves[2])
+            for event in self.sim.step():
+                if event == "left":
+                    self.left_score += 1
+                elif event == "right":
+                    self.right_score += 1
+            state = self.sim.state
+            self.paddle_y[1] = state.p1_y
+            self.paddle_y[2] = state.p2_y
+            self.ball_x = state.ball_x
+            self.ball_y = state.ball_y
+            self.sync_val += 1
+            self.publish()
+            outgoing.extend(self._lockstep_messages(inputs))
+            outgoing.extend(self._check_game_over())
+        return outgoing
+
+    #what lockstep clients get for the tick just run: the inputs it ran with, and every HASH_INTERVAL ticks the
+    #hash they should have ended up at.  The same bytes go to everyone on the same protocol version.
+    def _lockstep_messages(self, inputs: tuple) -> list:
+        if not self.lockstep_audience:
+            self.placed = False
+            return []
+        if self.placed:
+            self.placed = False
+            values = self.sim_values()
+            return [(conn, encode_sim_state(values, conn.binary)) for conn in self.lockstep_audience]
+        outgoing = [(conn, encode_step(self.sync_val, *inputs, conn.binary)) for conn in self.lockstep_audience]
+        if self.sync_val % HASH_INTERVAL == 0:
+            state_hash = sim_hash(self.sim_values())
+            outgoing.extend((conn, encode_check(self.sync_val, state_hash, conn.binary))
+                            for conn in self.lockstep_audience)
+        return outgoing
+
+    # If a win happened and we haven't flagged game_over yet, broadcast GAME_OVER to everyone
+    def _check_game_over(self) -> list:
+        if self.game_over or (self.left_score < WIN_SCORE and self.right_score < WIN_SCORE):
+            return []
+        self.game_over = True
+        print(f"Match {self.match_id}: game over, left={self.left_score} right={self.right_score}")
+        #nothing more is recorded until a rematch, a viewer following the file sees the end now
+        if self.recorder is not None:
+            self.recorder.flush()
+        return [(conn, encode_control("GAME_OVER", conn.binary)) for conn in self.everyone()]
+
+    #tells everyone about the newest snapshot, nothing if it already went out (lockstep clients never need it)
+    #needs no lock: each connection writes whatever snapshot is current when it gets to it, so a broadcast that
+    #loses a race with a newer one still ends up sending the newer state
+    def broadcast(self) -> list:
+        snapshot = self.snapshot
+        if snapshot is self.broadcast_snapshot:
+            return []
+        self.broadcast_snapshot = snapshot
+        return [(conn, None) for conn in self.state_audience]
+
+#pairs incoming connections into matches
+#new players fill a vacated slot in a running match first, then the match waiting for a second player,
+#then open a new match.  Once max_matches are running (0 means no limit) extra players spectate.
+#A player who drops out of a running match has resume_grace seconds to RESUME before their slot is given away.
+class Matchmaker:
+    def __init__(self, max_matches: int = 1, tick_rate: int = 0, allow_binary: bool = True, udp=None,
+                 record_dir: str | None = None, resume_grace: float = RESUME_GRACE, swept: bool = False,
+                 speed: int = 1) -> None:
+        self.max_matches = max_matches
+        self.resume_grace = resume_grace
+        self.tick_rate = tick_rate
+        self.swept = swept
+        self.speed = speed
+        self.allow_binary = allow_binary
+        self.udp = udp
+        self.record_dir = record_dir
+        self.matches = {}
+        #sharded servers give every worker its own ids: next_id starts at the worker's number, id_step is how many
+        #workers there are
+        self.next_id = 1
+        self.id_step = 1
+        #lock to ensure matches arent created or joined at the same time (threaded mode)
+        self.lock = METRICS.lock("matchmaker")
+
+    #adds a connection to a match, sets its player_id and match attributes and sends CONFIG to whoever can
+    #start playing or watching now.  Returns those connections, they now need to be served
+    def assign(self, conn, spectator: bool = False) -> list:
+        with self.lock:
+            match = None
+            if not spectator:
+                match = self._match_for_player()
+            if match is None:
+                return self._add_spectator(conn)
+
+            with match.lock:
+                player_id = match.open_slot()
+                match.players[player_id] = conn
+                match.ready_flags[player_id] = False
+                conn.player_id = player_id
+                conn.match = match
+                print(f"Match {match.match_id}: player {player_id} connected")
+
+                if match.open_slot() is not None:
+                    #still waiting on an opponent, CONFIG goes out once they arrive
+                    return []
+                if match.started:
+                    #refilled a slot that was left mid-game
+                    starting = [conn]
+                else:
+                    match.start()
+                    print(f"Match {match.match_id}: both players connected, game is starting")
+                    starting = [match.players[1], match.players[2]]
+                for player in starting:
+                    player.send(config_message(player.player_id))
+                match.update_audience()
+                return starting
+
+    #removes a connection from its match, returning the spectators that have to be closed if the
+    #match is torn down
+    def remove(self, conn) -> list:
+        match = getattr(conn, "match", None)
+        if match is None:
+            return []
+        with self.lock:
+            with match.lock:
+                if match.players.get(conn.player_id) is conn:
+                    del match.players[conn.player_id]
+                    match.ready_flags[conn.player_id] = False
+                    if self.resume_grace and match.started and conn.player_id in match.sessions:
+                        match.reserved[conn.player_id] = time.monotonic() + self.resume_grace
+                        print(f"Match {match.match_id}: keeping player {conn.player_id}'s slot for "
+                              f"{self.resume_grace:g} s")
+                        #the match is paused, write out what led up to it
+                        if match.recorder is not None:
+                            match.recorder.flush()
+                if conn in match.spectators:
+                    match.spectators.remove(conn)
+                match.update_audience()
+                return self._close_if_idle(match)
+
+    #closes a match nobody is playing in or coming back to, returning the spectators that have to be closed
+    #the caller must hold self.lock and match.lock
+    def _close_if_idle(self, match) -> list:
+        if match.players or match.reserved:
+            return []
+        #nobody is playing, start over once new players arrive
+        match.sessions.clear()
+        match.stop()
+        if match.spectators and (self.max_matches == 1 or len(self.matches) == 1):
+            #keep the spectators around for the next game (single match server behaviour)
+            return []
+        del self.matches[match.match_id]
+        print(f"Match {match.match_id}: closed")
+        leftover = match.spectators
+        match.spectators = []
+        match.update_audience()
+        return leftover
+
+    def _match_for_player(self):
+        running = [m for m in self.matches.values() if m.started and m.open_slot() is not None]
+        if running:
+            return running[0]
+        waiting = [m for m in self.matches.values() if not m.started]
+        if waiting:
+            return waiting[0]
+        if self.max_matches and len(self.matches) >= self.max_matches:
+            return None
+        return self._new_match()
+
+    def _new_match(self) -> Match:
+        match = Match(self.next_id, self.tick_rate, self.allow_binary, self.udp, self.record_dir, self.swept,
+                      self.speed)
+        self.next_id += self.id_step
+        self.matches[match.match_id] = match
+        print(f"Match {match.match_id}: opened")
+        return match
+
+    #a snapshot of the open matches that is safe to iterate while connections come and go
+    def running(self) -> list:
+        with self.lock:
+            return list(self.matches.values())
+
+    #every player and spectator in an open match, for reporting
+    def connections(self) -> list:
+        return [conn for match in self.running()
+                for conn in list(match.players.values()) + list(match.spectators)]
+
+    #gives away the slots of players who didn't come back in time, returning the spectators that have to be
+    #closed for matches that are torn down because of it.  Called about once a second.
+    def expire_sessions(self) -> list:
+        now = time.monotonic()
+        leftover = []
+        with self.lock:
+            for match in list(self.matches.values()):
+                if not match.reserved:
+                    continue
+                with match.lock:
+                    expired = [pid for pid, deadline in match.reserved.items() if deadline <= now]
+                    for pid in expired:
+                        del match.reserved[pid]
+                        match.sessions.pop(pid, None)
+                        print(f"Match {match.match_id}: player {pid} didn't come back, the slot is open again")
+                    if expired:
+                        leftover += self._close_if_idle(match)
+        return leftover
+
+    #RESUME <token>: moves a connection from wherever assign() put it into the slot its session kept, and
+    #returns what has to be sent for it.  The client says HELLO again afterwards and gets the current state.
+    def resume(self, conn, parts) -> list:
+        token = parts[1] if len(parts) > 1 else ""
+        match_id = token.split("-")[0]
+        with self.lock:
+            match = self.matches.get(int(match_id)) if match_id.isdigit() else None
+            if match is None:
+                return [(conn, b"RESUME_FAILED\n")]
+            #sessions and reservations change under the match's lock (remove() and the match's own thread)
+            with match.lock:
+                player_id = match.session_player(token)
+                if player_id is None or not self._reserved(match, player_id):
+                    return [(conn, b"RESUME_FAILED\n")]
+        for spec in self.remove(conn):
+            spec.close()
+        with self.lock:
+            with match.lock:
+                #the slot may have run out (or been resumed by someone else) in the meantime
+                if not self._reserved(match, player_id) or self.matches.get(match.match_id) is not match:
+                    return [(conn, b"RESUME_FAILED\n")]
+                del match.reserved[player_id]
+                match.players[player_id] = conn
+                conn.player_id = player_id
+                conn.match = match
+                conn.encoder.keyframe()
+                match.update_audience()
+        print(f"Match {match.match_id}: player {player_id} resumed")
+        return [(conn, f"RESUMED {ROLES[player_id]}\n".encode())]
+
+    #true while player_id's slot is still kept for them, even if expire_sessions() hasn't got to it yet
+    #the caller must hold match.lock
+    def _reserved(self, match, player_id: int) -> bool:
+        deadline = match.reserved.get(player_id)
+        return deadline is not None and deadline > time.monotonic()
+
+    #spectators watch the running match with the smallest audience
+    def _add_spectator(self, conn) -> list:
+        candidates = [m for m in self.matches.values() if m.started] or list(self.matches.values())
+        if candidates:
+            match = min(candidates, key=lambda m: len(m.spectators))
+        else:
+            match = self._new_match()
+        with match.lock:
+            conn.player_id = 3
+            conn.match = match
+            conn.send(config_message(3))
+            match.spectators.append(conn)
+            match.update_audience()
+        print(f"Match {match.match_id}: spectator connected")
+        return [conn]
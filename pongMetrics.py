@@ -0,0 +1,184 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Counters and histograms for the server's hot paths (bytes and messages in and
+#                           out, parse errors, broadcast fan-out, lock wait and hold times, send queue depth,
+#                           ticks) and a small HTTP endpoint that serves them in the Prometheus text format.
+# Misc:                     Recording is a few integer additions with no locking of its own, so under heavy
+#                           contention an update can occasionally be lost; the figures are for watching
+#                           trends, not accounting.  Everything the server records goes to METRICS.
+# =================================================================================================
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#bucket upper bounds in seconds for the timing histograms, 10 us to 1 s
+TIME_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                0.1, 0.25, 0.5, 1.0)
+#bucket upper bounds for counts of queued items
+DEPTH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+#a number that only goes up
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: str = "") -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1) -> None:
+        self.value += amount
+
+    def samples(self) -> list:
+        return [(self.name, self.labels, self.value)]
+
+#counts observations into buckets, rendered cumulatively like Prometheus expects
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = TIME_BUCKETS, labels: str = "") -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.bounds = buckets
+        #one count per bound plus one for everything above the last
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> list:
+        samples = []
+        total = 0
+        prefix = self.labels + "," if self.labels else ""
+        for bound, count in zip(self.bounds + ("+Inf",), self.counts):
+            total += count
+            samples.append((self.name + "_bucket", f'{prefix}le="{bound}"', total))
+        samples.append((self.name + "_sum", self.labels, self.sum))
+        samples.append((self.name + "_count", self.labels, total))
+        return samples
+
+#a value read when the metrics are scraped: read() returns a number, or a list of (labels, number)
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read) -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self) -> list:
+        value = self.read()
+        if isinstance(value, list):
+            return [(self.name, labels, number) for labels, number in value]
+        return [(self.name, "", value)]
+
+#a threading.Lock that records how long callers waited for it and how long they held it
+class TimedLock:
+    def __init__(self, wait: Histogram, hold: Histogram) -> None:
+        self.lock = threading.Lock()
+        self.wait = wait
+        self.hold = hold
+        self.acquired_at = 0.0
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self.lock.acquire()
+        self.acquired_at = time.perf_counter()
+        self.wait.observe(self.acquired_at - started)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        held = time.perf_counter() - self.acquired_at
+        self.lock.release()
+        self.hold.observe(held)
+
+#every metric the server records, plus gauges registered by whoever can read them
+class ServerMetrics:
+    def __init__(self) -> None:
+        self.connections = Counter("pong_connections_total", "Client connections accepted")
+        self.disconnects = Counter("pong_disconnects_total", "Client connections closed")
+        self.lag_disconnects = Counter("pong_lag_disconnects_total",
+                                       "Clients disconnected for falling too far behind on their send queue")
+        self.bytes_in = Counter("pong_bytes_received_total", "Bytes read from client TCP connections")
+        self.bytes_out = Counter("pong_bytes_sent_total", "Bytes written to client TCP connections")
+        self.udp_bytes_in = Counter("pong_udp_bytes_received_total", "Bytes of UDP datagrams received")
+        self.udp_bytes_out = Counter("pong_udp_bytes_sent_total", "Bytes of UDP datagrams sent")
+        self.messages_in = Counter("pong_messages_received_total", "Client messages handled")
+        self.messages_out = Counter("pong_messages_sent_total", "Messages taken off send queues to be written")
+        self.parse_errors = Counter("pong_parse_errors_total", "Client messages dropped because they couldn't be parsed")
+        self.states_dropped = Counter("pong_states_replaced_total",
+                                      "Queued states replaced by a newer one before they were written")
+        self.ticks = Counter("pong_ticks_total", "Server simulation ticks run (all matches together)")
+        self.rate_changes = Counter("pong_rate_changes_total",
+                                    "Times a spectator's update rate was stepped down or back up")
+        self.rtt = Histogram("pong_rtt_seconds", "Round trips timed with PING and PONG")
+        self.broadcast_time = Histogram("pong_broadcast_seconds", "Time to queue one state broadcast to a match's audience")
+        self.broadcast_fanout = Histogram("pong_broadcast_fanout", "Connections one state broadcast was queued for",
+                                          DEPTH_BUCKETS)
+        self.tick_time = Histogram("pong_tick_seconds", "Time to tick and broadcast every match once")
+        self.queue_depth = Histogram("pong_send_queue_depth", "Items taken off a send queue in one go", DEPTH_BUCKETS)
+        self.locks = {}
+        self.gauges = []
+
+    #the wait/hold histograms for one kind of lock, shared by every lock of that kind
+    def lock(self, kind: str) -> TimedLock:
+        if kind not in self.locks:
+            labels = f'lock="{kind}"'
+            self.locks[kind] = (Histogram("pong_lock_wait_seconds", "Time spent waiting to take a lock", labels=labels),
+                                Histogram("pong_lock_hold_seconds", "Time a lock was held", labels=labels))
+        return TimedLock(*self.locks[kind])
+
+    def gauge(self, name: str, help: str, read) -> None:
+        self.gauges.append(Gauge(name, help, read))
+
+    #every metric in the Prometheus text exposition format
+    def render(self) -> str:
+        metrics = [value for value in vars(self).values() if isinstance(value, (Counter, Histogram))]
+        #samples of one name have to be next to each other
+        metrics += [wait for wait, _ in self.locks.values()] + [hold for _, hold in self.locks.values()]
+        metrics += self.gauges
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+METRICS = ServerMetrics()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    #scrapes every few seconds would flood the server's output otherwise
+    def log_message(self, format, *args) -> None:
+        pass
+
+#serves METRICS over HTTP from a background thread
+def serve_metrics(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
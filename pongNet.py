@@ -0,0 +1,153 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Client side networking that runs beside the game loop.  A receiver thread
+#                           reads the server socket as data arrives and a sender thread writes to it, so
+#                           drawing a frame never waits on the network.
+# Misc:                     The game loop calls poll() once per frame to pick up what has arrived.  When the
+#                           server gave us a UDP token, states also arrive (and our own per frame updates
+#                           go) over UDP, see pongUdp.py.
+# =================================================================================================
+
+import socket
+import threading
+import time
+
+from pongProtocol import HEADER, MSG_UDP_HELLO, MessageReader, coalesce, encode_pong, is_state
+from pongUdp import KEEPALIVE_INTERVAL, SERVER_FRAMES, LossyLink, SequenceFilter, pack_datagram, unpack_datagram
+
+class ServerLink:
+    def __init__(self, client: socket.socket, reader: MessageReader, udpToken:str | None = None,
+                 udpLoss:float = 0.0, udpLatency:float = 0.0) -> None:
+        self.client = client
+        self.reader = reader
+        # UDP socket to the same address and port as the TCP connection, only when the server offered one
+        self.udp = None
+        # states are taken in sync order once two channels can deliver them
+        self.sequence = None
+        if udpToken is not None:
+            self.udpToken = int(udpToken)
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.connect(client.getpeername())
+            self.udpLink = LossyLink(self.udp, udpLoss, udpLatency)
+            self.sequence = SequenceFilter()
+        #set once the server closes the connection or it breaks
+        self.closed = False
+        #messages received since the last poll, newest state only
+        self.inbox = []
+        self.outbox = []
+        self.lock = threading.Lock()
+        self.outboxReady = threading.Condition(self.lock)
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.sender = threading.Thread(target=self._send, daemon=True)
+
+    def start(self) -> None:
+        self.client.settimeout(None)
+        self.receiver.start()
+        self.sender.start()
+        if self.udp is not None:
+            threading.Thread(target=self._receiveDatagrams, daemon=True).start()
+
+    # Everything that arrived since the last call, in order.  If several state updates came in only the newest
+    # is returned, control messages are always kept.  Never blocks.
+    def poll(self) -> list[list]:
+        with self.lock:
+            inbox, self.inbox = self.inbox, []
+        return coalesce(inbox)
+
+    # Queues data for the sender thread, never blocks
+    def send(self, data: bytes) -> None:
+        with self.outboxReady:
+            self.outbox.append(data)
+            self.outboxReady.notify()
+
+    # For updates that replace the last one: goes over UDP when we have it (a lost one doesn't matter),
+    # otherwise the same as send
+    def sendState(self, frame: bytes) -> None:
+        if self.udp is not None:
+            self.udpLink.sendto(pack_datagram(self.udpToken, frame), None)
+        else:
+            self.send(frame)
+
+    def close(self) -> None:
+        self.closed = True
+        with self.outboxReady:
+            self.outboxReady.notify()
+        for sock in (self.client, self.udp):
+            try:
+                if sock is not None:
+                    sock.close()
+            except OSError:
+                pass
+
+    # Adds received messages to the inbox, dropping states older than one already taken when UDP is on.  PINGs are
+    # answered straight away from here, so the server times the network and not how long our frames take
+    def _deliver(self, batch: list[list]) -> None:
+        for parts in batch:
+            if parts[0] == "PING" and len(parts) > 1:
+                self.send(encode_pong(int(parts[1]), self.reader.binary))
+        batch = [parts for parts in batch if parts[0] != "PING"]
+        with self.lock:
+            if self.sequence is not None:
+                batch = [parts for parts in batch if not is_state(parts) or self.sequence.accept(int(parts[-1]))]
+            self.inbox.extend(batch)
+
+    def _receive(self) -> None:
+        # messages left over from the handshake
+        batch = self.reader.drain()
+        try:
+            while not self.closed:
+                if batch:
+                    self._deliver(batch)
+                data = self.client.recv(65536)
+                if not data:
+                    break
+                self.reader.feed(data)
+                batch = self.reader.drain()
+        except OSError:
+            pass
+        self.closed = True
+
+    def _receiveDatagrams(self) -> None:
+        while not self.closed:
+            try:
+                data = self.udp.recv(2048)
+            except ConnectionRefusedError:
+                # the server's port can be unreachable for a moment
+                continue
+            except OSError as e:
+                # anything else (the socket closed under us) would fail again straight away
+                if not self.closed:
+                    print(f"Stopped receiving UDP updates: {e}")
+                break
+            token, parts = unpack_datagram(data, SERVER_FRAMES)
+            if token == self.udpToken and parts is not None:
+                self._deliver([parts])
+
+    # Writes queued data to the server.  With UDP on it also says hello over UDP every KEEPALIVE_INTERVAL,
+    # the first one tells the server where to send our states
+    def _send(self) -> None:
+        nextHello = time.monotonic()
+        while True:
+            with self.outboxReady:
+                while not self.outbox and not self.closed:
+                    if self.udp is None:
+                        self.outboxReady.wait()
+                    elif time.monotonic() < nextHello:
+                        self.outboxReady.wait(nextHello - time.monotonic())
+                    else:
+                        break
+                if self.closed:
+                    return
+                data = b"".join(self.outbox)
+                self.outbox.clear()
+            if self.udp is not None and time.monotonic() >= nextHello:
+                nextHello = time.monotonic() + KEEPALIVE_INTERVAL
+                self.udpLink.sendto(pack_datagram(self.udpToken, HEADER.pack(0, MSG_UDP_HELLO)), None)
+            try:
+                if data:
+                    self.client.sendall(data)
+            except OSError:
+                self.closed = True
+                return
@@ -0,0 +1,285 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  The game's physics as a pure function on plain integers: the same paddle moves,
+#                           ball steps, bounces and points as helperCode.movePaddle/stepBall, without pygame
+#                           objects or a display.  The server simulates matches with it and pongBatch.py runs
+#                           thousands of them at once the same way.
+# Misc:                     Rects are (x, y, w, h) with pygame's integer rules, `python3 pongBatch.py --check`
+#                           compares all three implementations against each other.  step(swept=True) is an
+#                           alternative ball (server --swept) that finds the exact time it touches a paddle or
+#                           wall during a tick instead of testing overlap after the move, so it can't pass
+#                           through one however fast it goes; `python3 pongPhysics.py --check` tests it.
+# =================================================================================================
+
+import argparse
+import math
+import random
+import sys
+from fractions import Fraction
+from typing import NamedTuple
+
+SCREEN_W = 640
+SCREEN_H = 480
+PADDLE_H = 50
+PADDLE_W = 10
+PADDLE_SPEED = 5
+PADDLE_START_Y = (SCREEN_H // 2) - (PADDLE_H // 2)
+BALL_SIZE = 5
+BALL_SPEED = 5
+#thickness of the top and bottom walls
+WALL = 10
+#contacts the swept ball resolves in one tick, the rest of a tick after that is moved without looking (a ball
+#wedged between a paddle and a wall can't keep it busy forever)
+MAX_CONTACTS = 4
+
+#the part of a match that moves, everything else (walls, sizes) is fixed by the screen size
+class PhysicsState(NamedTuple):
+    p1_y: int
+    p2_y: int
+    ball_x: int
+    ball_y: int
+    ball_xvel: int
+    ball_yvel: int
+
+#the paddles centered and the ball in the middle heading left, like a new game in playGame
+def start_state(width: int = SCREEN_W, height: int = SCREEN_H) -> PhysicsState:
+    paddle_y = (height // 2) - (PADDLE_H // 2)
+    return PhysicsState(paddle_y, paddle_y, width // 2, height // 2, -BALL_SPEED, 0)
+
+#pygame.Rect.colliderect: overlapping by at least one pixel, touching edges don't count
+def overlaps(ax: int, ay: int, aw: int, ah: int, bx: int, by: int, bw: int, bh: int) -> bool:
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+#helperCode.movePaddle for a paddle at y moving in direction (-1 up, 0 still, 1 down)
+def move_paddle(y: int, direction: int, height: int = SCREEN_H) -> int:
+    if direction > 0 and y + PADDLE_H < height - WALL:
+        return y + PADDLE_SPEED
+    if direction < 0 and y > WALL:
+        return y - PADDLE_SPEED
+    return y
+
+#helperCode.stepBall after moving both paddles, i.e. one tick of MatchSimulation
+#returns the new state and the events in order: "left"/"right" when that side scored, "bounce" for every hit
+#with swept the ball is moved by sweep_ball instead, and a tick covers speed frames of the original game
+def step(state: PhysicsState, p1_dir: int, p2_dir: int, width: int = SCREEN_W, height: int = SCREEN_H,
+         swept: bool = False, speed: int = 1) -> tuple[PhysicsState, list[str]]:
+    if swept:
+        return swept_step(state, p1_dir, p2_dir, width, height, speed)
+    events = []
+    p1_y = move_paddle(state.p1_y, p1_dir, height)
+    p2_y = move_paddle(state.p2_y, p2_dir, height)
+    x = state.ball_x + state.ball_xvel
+    y = state.ball_y + state.ball_yvel
+    xvel, yvel = state.ball_xvel, state.ball_yvel
+
+    #past either edge is a point for the other side and the ball starts again towards the side that scored
+    if x > width:
+        events.append("left")
+        x, y, xvel, yvel = width // 2, height // 2, -BALL_SPEED, 0
+    elif x < 0:
+        events.append("right")
+        x, y, xvel, yvel = width // 2, height // 2, BALL_SPEED, 0
+
+    #a paddle sends the ball back, angled by how far from the paddle's center it hit
+    paddle_y = None
+    if overlaps(x, y, BALL_SIZE, BALL_SIZE, 10, p1_y, PADDLE_W, PADDLE_H):
+        paddle_y = p1_y
+    elif overlaps(x, y, BALL_SIZE, BALL_SIZE, width - 20, p2_y, PADDLE_W, PADDLE_H):
+        paddle_y = p2_y
+    if paddle_y is not None:
+        events.append("bounce")
+        xvel = -xvel
+        yvel = (y + BALL_SIZE // 2 - (paddle_y + PADDLE_H // 2)) // 2
+
+    if (overlaps(x, y, BALL_SIZE, BALL_SIZE, -WALL, 0, width + 2 * WALL, WALL)
+            or overlaps(x, y, BALL_SIZE, BALL_SIZE, -WALL, height - WALL, width + 2 * WALL, WALL)):
+        events.append("bounce")
+        yvel = -yvel
+    return PhysicsState(p1_y, p2_y, x, y, xvel, yvel), events
+
+# ==== Swept collisions ============================================================================
+# The ball's move over a tick is a straight line, so when it first touches a paddle or wall can be worked out
+# exactly (as a fraction of the move) instead of looking for an overlap afterwards.  The ball stops there,
+# bounces and goes on with what is left of the tick.  Only moves that come near something need fractions.
+
+#paddles and walls as (name, rect), the paddles first so a corner is a paddle hit like in step()
+def targets(p1_y: int, p2_y: int, width: int = SCREEN_W, height: int = SCREEN_H) -> list:
+    return [("left", (10, p1_y, PADDLE_W, PADDLE_H)), ("right", (width - 20, p2_y, PADDLE_W, PADDLE_H)),
+            ("top", (-WALL, 0, width + 2 * WALL, WALL)), ("bottom", (-WALL, height - WALL, width + 2 * WALL, WALL))]
+
+#when, as fractions of a move by d, the ball starting at p overlaps [lo, hi) on one axis: (enters, leaves),
+#None if it never does
+def _slab(p: int, d: int, lo: int, hi: int):
+    if d == 0:
+        return (-math.inf, math.inf) if p < hi and lo < p + BALL_SIZE else None
+    enters, leaves = Fraction(lo - BALL_SIZE - p, d), Fraction(hi - p, d)
+    return (enters, leaves) if d > 0 else (leaves, enters)
+
+#the first target the ball moving from (x, y) by (dx, dy) runs into as (fraction of the move, name), None if it
+#reaches the end of the move first.  A target only counts while the ball is heading into it (a paddle from the
+#front, a wall from inside the field), so a ball that just bounced off one doesn't hit it again
+def first_contact(x: int, y: int, dx: int, dy: int, rects: list):
+    heading = {"left": dx < 0, "right": dx > 0, "top": dy < 0, "bottom": dy > 0}
+    first = None
+    for name, (tx, ty, tw, th) in rects:
+        if not heading[name]:
+            continue
+        #nowhere near it, the usual case
+        if not overlaps(min(x, x + dx), min(y, y + dy), abs(dx) + BALL_SIZE, abs(dy) + BALL_SIZE, tx, ty, tw, th):
+            continue
+        across, down = _slab(x, dx, tx, tx + tw), _slab(y, dy, ty, ty + th)
+        if across is None or down is None:
+            continue
+        enters = max(across[0], down[0])
+        if 0 <= enters < 1 and enters < min(across[1], down[1]) and (first is None or enters < first[0]):
+            first = (enters, name)
+    return first
+
+#moves the ball one tick of speed frames with swept collisions, returning x, y, xvel, yvel and the bounces
+def sweep_ball(x: int, y: int, xvel: int, yvel: int, p1_y: int, p2_y: int, width: int = SCREEN_W,
+               height: int = SCREEN_H, speed: int = 1) -> tuple[int, int, int, int, list[str]]:
+    rects = targets(p1_y, p2_y, width, height)
+    events = []
+    #what is left of the tick, only a Fraction once something was hit
+    left = 1
+    for contacts in range(MAX_CONTACTS + 1):
+        dx, dy = math.floor(xvel * speed * left), math.floor(yvel * speed * left)
+        contact = first_contact(x, y, dx, dy, rects) if contacts < MAX_CONTACTS else None
+        if contact is None:
+            return x + dx, y + dy, xvel, yvel, events
+        when, name = contact
+        #exact on the axis it hit, rounded back towards the start on the other so the ball touches but never
+        #overlaps what it hit
+        x += int(dx * when)
+        y += int(dy * when)
+        events.append("bounce")
+        if name in ("left", "right"):
+            paddle_y = p1_y if name == "left" else p2_y
+            xvel = -xvel
+            yvel = (y + BALL_SIZE // 2 - (paddle_y + PADDLE_H // 2)) // 2
+        else:
+            yvel = -yvel
+        left *= 1 - when
+    return x, y, xvel, yvel, events
+
+#step() with the swept ball: paddles move speed frames, the ball speed frames' worth with every hit on the way,
+#then a ball past either edge scores like in step()
+def swept_step(state: PhysicsState, p1_dir: int, p2_dir: int, width: int = SCREEN_W, height: int = SCREEN_H,
+               speed: int = 1) -> tuple[PhysicsState, list[str]]:
+    p1_y, p2_y = state.p1_y, state.p2_y
+    for _ in range(speed):
+        p1_y = move_paddle(p1_y, p1_dir, height)
+        p2_y = move_paddle(p2_y, p2_dir, height)
+    x, y, xvel, yvel, events = sweep_ball(state.ball_x, state.ball_y, state.ball_xvel, state.ball_yvel, p1_y, p2_y,
+                                          width, height, speed)
+    if x > width:
+        events.append("left")
+        x, y, xvel, yvel = width // 2, height // 2, -BALL_SPEED, 0
+    elif x < 0:
+        events.append("right")
+        x, y, xvel, yvel = width // 2, height // 2, BALL_SPEED, 0
+    return PhysicsState(p1_y, p2_y, x, y, xvel, yvel), events
+
+#the first target the ball runs into found the slow way, moving it in tiny steps: (step it first overlaps at,
+#name), None if it doesn't
+def _stepped_contact(x: int, y: int, dx: int, dy: int, rects: list, steps: int):
+    heading = {"left": dx < 0, "right": dx > 0, "top": dy < 0, "bottom": dy > 0}
+    for i in range(1, steps + 1):
+        bx, by = x + Fraction(dx * i, steps), y + Fraction(dy * i, steps)
+        for name, rect in rects:
+            if heading[name] and overlaps(bx, by, BALL_SIZE, BALL_SIZE, *rect):
+                return i, name
+    return None
+
+#fast moves against the tiny step reference, and whole ticks of fast balls checked for passing through a paddle
+#or ending up inside something.  Returns whether everything passed
+def check_swept(cases: int, seed: int) -> bool:
+    rng = random.Random(seed)
+    failures = 0
+
+    #first_contact has to find the same target as moving the ball 1/8 pixel at a time, at the same time
+    for case in range(cases):
+        p1_y, p2_y = rng.randrange(WALL, SCREEN_H - WALL - PADDLE_H), rng.randrange(WALL, SCREEN_H - WALL - PADDLE_H)
+        rects = targets(p1_y, p2_y)
+        x, y = rng.randrange(20, SCREEN_W - 25), rng.randrange(WALL, SCREEN_H - WALL - BALL_SIZE)
+        #aimed near the paddles and walls, up to 80 pixels a tick
+        dx, dy = rng.randint(-80, 80), rng.randint(-80, 80)
+        if rng.random() < 0.5:
+            x = rng.choice((20, 25, 30, SCREEN_W - 30, SCREEN_W - 35, SCREEN_W - 40)) + rng.randint(0, 10)
+        steps = 8 * max(abs(dx), abs(dy), 1)
+        swept = first_contact(x, y, dx, dy, rects)
+        stepped = _stepped_contact(x, y, dx, dy, rects, steps)
+        agree = (swept is None) == (stepped is None)
+        if agree and swept is not None:
+            when, name = swept
+            i, stepped_name = stepped
+            agree = name == stepped_name and Fraction(i - 1, steps) <= when < Fraction(i, steps)
+        if not agree:
+            failures += 1
+            if failures <= 5:
+                print(f"Contact mismatch: ball ({x}, {y}) moving ({dx}, {dy}), paddles at {p1_y} and {p2_y}: "
+                      f"swept {swept}, stepped {stepped}")
+
+    #whole ticks at high speed: a ball in front of the paddles never ends up inside a paddle or wall, and never
+    #gets from in front of a paddle's face to behind it within the paddle's rows
+    tunnelled = {"swept": 0, "original": 0}
+    for case in range(cases):
+        speed = rng.randint(1, 4)
+        state = PhysicsState(rng.randrange(WALL, SCREEN_H - WALL - PADDLE_H),
+                             rng.randrange(WALL, SCREEN_H - WALL - PADDLE_H),
+                             rng.randrange(40, SCREEN_W - 45), rng.randrange(WALL, SCREEN_H - WALL - BALL_SIZE),
+                             rng.choice((-1, 1)) * rng.randint(5, 40), rng.randint(-30, 30))
+        for tick in range(200):
+            dirs = (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+            for swept, name in ((True, "swept"), (False, "original")):
+                if not swept and speed > 1:
+                    continue
+                after, events = step(state, *dirs, swept=swept, speed=speed)
+                if not events and _crossed_paddle(state, after):
+                    tunnelled[name] += 1
+                if swept:
+                    inside = [name for name, rect in targets(after.p1_y, after.p2_y)
+                              if overlaps(after.ball_x, after.ball_y, BALL_SIZE, BALL_SIZE, *rect)]
+                    if inside and _in_front(state.ball_x):
+                        failures += 1
+                        if failures <= 5:
+                            print(f"Ball inside {inside} after {state} -> {after} (speed {speed})")
+                    next_state = after
+            state = next_state
+    failures += tunnelled["swept"]
+    print(f"{cases} fast moves checked against tiny steps, {cases} matches x 200 fast ticks: "
+          f"{tunnelled['swept']} balls through a paddle with swept collisions, {tunnelled['original']} with the "
+          f"original ones, {failures} failures")
+    return failures == 0
+
+#true if the ball went from in front of either paddle's face to past it, level with the paddle, in one move
+#with nothing in the way (so a straight line)
+def _crossed_paddle(before: PhysicsState, after: PhysicsState) -> bool:
+    dx = after.ball_x - before.ball_x
+    for face, paddle_y in ((10 + PADDLE_W, after.p1_y), (SCREEN_W - 20 - BALL_SIZE, after.p2_y)):
+        if _in_front(before.ball_x) and min(before.ball_x, after.ball_x) < face < max(before.ball_x, after.ball_x):
+            #where the ball was when it reached the face
+            y = before.ball_y + (after.ball_y - before.ball_y) * Fraction(face - before.ball_x, dx)
+            if paddle_y - BALL_SIZE < y < paddle_y + PADDLE_H:
+                return True
+    return False
+
+#true if the ball hasn't got past either paddle's face
+def _in_front(ball_x: int) -> bool:
+    return 10 + PADDLE_W <= ball_x <= SCREEN_W - 20 - BALL_SIZE
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pong physics")
+    parser.add_argument("--check", action="store_true", help="test swept collisions on fast balls")
+    parser.add_argument("--cases", type=int, default=2000, help="random moves and matches to check")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for --check")
+    args = parser.parse_args()
+    if not args.check:
+        parser.print_help()
+        return
+    sys.exit(0 if check_swept(args.cases, args.seed) else 1)
+
+if __name__ == "__main__":
+    main()
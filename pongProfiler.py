@@ -0,0 +1,128 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Frame time profiler for the client (--profile).  Times each part of a playGame
+#                           frame (handling events, the network, physics, drawing and waiting in clock.tick),
+#                           shows a rolling FPS and breakdown over the game, and can write every frame to a CSV
+#                           file together with the gaps between network messages and how far our sync is from
+#                           the last one the server sent.
+# Misc:                     Without --profile playGame gets a NullProfiler whose methods do nothing, so the
+#                           loop only pays for a few empty calls a frame.
+# =================================================================================================
+
+import csv
+import time
+from collections import deque
+
+# Parts of a frame in the order playGame runs them, a mark() ends one
+PHASES = ("events", "network", "physics", "render", "tick")
+# Short names for the overlay
+LABELS = {"events": "ev", "network": "net", "physics": "phys", "render": "draw", "tick": "wait"}
+# Frames the overlay averages over, and how often it changes (rendering text every frame would cost more than
+# most of what it measures)
+WINDOW = 120
+HUD_INTERVAL = 0.5
+
+class FrameProfiler:
+    # font draws the overlay, csvPath (if given) gets one row per frame
+    def __init__(self, font, csvPath:str | None = None) -> None:
+        self.font = font
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.frame = 0
+        self.times = dict.fromkeys(PHASES, 0.0)
+        # Rolling window of (frame time, phase times) for the overlay
+        self.recent = deque(maxlen=WINDOW)
+        self.hud = []
+        self.nextHud = self.started + HUD_INTERVAL
+        # When messages last came in from the server, and the gap before them (None on frames with none)
+        self.lastReceived = None
+        self.messages = 0
+        self.gap = None
+        self.gaps = deque(maxlen=WINDOW)
+        self.file = None
+        self.writer = None
+        if csvPath:
+            self.file = open(csvPath, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["frame", "time_s", *(f"{phase}_ms" for phase in PHASES), "frame_ms", "messages",
+                                  "recv_gap_ms", "local_sync", "remote_sync", "sync_drift"])
+            print(f"Writing frame times to {csvPath}")
+
+    # Ends the current phase, everything since the last mark is counted towards it
+    def mark(self, phase:str) -> None:
+        now = time.perf_counter()
+        self.times[phase] += now - self.last
+        self.last = now
+
+    # count messages came out of the link this frame
+    def received(self, count:int) -> None:
+        if not count:
+            return
+        now = time.perf_counter()
+        if self.lastReceived is not None:
+            self.gap = now - self.lastReceived
+            self.gaps.append(self.gap)
+        self.lastReceived = now
+        self.messages += count
+
+    # Finishes a frame: our sync and the newest one the server sent (None before the first)
+    def endFrame(self, localSync:int, remoteSync:int | None) -> None:
+        frameTime = sum(self.times.values())
+        self.recent.append((frameTime, tuple(self.times.values())))
+        if self.writer is not None:
+            drift = "" if remoteSync is None else localSync - remoteSync
+            self.writer.writerow([self.frame, f"{self.last - self.started:.4f}",
+                                  *(f"{self.times[phase] * 1000:.3f}" for phase in PHASES),
+                                  f"{frameTime * 1000:.3f}", self.messages,
+                                  "" if self.gap is None else f"{self.gap * 1000:.3f}",
+                                  localSync, "" if remoteSync is None else remoteSync, drift])
+        if self.last >= self.nextHud:
+            self.nextHud = self.last + HUD_INTERVAL
+            self._updateHud(localSync, remoteSync)
+        self.frame += 1
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.messages = 0
+        self.gap = None
+
+    def _updateHud(self, localSync:int, remoteSync:int | None) -> None:
+        frames = len(self.recent)
+        average = sum(frameTime for frameTime, _ in self.recent) / frames
+        worst = max(frameTime for frameTime, _ in self.recent)
+        phases = [sum(times[i] for _, times in self.recent) / frames for i in range(len(PHASES))]
+        self.hud = [
+            f"{1 / average if average else 0:.0f} fps  {average * 1000:.1f} ms  worst {worst * 1000:.1f}",
+            "  ".join(f"{LABELS[phase]} {value * 1000:.1f}" for phase, value in zip(PHASES, phases)),
+        ]
+        network = f"worst gap {max(self.gaps) * 1000:.0f} ms" if self.gaps else "no messages"
+        if remoteSync is not None:
+            network += f"  drift {localSync - remoteSync:+d}"
+        self.hud.append(network)
+
+    # Draws the overlay in the top left corner, call it before renderer.present()
+    def draw(self, renderer) -> None:
+        for line, text in enumerate(self.hud):
+            renderer.text(f"profile{line}", self.font, text, (25, 15 + line * 18), topLeft=True)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+# What playGame uses without --profile
+class NullProfiler:
+    def mark(self, phase:str) -> None:
+        pass
+
+    def received(self, count:int) -> None:
+        pass
+
+    def endFrame(self, localSync:int, remoteSync:int | None) -> None:
+        pass
+
+    def draw(self, renderer) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
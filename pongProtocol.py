@@ -0,0 +1,343 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Wire formats shared by the client and server.  Every connection starts in the
+#                           original newline separated text protocol; a client that sends
+#                           "HELLO proto=bin2,bin1" and gets "WELCOME ... proto=binN" back switches to the
+#                           compact binary frames below for everything after those two lines.
+# Misc:                     Binary frames are a 1 byte payload length, a 1 byte message type and a fixed
+#                           layout payload.  Both formats decode to the same list of fields that
+#                           split() gives for a text line, so the game code handles them the same way.
+# =================================================================================================
+
+import functools
+import struct
+import zlib
+
+#binary protocol versions, newest first.  1 sends every state in full, 2 adds delta frames
+PROTOCOL_VERSION = 2
+BINARY_VERSIONS = (2, 1)
+#value of the proto= option a client puts in HELLO to offer every version it speaks
+BINARY_PROTOCOL = ",".join(f"bin{version}" for version in BINARY_VERSIONS)
+
+#message types
+MSG_STATE = 1       # server -> client: p1Y p2Y ballX ballY lScore rScore sync
+MSG_UPDATE = 2      # client -> server: paddleY ballX ballY lScore rScore sync
+MSG_INPUT = 3       # client -> server: paddle direction and sync (server simulated matches)
+MSG_GAME_OVER = 4
+MSG_RESET = 5
+MSG_PLAY_AGAIN = 6
+MSG_DELTA = 7       # server -> client (version 2): the fields that changed since the last state sent
+MSG_UDP_HELLO = 8   # client -> server, UDP only: registers the address the client's datagrams come from
+MSG_STEP = 9        # server -> lockstep client: both paddle directions for the next tick
+MSG_CHECK = 10      # server -> lockstep client: tick and hash of the simulation after it
+MSG_SIMSTATE = 11   # server -> lockstep client: the whole simulation, to start from or recover with
+MSG_RESYNC = 12     # lockstep client -> server: asks for a SIMSTATE after a desync
+MSG_PING = 13       # server -> client that said adapt=1: answer with a PONG of the same number
+MSG_PONG = 14       # client -> server: the answer to a PING, timing the round trip
+MSG_RATE = 15       # server -> client that said adapt=1: states now come at most this many times a second (0: all)
+
+HEADER = struct.Struct("!BB")
+STATE = struct.Struct("!hhhhBBI")
+UPDATE = struct.Struct("!hhhBBI")
+INPUT = struct.Struct("!bI")
+#what the STATE fields can hold: positions are int16, scores a byte and sync a uint32.  Anything a client reports
+#has to fit before it becomes part of a match, or encoding the match's states fails for everyone
+POSITION_RANGE = (-0x8000, 0x7FFF)
+SCORE_RANGE = (0, 0xFF)
+SYNC_RANGE = (0, 0xFFFFFFFF)
+#lockstep: a STEP is the low byte of its tick (to catch a missed step) and both directions packed in a byte
+STEP = struct.Struct("!BB")
+CHECK = struct.Struct("!II")
+#tick p1Y p2Y ballX ballY ballXVel ballYVel lScore rScore
+SIMSTATE = struct.Struct("!IhhhhhhBB")
+PING = struct.Struct("!I")
+RATE = struct.Struct("!B")
+#a delta is a bit mask of the changed fields and how far sync moved on, followed by the changed fields
+DELTA = struct.Struct("!BB")
+DELTA_FIELDS = STATE.format[1:-1]
+#header and payload packed in one call for the messages sent every frame
+STATE_FRAME = struct.Struct("!BB" + STATE.format[1:])
+UPDATE_FRAME = struct.Struct("!BB" + UPDATE.format[1:])
+INPUT_FRAME = struct.Struct("!BB" + INPUT.format[1:])
+
+CONTROLS = {"GAME_OVER": MSG_GAME_OVER, "RESET": MSG_RESET, "PLAY_AGAIN": MSG_PLAY_AGAIN, "RESYNC": MSG_RESYNC}
+CONTROL_NAMES = {msg_type: name for name, msg_type in CONTROLS.items()}
+CONTROL_FRAMES = {name: HEADER.pack(0, msg_type) for name, msg_type in CONTROLS.items()}
+CONTROL_LINES = {name: f"{name}\n".encode() for name in CONTROLS}
+
+#messages that change how the rest of the stream is read, drain() stops after one of them
+HANDSHAKES = ("HELLO", "WELCOME")
+
+#states sent between forced full frames
+KEYFRAME_INTERVAL = 60
+#encoded states remembered, every client watching a match is sent the same few frames for each snapshot so they
+#are only built once and the same bytes object goes to all of them
+FRAME_CACHE_SIZE = 4096
+
+#paddle directions as sent in INPUT messages
+DIRECTIONS = {"up": -1, "": 0, "down": 1}
+DIRECTION_NAMES = {-1: "up", 0: "none", 1: "down"}
+
+#ticks between the simulation hashes lockstep clients check themselves against
+HASH_INTERVAL = 30
+
+#GAME_OVER, RESET or PLAY_AGAIN
+def encode_control(name: str, binary: bool) -> bytes:
+    return CONTROL_FRAMES[name] if binary else CONTROL_LINES[name]
+
+#picks the newest binary version offered in a HELLO proto= option that we also speak, 0 for text
+def choose_protocol(offer: str, allowed: bool = True) -> int:
+    offered = offer.split(",")
+    for version in BINARY_VERSIONS:
+        if allowed and f"bin{version}" in offered:
+            return version
+    return 0
+
+#the state line text clients get: players see the other paddle and spectators see both
+#state is the tuple (p1Y, p2Y, ballX, ballY, lScore, rScore, sync)
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def encode_text_state(state: tuple, player_id: int) -> bytes:
+    p1_y, p2_y, ball_x, ball_y, l_score, r_score, sync = state
+    shared = f"{ball_x} {ball_y} {l_score} {r_score} {sync}\n"
+    if player_id == 1:
+        return f"{p2_y} {shared}".encode()
+    if player_id == 2:
+        return f"{p1_y} {shared}".encode()
+    return f"{p1_y} {p2_y} {shared}".encode()
+
+#the full game state, binary clients get this same frame whatever their role
+def encode_state(p1_y: int, p2_y: int, ball_x: int, ball_y: int, l_score: int, r_score: int, sync: int) -> bytes:
+    return STATE_FRAME.pack(STATE.size, MSG_STATE, p1_y, p2_y, ball_x, ball_y, l_score, r_score, sync)
+
+#encode_state for a state tuple, built once per state
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def encode_full_state(state: tuple) -> bytes:
+    return encode_state(*state)
+
+#a player's paddle position, and the ball and score when they are the one running it
+def encode_update(paddle_y: int, ball_x: int, ball_y: int, l_score: int, r_score: int, sync: int, binary: bool) -> bytes:
+    if binary:
+        return UPDATE_FRAME.pack(UPDATE.size, MSG_UPDATE, paddle_y, ball_x, ball_y, l_score, r_score, sync)
+    return f"{paddle_y} {ball_x} {ball_y} {l_score} {r_score} {sync}\n".encode()
+
+#which way a player's paddle is moving ("up", "down" or "")
+def encode_input(moving: str, sync: int, binary: bool) -> bytes:
+    if binary:
+        return INPUT_FRAME.pack(INPUT.size, MSG_INPUT, DIRECTIONS[moving], sync)
+    return f"INPUT {moving or 'none'} {sync}\n".encode()
+
+#one packer per combination of changed fields, made when first needed
+_delta_structs = {}
+
+def _delta_struct(mask: int) -> struct.Struct:
+    packer = _delta_structs.get(mask)
+    if packer is None:
+        fields = "".join(code for bit, code in enumerate(DELTA_FIELDS) if mask & (1 << bit))
+        packer = _delta_structs[mask] = struct.Struct("!" + fields)
+    return packer
+
+#a delta frame taking a client that has base to state, None if sync moved too far for one
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def encode_delta(base: tuple, state: tuple) -> bytes | None:
+    step = state[6] - base[6]
+    if not 0 <= step <= 255:
+        return None
+    mask = 0
+    changed = []
+    for bit in range(len(DELTA_FIELDS)):
+        if state[bit] != base[bit]:
+            mask |= 1 << bit
+            changed.append(state[bit])
+    payload = DELTA.pack(mask, step) + _delta_struct(mask).pack(*changed)
+    return HEADER.pack(len(payload), MSG_DELTA) + payload
+
+#rebuilds the full state from the last one and a delta payload
+def apply_delta(base: tuple, payload) -> list:
+    mask, step = DELTA.unpack_from(payload)
+    changed = iter(_delta_struct(mask).unpack_from(payload, DELTA.size))
+    state = [next(changed) if mask & (1 << bit) else base[bit] for bit in range(len(DELTA_FIELDS))]
+    state.append(base[6] + step)
+    return state
+
+#per connection encoder for outgoing states
+#a state whose paddles, ball and score match the last one sent is skipped entirely.  Binary version 2 clients
+#get delta frames against the last state written to them, with a full frame every KEYFRAME_INTERVAL states,
+#whenever keyframe() has been called (a reset) and after the client switches protocol.  TCP delivers in order, so
+#the last state written is the one the client will have applied before the next.
+class StateEncoder:
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL) -> None:
+        self.keyframe_interval = keyframe_interval
+        self.keyframe()
+
+    #makes the next state go out in full
+    def keyframe(self) -> None:
+        self.last = None
+        self.since_keyframe = 0
+        self.binary = None
+
+    #bytes to send for state, or None when the client already has it
+    def encode(self, state: tuple, binary: int, player_id: int) -> bytes | None:
+        if binary != self.binary:
+            self.keyframe()
+            self.binary = binary
+        last = self.last
+        if last is not None and state[:6] == last[:6]:
+            return None
+        self.last = state
+        if not binary:
+            return encode_text_state(state, player_id)
+        if binary >= 2 and last is not None and self.since_keyframe < self.keyframe_interval:
+            frame = encode_delta(last, state)
+            if frame is not None:
+                self.since_keyframe += 1
+                return frame
+        self.since_keyframe = 0
+        return encode_full_state(state)
+
+#the inputs both paddles moved with on one lockstep tick, directions as in DIRECTIONS
+@functools.lru_cache(maxsize=FRAME_CACHE_SIZE)
+def encode_step(tick: int, p1_dir: int, p2_dir: int, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(STEP.size, MSG_STEP) + STEP.pack(tick & 0xFF, (p1_dir + 1) | (p2_dir + 1) << 2)
+    return f"STEP {tick & 0xFF} {DIRECTION_NAMES[p1_dir]} {DIRECTION_NAMES[p2_dir]}\n".encode()
+
+def encode_check(tick: int, state_hash: int, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(CHECK.size, MSG_CHECK) + CHECK.pack(tick, state_hash)
+    return f"CHECK {tick} {state_hash}\n".encode()
+
+#values is (tick, p1Y, p2Y, ballX, ballY, ballXVel, ballYVel, lScore, rScore)
+def encode_sim_state(values: tuple, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(SIMSTATE.size, MSG_SIMSTATE) + SIMSTATE.pack(*values)
+    return ("SIMSTATE " + " ".join(str(value) for value in values) + "\n").encode()
+
+#PING and PONG carry the same number, the server matches them up to time the round trip
+def encode_ping(number: int, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(PING.size, MSG_PING) + PING.pack(number)
+    return f"PING {number}\n".encode()
+
+def encode_pong(number: int, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(PING.size, MSG_PONG) + PING.pack(number)
+    return f"PONG {number}\n".encode()
+
+#the most states a second the server sends this client now, 0 for every update
+def encode_rate(hz: int, binary: int) -> bytes:
+    if binary:
+        return HEADER.pack(RATE.size, MSG_RATE) + RATE.pack(hz)
+    return f"RATE {hz}\n".encode()
+
+#a hash of the simulation values both ends compute the same way, crc32 of their SIMSTATE packing
+def sim_hash(values) -> int:
+    return zlib.crc32(SIMSTATE.pack(*values))
+
+#reads key=value options out of a HELLO or WELCOME line
+def parse_options(parts) -> dict[str, str]:
+    return dict(part.split("=", 1) for part in parts[1:] if "=" in part)
+
+#true for the numeric state updates and player updates, where a newer one makes an older one worthless
+def is_state(parts) -> bool:
+    first = parts[0]
+    return isinstance(first, int) or first.lstrip("-").isdigit()
+
+#drops every state update and paddle input that a later one in the batch replaces, keeping everything else
+#in its original order
+def coalesce(batch: list[list]) -> list[list]:
+    latest_state = latest_input = None
+    for i, parts in enumerate(batch):
+        if parts[0] == "INPUT":
+            latest_input = i
+        elif is_state(parts):
+            latest_state = i
+    return [parts for i, parts in enumerate(batch)
+            if i in (latest_state, latest_input) or not (parts[0] == "INPUT" or is_state(parts))]
+
+#turns one binary frame into the fields a text line would have split into, None for unknown types
+def decode_frame(msg_type: int, payload) -> list | None:
+    try:
+        if msg_type == MSG_STATE:
+            return list(STATE.unpack(payload))
+        if msg_type == MSG_UPDATE:
+            return list(UPDATE.unpack(payload))
+        if msg_type == MSG_INPUT:
+            direction, sync = INPUT.unpack(payload)
+            return ["INPUT", DIRECTION_NAMES.get(direction, "none"), sync]
+        if msg_type == MSG_STEP:
+            tick, packed = STEP.unpack(payload)
+            return ["STEP", tick, DIRECTION_NAMES.get((packed & 3) - 1, "none"),
+                    DIRECTION_NAMES.get((packed >> 2 & 3) - 1, "none")]
+        if msg_type == MSG_CHECK:
+            return ["CHECK", *CHECK.unpack(payload)]
+        if msg_type == MSG_SIMSTATE:
+            return ["SIMSTATE", *SIMSTATE.unpack(payload)]
+        if msg_type == MSG_PING:
+            return ["PING", *PING.unpack(payload)]
+        if msg_type == MSG_PONG:
+            return ["PONG", *PING.unpack(payload)]
+        if msg_type == MSG_RATE:
+            return ["RATE", *RATE.unpack(payload)]
+    except struct.error:
+        return None
+    if msg_type in CONTROL_NAMES:
+        return [CONTROL_NAMES[msg_type]]
+    return None
+
+#buffers a socket's byte stream and splits it back into messages
+#starts out reading text lines, set binary to the negotiated version to read frames
+class MessageReader:
+    def __init__(self, data: bytes = b"") -> None:
+        self.buffer = bytearray(data)
+        self.binary = 0
+        #the last full state read, what delta frames build on
+        self.state = None
+
+    def feed(self, data: bytes) -> None:
+        self.buffer += data
+
+    #yields every complete message in the buffer as a list of fields
+    #binary may be switched on between messages, the rest of the buffer is then read as frames
+    def messages(self):
+        while True:
+            if self.binary:
+                if len(self.buffer) < HEADER.size:
+                    return
+                length, msg_type = HEADER.unpack_from(self.buffer)
+                end = HEADER.size + length
+                if len(self.buffer) < end:
+                    return
+                payload = bytes(self.buffer[HEADER.size:end])
+                del self.buffer[:end]
+                if msg_type == MSG_DELTA:
+                    #a delta without a full state before it can't be used, wait for the next keyframe
+                    try:
+                        parts = apply_delta(self.state, payload) if self.state is not None else None
+                    except struct.error:
+                        parts = None
+                else:
+                    parts = decode_frame(msg_type, payload)
+                if msg_type in (MSG_STATE, MSG_DELTA) and parts is not None:
+                    self.state = parts
+            else:
+                end = self.buffer.find(b"\n")
+                if end < 0:
+                    return
+                parts = self.buffer[:end].decode(errors="replace").split()
+                del self.buffer[:end + 1]
+            if parts:
+                yield parts
+
+    #every complete message in the buffer, in order, except that when several state updates (or several
+    #paddle inputs) arrived together only the newest one is kept since it replaces the others anyway.
+    #Control messages are always kept.  Stops after a HELLO or WELCOME so the caller can switch binary
+    #on before the rest is read, call it again until it comes back empty.
+    def drain(self) -> list[list]:
+        batch = []
+        for parts in self.messages():
+            batch.append(parts)
+            if parts[0] in HANDSHAKES:
+                break
+        return coalesce(batch)
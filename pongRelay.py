@@ -0,0 +1,246 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Spectator relay.  Connects to a Pong server (or another relay) as one spectator
+#                           and serves the same stream to any number of spectators of its own, so a big
+#                           audience costs the players' server a single connection.  Relays can be chained
+#                           and run on as many machines as needed.
+# Misc:                     Downstream spectators see exactly what the server's spectator port gives them:
+#                           CONFIG spectator, the HELLO/WELCOME handshake, 7 field states (delta encoded for
+#                           binary clients), GAME_OVER and RESET.  Everything runs on one selector thread with
+#                           the same per client send queues as the server (pongConnection.py).
+# =================================================================================================
+
+import argparse
+import selectors
+import socket
+import time
+
+from pongConnection import MAX_LAG, RATE_INTERVAL, LoopConnection
+from pongMatch import Snapshot, config_message
+from pongProtocol import BINARY_PROTOCOL, MessageReader, choose_protocol, encode_control, is_state, parse_options
+from pongServer import queue_messages
+
+#seconds between attempts to reach the upstream server after losing it
+RECONNECT_DELAY = 1.0
+
+#what downstream connections see as their match: the newest state from upstream and who is watching
+class RelayFeed:
+    def __init__(self, allow_binary: bool = True) -> None:
+        self.match_id = "relay"
+        self.allow_binary = allow_binary
+        self.snapshot = None
+        self.broadcast_snapshot = None
+        #the WELCOME options upstream gave us, passed on to our own spectators
+        self.welcome = {"sim": "client"}
+        self.audience = []
+
+    #a downstream spectator's HELLO or PONG, everything else they send is ignored
+    def handle_message(self, conn, parts) -> list:
+        if parts[0] == "PONG":
+            conn.pong(parts)
+            return []
+        if parts[0] != "HELLO":
+            return []
+        options = parse_options(parts)
+        welcome = "WELCOME " + " ".join(f"{key}={self.welcome[key]}" for key in ("sim", "rate") if key in self.welcome)
+        binary = choose_protocol(options.get("proto", ""), self.allow_binary)
+        if binary:
+            welcome += f" proto=bin{binary}"
+        #update rates adapt to each spectator's link here too (pongConnection.py)
+        if options.get("adapt") == "1":
+            conn.pings = True
+            welcome += " adapt=1"
+        conn.binary = binary
+        return [(conn, f"{welcome}\n".encode())]
+
+    #one message from upstream, returns the (connection, message) pairs it causes downstream
+    def handle_upstream(self, parts) -> list:
+        if parts[0] == "WELCOME":
+            self.welcome = parse_options(parts)
+            return []
+        if parts[0] in ("GAME_OVER", "RESET"):
+            outgoing = []
+            for conn in self.audience:
+                outgoing.append((conn, encode_control(parts[0], conn.binary)))
+                if parts[0] == "RESET":
+                    conn.encoder.keyframe()
+            return outgoing
+        if is_state(parts) and len(parts) >= 7:
+            self.snapshot = Snapshot(*(int(value) for value in parts[:7]))
+        return []
+
+    #the newest state for everyone, nothing if it already went out (same as Match.broadcast)
+    def broadcast(self) -> list:
+        snapshot = self.snapshot
+        if snapshot is None or snapshot is self.broadcast_snapshot:
+            return []
+        self.broadcast_snapshot = snapshot
+        return [(conn, None) for conn in self.audience]
+
+#the connection to the server being relayed
+class Upstream:
+    def __init__(self, host: str, port: int, selector: selectors.BaseSelector) -> None:
+        self.host = host
+        self.port = port
+        self.selector = selector
+        self.sock = None
+        self.reader = None
+        self.next_attempt = 0.0
+
+    #tries to (re)connect once it is time to, returns whether it is connected now
+    def connect(self) -> bool:
+        if self.sock is not None:
+            return True
+        if time.monotonic() < self.next_attempt:
+            return False
+        self.next_attempt = time.monotonic() + RECONNECT_DELAY
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=RECONNECT_DELAY)
+        except OSError as e:
+            print(f"Can't reach {self.host}:{self.port} ({e}), retrying")
+            return False
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        self.sock = sock
+        self.reader = MessageReader()
+        self.selector.register(sock, selectors.EVENT_READ, self)
+        print(f"Relaying {self.host}:{self.port}")
+        return True
+
+    #everything upstream has sent, None once it has gone away
+    def receive(self) -> list | None:
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return []
+        except OSError:
+            data = b""
+        if not data:
+            print(f"Lost {self.host}:{self.port}")
+            self.selector.unregister(self.sock)
+            self.sock.close()
+            self.sock = None
+            return None
+        self.reader.feed(data)
+        messages = []
+        batch = self.reader.drain()
+        while batch:
+            for parts in batch:
+                if parts[0] == "CONFIG":
+                    #on a server's main port we'd take a player's place whenever one is free
+                    if parts[-1] != "spectator":
+                        self.sock.close()
+                        raise SystemExit(f"{self.host}:{self.port} gave the relay the {parts[-1]} paddle, "
+                                         f"point --upstream at the server's --spectator-port")
+                    #we join as a spectator, ask for binary frames like any up to date client
+                    self.sock.sendall(f"HELLO proto={BINARY_PROTOCOL}\n".encode())
+                elif parts[0] == "WELCOME":
+                    self.reader.binary = choose_protocol(parse_options(parts).get("proto", ""))
+                messages.append(parts)
+            batch = self.reader.drain()
+        return messages
+
+def run_relay(upstream_host: str, upstream_port: int, host: str, port: int, allow_binary: bool = True,
+              max_lag: float = MAX_LAG) -> None:
+    selector = selectors.DefaultSelector()
+    feed = RelayFeed(allow_binary)
+    upstream = Upstream(upstream_host, upstream_port, selector)
+    upstream.connect()
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    listener.setblocking(False)
+    selector.register(listener, selectors.EVENT_READ, None)
+    print(f"Pong relay is serving spectators on {host}:{port}")
+
+    pending = set()
+    #spectators holding a state back until their update rate allows it
+    paced = set()
+    next_rate_check = time.monotonic() + RATE_INTERVAL
+
+    def drop(conn):
+        if conn in feed.audience:
+            feed.audience.remove(conn)
+        conn.close()
+
+    while True:
+        deadlines = [next_rate_check] + [conn.state_due for conn in paced]
+        if not upstream.sock:
+            deadlines.append(upstream.next_attempt)
+        for key, mask in selector.select(max(0.0, min(deadlines) - time.monotonic())):
+            if key.data is None:
+                while True:
+                    try:
+                        sock, addr = listener.accept()
+                    except BlockingIOError:
+                        break
+                    conn = LoopConnection(sock, addr, selector, max_lag)
+                    conn.player_id = 3
+                    conn.match = feed
+                    conn.send(config_message(3))
+                    feed.audience.append(conn)
+                    pending.add(conn)
+                continue
+            if key.data is upstream:
+                messages = upstream.receive()
+                for parts in messages or []:
+                    queue_messages(feed.broadcast(), pending)
+                    queue_messages(feed.handle_upstream(parts), pending)
+                queue_messages(feed.broadcast(), pending)
+                continue
+            conn = key.data
+            if mask & selectors.EVENT_WRITE:
+                conn.flush()
+                if conn.holding():
+                    paced.add(conn)
+            if mask & selectors.EVENT_READ and not conn.closed:
+                if not conn.receive():
+                    drop(conn)
+                    continue
+                batch = conn.reader.drain()
+                while batch:
+                    for parts in batch:
+                        queue_messages(feed.handle_message(conn, parts), pending)
+                    conn.reader.binary = conn.binary
+                    batch = conn.reader.drain()
+            if conn.closed:
+                drop(conn)
+
+        upstream.connect()
+        now = time.monotonic()
+        if now >= next_rate_check:
+            next_rate_check = now + RATE_INTERVAL
+            for conn in feed.audience:
+                if conn.adapt_rate():
+                    pending.add(conn)
+        for conn in [conn for conn in paced if conn.state_due <= now or conn.closed]:
+            paced.discard(conn)
+            pending.add(conn)
+        for conn in pending:
+            conn.flush()
+            if conn.closed:
+                drop(conn)
+            elif conn.holding():
+                paced.add(conn)
+        pending.clear()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relay a Pong server's spectator stream to more spectators")
+    parser.add_argument("--upstream", required=True, metavar="HOST:PORT",
+                        help="server (its spectator port) or relay to relay")
+    parser.add_argument("--host", default="0.0.0.0", help="address to serve spectators on")
+    parser.add_argument("--port", type=int, default=5100, help="port to serve spectators on")
+    parser.add_argument("--text-only", action="store_true", help="keep every downstream spectator on the text protocol")
+    parser.add_argument("--max-lag", type=float, default=MAX_LAG,
+                        help="seconds a spectator may go without taking the updates queued for it before it is "
+                             "disconnected")
+    args = parser.parse_args()
+    upstream_host, upstream_port = args.upstream.rsplit(":", 1)
+    run_relay(upstream_host, int(upstream_port), args.host, args.port, not args.text_only, args.max_lag)
+
+if __name__ == "__main__":
+    main()
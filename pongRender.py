@@ -0,0 +1,74 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Drawing the playing field.  The walls and center line never move, so they are
+#                           drawn once into a background surface, and text (the score, the win message) is
+#                           only rendered again when it changes.  In dirty rectangle mode a frame only puts the
+#                           background back where the ball, paddles and text were and tells the display about
+#                           those few rectangles instead of copying the whole window.
+# Misc:                     Full mode copies the background over the whole window and flips every frame, for
+#                           drivers that don't keep what was drawn between frames.
+# =================================================================================================
+
+import pygame
+
+class FieldRenderer:
+    def __init__(self, screen:pygame.Surface, staticRects:list, color, dirty:bool = True) -> None:
+        self.screen = screen
+        self.color = color
+        self.dirty = dirty
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill((0,0,0))
+        for rect in staticRects:
+            pygame.draw.rect(self.background, color, rect)
+        # Rectangles drawn last frame, the background goes back over them before the next one
+        self.drawn = []
+        self.current = []
+        # Text name -> (what it says, rendered surface) so it is only rendered again when it changes
+        self.labels = {}
+        self.invalidate()
+
+    # The next frame redraws and shows the whole window (the first one, or after the window was covered)
+    def invalidate(self) -> None:
+        self.fullFrame = True
+
+    # Starts a frame by putting the background back over everything the last frame drew
+    def begin(self) -> None:
+        if self.fullFrame or not self.dirty:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.drawn:
+                self.screen.blit(self.background, rect, rect)
+        self.current = []
+
+    # Draws a ball or paddle
+    def rect(self, rect:pygame.Rect) -> None:
+        self.current.append(pygame.draw.rect(self.screen, self.color, rect))
+
+    # Draws text, rendering it only when it differs from what was drawn under this name before.  Placed by its
+    # center, or its top left corner with topLeft=True
+    def text(self, name:str, font:pygame.font.Font, text:str, position:tuple, topLeft:bool = False,
+             antialias:bool = True) -> None:
+        cached = self.labels.get(name)
+        if cached is None or cached[0] != text:
+            cached = (text, font.render(text, antialias, self.color))
+            self.labels[name] = cached
+        surface = cached[1]
+        rect = surface.get_rect(topleft=position) if topLeft else surface.get_rect(center=position)
+        self.current.append(self.screen.blit(surface, rect))
+
+    # Same text and place as helperCode.updateScore
+    def score(self, lScore:int, rScore:int, font:pygame.font.Font) -> None:
+        self.text("score", font, f"{lScore}   {rScore}", ((self.screen.get_width()/2)+5, 50), antialias=False)
+
+    # Shows the frame: only what changed since the last one in dirty rectangle mode, the whole window otherwise
+    def present(self) -> None:
+        if self.fullFrame or not self.dirty:
+            pygame.display.flip()
+            self.fullFrame = False
+        else:
+            changed = self.drawn + self.current
+            if changed:
+                pygame.display.update(changed)
+        self.drawn = self.current
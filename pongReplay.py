@@ -0,0 +1,338 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Match recordings.  The server (with --record) appends every published state of a
+#                           match to a file of fixed size records, and these can be played back later: in
+#                           pongClient.py with --replay, or streamed to ordinary spectator clients with
+#                           `python3 pongReplay.py serve FILE`, which never touches a live match.
+# Misc:                     A file is HEADER followed by RECORDs: milliseconds since the recording started and
+#                           the same seven state fields the binary protocol sends.  Record n is at a fixed
+#                           offset, and reading goes through mmap, so seeking anywhere is instant.  Files can
+#                           be read while they are still being written.
+# =================================================================================================
+
+import argparse
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+from pongProtocol import STATE, MessageReader, choose_protocol, parse_options
+
+MAGIC = b"PONGREC1"
+#magic, screen width and height, server tick rate (0 when player 1 ran the ball), wall clock start time
+HEADER = struct.Struct("!8sHHHd")
+RECORD = struct.Struct("!I" + STATE.format[1:])
+#a recorder writes once this much is buffered, or once a second, whichever comes first
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
+#appends states to a recording file, buffered so a frame costs a pack and a bytearray append rather than a write
+#the writes happen on the recorder's own thread, every FLUSH_INTERVAL whether or not states keep coming (a
+#finished or paused match still gets its last states written) and never under the match's lock
+class MatchRecorder:
+    def __init__(self, path: str, width: int, height: int, tick_rate: int) -> None:
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, width, height, tick_rate, time.time()))
+        #readers can open the file as soon as it exists
+        self.file.flush()
+        self.buffer = bytearray()
+        self.started = time.monotonic()
+        #guards the buffer and the flags below, the writer thread waits on it between writes
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.flush_requested = False
+        self.closed = False
+        #states that didn't fit a record (out of range fields) are left out, and said so once
+        self.skipped = 0
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    #called under the match's lock, so it never raises: a state that can't be packed is skipped rather than
+    #taking the match down with it
+    def append(self, state: tuple) -> None:
+        try:
+            record = RECORD.pack(int((time.monotonic() - self.started) * 1000), *state)
+        except struct.error as e:
+            self.skipped += 1
+            if self.skipped == 1:
+                print(f"Recording to {self.path} is leaving out states it can't store: {e}")
+            return
+        with self.lock:
+            if self.closed:
+                return
+            self.buffer += record
+            if len(self.buffer) >= FLUSH_BYTES:
+                self.wake.notify()
+
+    #has what is buffered written now instead of at the next interval (the game ended, the match paused),
+    #doesn't wait for it
+    def flush(self) -> None:
+        with self.lock:
+            self.flush_requested = True
+            self.wake.notify()
+
+    #writes what is left and closes the file, on the writer thread
+    def close(self) -> None:
+        with self.lock:
+            self.closed = True
+            self.wake.notify()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self.lock:
+                if not (self.closed or self.flush_requested or len(self.buffer) >= FLUSH_BYTES):
+                    self.wake.wait(FLUSH_INTERVAL)
+                data, self.buffer = self.buffer, bytearray()
+                self.flush_requested = False
+                closed = self.closed
+            try:
+                if data:
+                    self.file.write(data)
+                    self.file.flush()
+                if closed:
+                    self.file.close()
+                    return
+            except OSError as e:
+                print(f"Recording to {self.path} failed, stopping it: {e}")
+                with self.lock:
+                    self.closed = True
+                    self.buffer = bytearray()
+                self.file.close()
+                return
+
+#a recording opened for reading.  refresh() picks up records appended since it was opened
+class Recording:
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a Pong recording")
+        _, self.width, self.height, self.tick_rate, self.started = HEADER.unpack(header)
+        self.map = None
+        self.count = 0
+        self.refresh()
+
+    #maps whatever whole records the file holds now, returns how many that is
+    def refresh(self) -> int:
+        count = (os.fstat(self.file.fileno()).st_size - HEADER.size) // RECORD.size
+        if count > self.count:
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), HEADER.size + count * RECORD.size, access=mmap.ACCESS_READ)
+            self.count = count
+        return self.count
+
+    def __len__(self) -> int:
+        return self.count
+
+    #seconds into the recording record index was made at
+    def time(self, index: int) -> float:
+        return struct.unpack_from("!I", self.map, HEADER.size + index * RECORD.size)[0] / 1000
+
+    #record index as a state tuple (p1Y, p2Y, ballX, ballY, lScore, rScore, sync)
+    def state(self, index: int) -> tuple:
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)[1:]
+
+    def duration(self) -> float:
+        return self.time(self.count - 1) if self.count else 0.0
+
+    #the sync (server tick when the server runs the game) record index was made at
+    def tick(self, index: int) -> int:
+        return self.state(index)[-1]
+
+    #the last record made at or before seconds, None if there is none yet
+    def index_at(self, seconds: float) -> int | None:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.time(middle) <= seconds:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1 if low else None
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+#where in a recording playback is, moving at speed times real time unless paused
+class Playback:
+    def __init__(self, recording: Recording, speed: float = 1.0) -> None:
+        self.recording = recording
+        self.speed = speed
+        self.paused = False
+        self.position = 0.0
+        self.anchor = time.monotonic()
+        #the record seek_record() went to, shown while paused even if a later one has the same millisecond
+        self.pinned = None
+
+    #seconds into the recording
+    def now(self) -> float:
+        if self.paused:
+            return self.position
+        return self.position + (time.monotonic() - self.anchor) * self.speed
+
+    def seek(self, seconds: float) -> None:
+        self.pinned = None
+        self.position = max(0.0, min(seconds, self.recording.duration()))
+        self.anchor = time.monotonic()
+
+    #goes straight to record index (clamped to the ones there are), records are fixed size so this is one read
+    def seek_record(self, index: int) -> None:
+        if not len(self.recording):
+            return
+        index = max(0, min(index, len(self.recording) - 1))
+        self.seek(self.recording.time(index))
+        self.pinned = index
+
+    #moves count records on (back if negative) from the one showing and pauses there, for stepping tick by tick
+    def step(self, count: int) -> None:
+        current = self.current()
+        self.seek(self.now())
+        self.paused = True
+        self.seek_record(count - 1 if current is None else current + count)
+
+    def set_speed(self, speed: float) -> None:
+        self.seek(self.now())
+        self.speed = speed
+
+    def toggle_pause(self) -> None:
+        self.seek(self.now())
+        self.paused = not self.paused
+
+    #true once playback has gone past the last record
+    def finished(self) -> bool:
+        return self.now() > self.recording.duration()
+
+    #the record to show now
+    def current(self) -> int | None:
+        if self.paused and self.pinned is not None:
+            return self.pinned
+        return self.recording.index_at(self.now())
+
+# ==== Replay server ===============================================================================
+# Streams a recording to spectator clients with the normal protocol.  Every viewer gets its own
+# connection, playback position and stand-in match, so a replay can't disturb any game.
+
+#what a viewer's connection sees as its match: just the state being shown
+class ReplayViewer:
+    def __init__(self, match_id: str) -> None:
+        self.match_id = match_id
+        self.snapshot = None
+
+#plays a recording to one spectator, from the start, until they disconnect
+def serve_viewer(sock: socket.socket, addr, path: str, speed: float, loop: bool) -> None:
+    from pongConnection import ThreadedConnection
+    from pongMatch import Snapshot, config_message
+
+    conn = ThreadedConnection(sock, addr)
+    viewer = ReplayViewer(os.path.basename(path))
+    conn.match = viewer
+    conn.player_id = 3
+    conn.send(config_message(3))
+    conn.flush()
+
+    #newer clients say HELLO, older ones just start watching
+    reader = MessageReader()
+    sock.settimeout(1.0)
+    try:
+        hello = None
+        while hello is None:
+            data = sock.recv(4096)
+            if not data:
+                conn.close()
+                return
+            reader.feed(data)
+            hello = next((parts for parts in reader.messages() if parts[0] == "HELLO"), None)
+        #queued after switching, like Match.handle_message, so the states after WELCOME go out as frames
+        conn.binary = choose_protocol(parse_options(hello).get("proto", ""))
+        conn.send(f"WELCOME sim=client{f' proto=bin{conn.binary}' if conn.binary else ''}\n".encode())
+    except socket.timeout:
+        pass
+    except OSError:
+        conn.close()
+        return
+    sock.settimeout(None)
+    threading.Thread(target=_drain, args=(conn,), daemon=True).start()
+    print(f"Replaying {path} to {addr}")
+
+    recording = Recording(path)
+    playback = Playback(recording, speed)
+    shown = None
+    try:
+        while not conn.closed:
+            recording.refresh()
+            if loop and playback.finished():
+                playback.seek(0)
+            index = playback.current()
+            if index is not None and index != shown:
+                shown = index
+                viewer.snapshot = Snapshot(*recording.state(index))
+                conn.send(None)
+                conn.flush()
+            #sleep until the next record is due (records still being written show up within FLUSH_INTERVAL)
+            wait = 0.05
+            if index is not None and index + 1 < len(recording):
+                wait = min(wait, max(0.0, (recording.time(index + 1) - playback.now()) / speed))
+            time.sleep(wait)
+    finally:
+        recording.close()
+        conn.close()
+
+#reads (and ignores) whatever a viewer sends, to notice when they leave
+def _drain(conn) -> None:
+    try:
+        while conn.sock.recv(4096):
+            pass
+    except OSError:
+        pass
+    conn.close()
+
+def serve(path: str, host: str, port: int, speed: float, loop: bool) -> None:
+    Recording(path).close()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(5)
+    print(f"Replaying {path} to spectators on {host}:{port}")
+    while True:
+        sock, addr = server.accept()
+        threading.Thread(target=serve_viewer, args=(sock, addr, path, speed, loop), daemon=True).start()
+
+#prints what a recording holds
+def describe(path: str) -> None:
+    recording = Recording(path)
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(recording.started))
+    print(f"{path}: {recording.width}x{recording.height}, "
+          f"{f'{recording.tick_rate} Hz server simulation' if recording.tick_rate else 'client simulation'}, "
+          f"started {started}")
+    print(f"{len(recording)} records over {recording.duration():.1f} s")
+    if len(recording):
+        print(f"final state: {recording.state(len(recording) - 1)}")
+    recording.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pong match recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="describe a recording")
+    info.add_argument("file")
+    serving = commands.add_parser("serve", help="stream a recording to spectator clients")
+    serving.add_argument("file")
+    serving.add_argument("--host", default="0.0.0.0", help="address to listen on")
+    serving.add_argument("--port", type=int, default=5001, help="port to listen on")
+    serving.add_argument("--speed", type=float, default=1.0, help="playback speed, 2 plays twice as fast")
+    serving.add_argument("--loop", action="store_true", help="start over at the end instead of stopping there")
+    args = parser.parse_args()
+    if args.command == "info":
+        describe(args.file)
+    else:
+        serve(args.file, args.host, args.port, args.speed, args.loop)
+
+if __name__ == "__main__":
+    main()
@@ -3,232 +3,540 @@
 # Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
 # Date:                     11/26/2025
 # Purpose:                  This is the server code for a networked Pong game.  It accepts connections
-#                           from two players (and optional spectators), maintains the game state, and
-#                           relays updates between the clients to keep their game views synchronized.
-# Misc:                     <Not Required.  Anything else you might want to include>
+#                           from players (and optional spectators), pairs them into matches, maintains
+#                           each match's game state, and relays updates between the clients to keep
+#                           their game views synchronized.
+# Misc:                     The per-match state and the matchmaker live in pongMatch.py, the client
+#                           connections and their send queues in pongConnection.py, the counters behind
+#                           --metrics-port in pongMetrics.py, the acceptor/worker handoff for --workers in
+#                           pongShard.py
 # =================================================================================================
 
+import argparse
+import multiprocessing
+import os
+import selectors
 import socket
 import threading
 import time
 
-SCREEN_W = 640
-SCREEN_H = 480
-PADDLE_H = 50
+from pongConnection import MAX_LAG, RATE_INTERVAL, LoopConnection, ThreadedConnection, accept_batch
+from pongMatch import RESUME_GRACE, Matchmaker
+from pongMetrics import METRICS, serve_metrics
+from pongProtocol import MessageReader
+from pongShard import Acceptor, Directory, Shard, session_worker
+from pongUdp import UdpChannel
+
 #accept connections on all networks listen to port 5000
 Host = "0.0.0.0"
 Port = 5000
+#connections the kernel holds for us before we accept them, bursts beyond it are refused
+BACKLOG = 128
+
+#queues every (connection, message) pair and adds the connections to pending, for the caller to flush once
+#everything for this message or tick has been queued so each client gets it in one write
+def queue_messages(outgoing: list, pending: set) -> None:
+    for conn, msg in outgoing:
+        conn.send(msg)
+        pending.add(conn)
 
-players = {}
-spectators = []
-#lock to ensure players arent modified at same time
-lock = threading.Lock()
-#server side game state
-paddle_y = {
-    1: (SCREEN_H // 2) - (PADDLE_H // 2),
-    2: (SCREEN_H // 2) - (PADDLE_H // 2)
-}
-ball_x = SCREEN_W // 2
-ball_y = SCREEN_H // 2
-left_score = 0
-right_score = 0
-sync_val = 0
-
-# Play-again state
-game_over = False
-ready_flags = {1: False, 2: False}
+#queues a match's newest state for its audience, timing how long the fan-out takes
+def queue_broadcast(match, pending: set) -> None:
+    started = time.perf_counter()
+    outgoing = match.broadcast()
+    if outgoing:
+        queue_messages(outgoing, pending)
+        METRICS.broadcast_time.observe(time.perf_counter() - started)
+        METRICS.broadcast_fanout.observe(len(outgoing))
+
+#applies one message from a client to its match and queues what it causes (threaded mode)
+def handle_message(conn, parts, pending: set) -> None:
+    match = conn.match
+    METRICS.messages_in.inc()
+    try:
+        #the lock only covers the update itself and queueing its control messages
+        with match.lock:
+            queue_messages(match.handle_message(conn, parts), pending)
+    except ValueError:
+        #if packet cant be parsed ignore and continue
+        METRICS.parse_errors.inc()
+    queue_broadcast(match, pending)
 
 #handles messages from a single client
 #each client sends a line of text containing <paddleY> <ballx> <ballY> <lScore> <rScore> <sync>
-def handle_client(conn: socket.socket, addr: tuple[str, int], player_id):
-    global ball_x, ball_y, left_score, right_score, sync_val, game_over, ready_flags
-    print(f"New Player: {player_id} : {addr}")
-    #set players id
-    if player_id == 1:
-        other = 2
-    else:
-        other = 1
-    
+#(or the same fields as a binary frame once it has negotiated them)
+def handle_client(conn: ThreadedConnection, matchmaker: Matchmaker):
+    reader = MessageReader()
+    print(f"New Player: {conn.player_id} : {conn.addr} (match {conn.match.match_id})")
+
     try:
         while True:
-            data = conn.recv(4096)
+            data = conn.sock.recv(4096)
             if not data:
                 break
-            try:
-                text = data.decode().strip()
-                if not text:
-                    continue
-                parts = text.split()
-
-                # Handle PLAY_AGAIN command
-                if parts[0] == "PLAY_AGAIN":
-                    with lock:
-                        # only players (1 or 2) count for rematch
-                        if player_id in (1,2):
-                            ready_flags[player_id] = True
-                            print(f"Player {player_id} requested rematch")
-                            # If both players ready -> reset game and notify everyone
-                            if ready_flags.get(1) and ready_flags.get(2):
-                                # reset server-side game state
-                                paddle_y[1] = (SCREEN_H // 2) - (PADDLE_H // 2)
-                                paddle_y[2] = (SCREEN_H // 2) - (PADDLE_H // 2)
-                                ball_x = SCREEN_W // 2
-                                ball_y = SCREEN_H // 2
-                                left_score = 0
-                                right_score = 0
-                                sync_val = 0
-                                game_over = False
-                                ready_flags[1] = False
-                                ready_flags[2] = False
-                                # send RESET to players and spectators
-                                msgReset = f"RESET\n"
-                                try:
-                                    if 1 in players:
-                                        players[1].sendall(msgReset.encode())
-                                except OSError:
-                                    pass
-                                try:
-                                    if 2 in players:
-                                        players[2].sendall(msgReset.encode())
-                                except OSError:
-                                    pass
-                                try:
-                                    for spec in spectators:
-                                        spec.sendall(msgReset.encode())
-                                except OSError:
-                                    pass
-                                print("Rematch: game state reset and RESET broadcasted")
-                    continue  # skip rest of parsing for this message
-
-                # Regular update message parsing (expected 6 numbers)
-                if len(parts) >= 6:
-                    y_val = int(parts[0])
-                    with lock:
-                        #updates this players paddle position
-                        paddle_y[player_id] = y_val
-                        #player 1 keeps control of the ball and score
-                        if player_id == 1:
-                            ball_x = int(parts[1])
-                            ball_y = int(parts[2])
-                            left_score = int(parts[3])
-                            right_score = int(parts[4])
-                            sync_val = int(parts[5])
-                        else:
-                            #player 2 can advance the sync value still
-                            their_sync = int(parts[5])
-                            if their_sync > sync_val:
-                                sync_val = their_sync
-
-                        # If a win happened (client reported it), and we haven't flagged game_over yet:
-                        if not game_over and (left_score > 4 or right_score > 4):
-                            game_over = True
-                            print(f"Game over detected on server: left={left_score} right={right_score}")
-                            # Broadcast GAME_OVER to everyone
-                            try:
-                                if 1 in players:
-                                    players[1].sendall(b"GAME_OVER\n")
-                            except OSError:
-                                pass
-                            try:
-                                if 2 in players:
-                                    players[2].sendall(b"GAME_OVER\n")
-                            except OSError:
-                                pass
-                            try:
-                                for spec in spectators:
-                                    spec.sendall(b"GAME_OVER\n")
-                            except OSError:
-                                pass
-
-                        #build messages to send back
-                        msgForP1 = f"{paddle_y[2]} {ball_x} {ball_y} {left_score} {right_score} {sync_val}\n"
-                        msgForP2 = f"{paddle_y[1]} {ball_x} {ball_y} {left_score} {right_score} {sync_val}\n"
-                        msgForS = f"{paddle_y[1]} {paddle_y[2]} {ball_x} {ball_y} {left_score} {right_score} {sync_val}\n"
-                        #send update game state to player 1 
-                        if 1 in players:
-                            try:
-                                players[1].sendall(msgForP1.encode())
-                            except OSError:
-                                pass
-                        #send updated game state to player 2
-                        if 2 in players:
-                            try:
-                                players[2].sendall(msgForP2.encode()) 
-                            except OSError:
-                                pass
-                        #Always send updated game state to spectators
-                        try:
-                            for spec in spectators:
-                                spec.sendall(msgForS.encode())
-                        except OSError:
-                            pass
-            except ValueError:
-                #if packet cant be parsed ignore and continue
-                continue                      
+            conn.bytes_in += len(data)
+            METRICS.bytes_in.inc(len(data))
+            reader.feed(data)
+            #only the newest update in what arrived matters, older ones would be overwritten straight away
+            batch = reader.drain()
+            pending = set()
+            while batch:
+                for parts in batch:
+                    if parts[0] == "RESUME":
+                        queue_messages(matchmaker.resume(conn, parts), pending)
+                    else:
+                        handle_message(conn, parts, pending)
+                reader.binary = conn.binary
+                batch = reader.drain()
+            for target in pending:
+                target.flush()
     except OSError:
         pass
-    
-    #cleans up after a player disconnects 
-    print(f"Disconnect Player: {player_id}")
-    with lock:
-         if player_id in players:
-            try:
-                players[player_id].close()
-            except:
-                pass
-            del players[player_id]
-    #cleans up after a spectator disconnects
-    print("Spectator disconnected (if was a spectator):")
-    with lock:
-        if conn in spectators:
+
+    #cleans up after a player or spectator disconnects
+    print(f"Disconnect Player: {conn.player_id} (match {conn.match.match_id})")
+    for spec in matchmaker.remove(conn):
+        spec.close()
+    conn.close()
+
+#handles the updates players send over UDP (threaded mode)
+def udp_loop(udp: UdpChannel) -> None:
+    while True:
+        pending = set()
+        for conn, parts in udp.receive():
+            if not conn.closed:
+                handle_message(conn, parts, pending)
+        for target in pending:
+            target.flush()
+
+#gives the slots of players who didn't RESUME in time to others, once a second (threaded mode)
+def session_loop(matchmaker: Matchmaker) -> None:
+    while True:
+        time.sleep(1.0)
+        for spec in matchmaker.expire_sessions():
+            spec.close()
+
+#checks every client's link and adapts its update rate to it, every RATE_INTERVAL (threaded mode)
+def rate_loop(matchmaker: Matchmaker) -> None:
+    while True:
+        time.sleep(RATE_INTERVAL)
+        for conn in matchmaker.connections():
+            #one connection going wrong mustn't stop rate adaptation for everyone else
             try:
-                spectators.remove(conn)
+                if conn.adapt_rate():
+                    conn.flush()
+            except Exception as e:
+                print(f"Rate check for player {conn.player_id} ({conn.addr}) failed: {e!r}")
+
+#creates a non-blocking listening socket the server modes accept on
+def make_listener(host: str, port: int, backlog: int = BACKLOG) -> socket.socket:
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    #Bind server to the host and port and listen for connections
+    server.bind((host, port))
+    server.listen(backlog)
+    server.setblocking(False)
+    return server
+
+#accepts connections on one listener and hands them to the matchmaker, every connection waiting at once
+#per wakeup.  Each gets a thread reading it straight away (a player waiting for an opponent may RESUME)
+def accept_loop(server: socket.socket, matchmaker: Matchmaker, spectator: bool, max_lag: float = MAX_LAG) -> None:
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    while True:
+        selector.select()
+        for sock, addr in accept_batch(server):
+            conn = ThreadedConnection(sock, addr, max_lag)
+            for client in matchmaker.assign(conn, spectator):
+                client.flush()
+            threading.Thread(target=handle_client, args=(conn, matchmaker), daemon=True).start()
+
+#how the simulation moves the ball, for the startup message
+def physics_note(matchmaker: Matchmaker) -> str:
+    if not matchmaker.swept:
+        return ""
+    return f" with swept collisions, {matchmaker.speed} frame(s) a tick"
+
+#advances every server simulated match at a fixed rate (threaded mode)
+def tick_loop(matchmaker: Matchmaker) -> None:
+    interval = 1 / matchmaker.tick_rate
+    next_tick = time.monotonic()
+    while True:
+        pending = set()
+        started = time.perf_counter()
+        for match in matchmaker.running():
+            with match.lock:
+                queue_messages(match.tick(), pending)
+            queue_broadcast(match, pending)
+        METRICS.ticks.inc()
+        METRICS.tick_time.observe(time.perf_counter() - started)
+        for target in pending:
+            target.flush()
+        next_tick = next_tick_time(next_tick, interval)
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+
+#schedules the tick after one due at previous, skipping ticks the server has fallen too far behind on
+#instead of running them back to back
+def next_tick_time(previous: float, interval: float) -> float:
+    next_tick = previous + interval
+    now = time.monotonic()
+    if now - next_tick > 5 * interval:
+        next_tick = now
+    return next_tick
+
+#original server mode: one thread per player and per spectator
+def run_threaded_server(host: str, port: int, matchmaker: Matchmaker, spectator_port: int | None = None,
+                        max_lag: float = MAX_LAG, backlog: int = BACKLOG) -> None:
+    server = make_listener(host, port, backlog)
+    if spectator_port:
+        spec_server = make_listener(host, spectator_port, backlog)
+        threading.Thread(target=accept_loop, args=(spec_server, matchmaker, True, max_lag), daemon=True).start()
+        print(f"Spectators can join on {host}:{spectator_port}")
+    if matchmaker.tick_rate:
+        threading.Thread(target=tick_loop, args=(matchmaker,), daemon=True).start()
+        print(f"Simulating matches on the server at {matchmaker.tick_rate} Hz{physics_note(matchmaker)}")
+    if matchmaker.udp:
+        threading.Thread(target=udp_loop, args=(matchmaker.udp,), daemon=True).start()
+        print(f"Sending state updates over UDP on {host}:{port} to clients that ask for it")
+    if matchmaker.resume_grace:
+        threading.Thread(target=session_loop, args=(matchmaker,), daemon=True).start()
+    threading.Thread(target=rate_loop, args=(matchmaker,), daemon=True).start()
+
+    print(f"Pong server is running on {host}:{port}")
+    print("Waiting for 2 players")
+
+    #keep the main thread alive
+    accept_loop(server, matchmaker, False, max_lag)
+
+# ==== Event loop server ===========================================================================
+# Serves every connection from a single thread with a selector instead of one blocking thread each.
+# It speaks exactly the same protocol as the threaded server.
+
+#event loop server mode: a single thread multiplexes the listeners and every client socket
+#with shard set this is one worker of a sharded server: it doesn't listen, connections are handed to it by the
+#acceptor process instead
+def run_event_loop_server(host: str, port: int, matchmaker: Matchmaker, spectator_port: int | None = None,
+                          max_lag: float = MAX_LAG, backlog: int = BACKLOG, shard: Shard | None = None) -> None:
+    selector = selectors.DefaultSelector()
+    #listeners are registered with data set to whether they only take spectators
+    listeners = []
+    if shard:
+        shard.sock.setblocking(False)
+        selector.register(shard.sock, selectors.EVENT_READ, shard)
+        shard.publish(matchmaker)
+    else:
+        listeners.append((make_listener(host, port, backlog), False))
+    if spectator_port:
+        listeners.append((make_listener(host, spectator_port, backlog), True))
+        print(f"Spectators can join on {host}:{spectator_port}")
+    for server, spectator in listeners:
+        selector.register(server, selectors.EVENT_READ, spectator)
+    udp = matchmaker.udp
+    if udp:
+        udp.sock.setblocking(False)
+        selector.register(udp.sock, selectors.EVENT_READ, udp)
+        print(f"Sending state updates over UDP on {host}:{port} to clients that ask for it")
+    connections = set()
+
+    interval = 1 / matchmaker.tick_rate if matchmaker.tick_rate else None
+    next_tick = time.monotonic()
+    if interval:
+        print(f"Simulating matches on the server at {matchmaker.tick_rate} Hz{physics_note(matchmaker)}")
+
+    if shard:
+        print(f"Worker {shard.index + 1} (event loop) is running")
+    else:
+        print(f"Pong server (event loop) is running on {host}:{port}")
+        print("Waiting for 2 players")
+
+    #connections with something queued this round, written once at the end of it
+    pending = set()
+    #connections holding a state back until their update rate allows it
+    paced = set()
+
+    #token is set for a connection another worker passed on because it wants to RESUME a session of ours
+    def adopt(sock, addr, spectator, token=None):
+        conn = LoopConnection(sock, addr, selector, max_lag)
+        connections.add(conn)
+        if token is not None:
+            queue_messages(matchmaker.resume(conn, ["RESUME", token]), pending)
+            if conn.match is not None:
+                return
+            #the resume failed (RESUME_FAILED is queued).  The acceptor never placed this connection here, so it
+            #can't take a player slot or open a match past --max-matches: it watches one of ours, or is told and
+            #closed if there is nothing here to watch
+            if not matchmaker.matches:
+                conn.flush()
+                connections.discard(conn)
                 conn.close()
-            except:
-                pass
-
-#create server socket
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-#Bind server to the host and port and listen for connections
-server.bind((Host, Port))
-server.listen(5)
-
-
-print(f"Pong server is running on {Host}:{Port}")
-print("Waiting for 2 players")
-
-#keep the main thread alive
-while True:
-    conn, addr = server.accept()
-
-    with lock:
-
-        #player 1
-        if 1 not in players:
-            players[1] = conn
-            addr1 = addr
-            ready_flags[1] = False
-            print("Player 1 connected")
-
-        #player 2
-        elif 2 not in players:
-            players[2] = conn
-            addr2 = addr
-            ready_flags[2] = False
-            print("Player 2 connected")
-
-            players[1].send(f"CONFIG {SCREEN_W} {SCREEN_H} left".encode())
-            players[2].send(f"CONFIG {SCREEN_W} {SCREEN_H} right".encode())
-            threading.Thread(target=handle_client, args=(players[1], addr1, 1), daemon=True).start()
-            threading.Thread(target=handle_client, args=(players[2], addr2, 2), daemon=True).start()
-            print("Both player connected, Game is starting")
-
-        #spectators
+                return
+            spectator = True
+        pending.update(matchmaker.assign(conn, spectator))
+
+    def accept(server, spectator):
+        for sock, addr in accept_batch(server):
+            adopt(sock, addr, spectator)
+
+    def resume(conn, parts):
+        owner = session_worker(parts[1] if len(parts) > 1 else "", shard.directory.workers) if shard else None
+        if owner is not None and owner != shard.index:
+            #the session's match is on another worker, the acceptor passes the connection on to it
+            connections.discard(conn)
+            for spec in matchmaker.remove(conn):
+                connections.discard(spec)
+                spec.close()
+            shard.forward(conn.sock, parts[1])
+            conn.close()
         else:
-            spectators.append(conn)
-            conn.send(f"CONFIG {SCREEN_W} {SCREEN_H} spectator".encode())
-            threading.Thread(target=handle_client, args=(conn, addr, 3), daemon=True).start()
-            print("Spectator connected:", addr)
+            queue_messages(matchmaker.resume(conn, parts), pending)
+        if shard:
+            shard.publish(matchmaker)
+
+    def disconnect(conn):
+        if conn not in connections:
+            return
+        connections.discard(conn)
+        print(f"Disconnect Player: {conn.player_id} (match {conn.match.match_id})")
+        conn.close()
+        for spec in matchmaker.remove(conn):
+            connections.discard(spec)
+            spec.close()
+        if shard:
+            shard.publish(matchmaker)
+
+    next_expiry = time.monotonic() + 1.0
+    next_rate_check = time.monotonic() + RATE_INTERVAL
+
+    while True:
+        deadlines = [next_rate_check]
+        if interval:
+            deadlines.append(next_tick)
+        if matchmaker.resume_grace:
+            deadlines.append(next_expiry)
+        if paced:
+            deadlines.append(min(conn.state_due for conn in paced))
+        for key, mask in selector.select(max(0.0, min(deadlines) - time.monotonic())):
+            if isinstance(key.data, bool):
+                accept(key.fileobj, key.data)
+                continue
+            if key.data is shard:
+                handed = shard.receive()
+                if handed is None:
+                    print(f"Worker {shard.index + 1}: the acceptor has gone, stopping")
+                    return
+                for sock, spectator, token in handed:
+                    try:
+                        adopt(sock, sock.getpeername(), spectator, token)
+                    except OSError:
+                        #gone before we got to it
+                        sock.close()
+                shard.publish(matchmaker)
+                continue
+            if key.data is udp:
+                for conn, parts in udp.receive(256):
+                    if conn in connections:
+                        METRICS.messages_in.inc()
+                        try:
+                            queue_messages(conn.match.handle_message(conn, parts), pending)
+                        except ValueError:
+                            METRICS.parse_errors.inc()
+                        queue_broadcast(conn.match, pending)
+                continue
+            conn = key.data
+            if mask & selectors.EVENT_WRITE:
+                conn.flush()
+                if conn.holding():
+                    paced.add(conn)
+            if mask & selectors.EVENT_READ and not conn.closed:
+                if not conn.receive():
+                    disconnect(conn)
+                    continue
+                batch = conn.reader.drain()
+                while batch and not conn.closed:
+                    METRICS.messages_in.inc(len(batch))
+                    for parts in batch:
+                        if parts[0] == "RESUME":
+                            resume(conn, parts)
+                            if conn.closed:
+                                break
+                            continue
+                        try:
+                            queue_messages(conn.match.handle_message(conn, parts), pending)
+                        except ValueError:
+                            #if packet cant be parsed ignore and continue
+                            METRICS.parse_errors.inc()
+                        queue_broadcast(conn.match, pending)
+                    conn.reader.binary = conn.binary
+                    batch = conn.reader.drain()
+            if conn.closed:
+                disconnect(conn)
+
+        if interval and time.monotonic() >= next_tick:
+            started = time.perf_counter()
+            for match in matchmaker.running():
+                queue_messages(match.tick(), pending)
+                queue_broadcast(match, pending)
+            METRICS.ticks.inc()
+            METRICS.tick_time.observe(time.perf_counter() - started)
+            next_tick = next_tick_time(next_tick, interval)
+
+        if matchmaker.resume_grace and time.monotonic() >= next_expiry:
+            next_expiry = time.monotonic() + 1.0
+            for spec in matchmaker.expire_sessions():
+                connections.discard(spec)
+                spec.close()
+            if shard:
+                shard.publish(matchmaker)
+
+        now = time.monotonic()
+        if now >= next_rate_check:
+            next_rate_check = now + RATE_INTERVAL
+            for conn in connections:
+                if conn.adapt_rate():
+                    pending.add(conn)
+        for conn in [conn for conn in paced if conn.state_due <= now or conn.closed]:
+            paced.discard(conn)
+            pending.add(conn)
+
+        for conn in pending:
+            conn.flush()
+            if conn.closed:
+                disconnect(conn)
+            elif conn.holding():
+                paced.add(conn)
+        pending.clear()
+
+# ==== Sharded server ==============================================================================
+# The parent process only accepts connections and passes each one (its file descriptor) to one of several
+# worker processes running the event loop server above, so matches run on as many cores as there are workers.
+
+#one worker process: an event loop server over the matches it is handed
+def run_worker(index: int, link: socket.socket, directory: Directory, args: argparse.Namespace,
+               inherited: list) -> None:
+    #a forked worker holds copies of the acceptor's ends of the handoff sockets, which would keep the others from
+    #noticing when the acceptor is gone
+    for sock in inherited:
+        sock.close()
+    #the acceptor decides who plays and who watches, so the worker itself has no match limit
+    matchmaker = Matchmaker(0, args.tick_rate, not args.text_only, None, args.record, args.resume_grace, args.swept,
+                            args.frames_per_tick)
+    matchmaker.next_id = index + 1
+    matchmaker.id_step = directory.workers
+    if args.metrics_port:
+        register_gauges(matchmaker)
+        serve_metrics(args.metrics_host, args.metrics_port + index)
+        print(f"Worker {index + 1} metrics on http://{args.metrics_host}:{args.metrics_port + index}/metrics")
+    run_event_loop_server(args.host, args.port, matchmaker, None, args.max_lag, shard=Shard(index, link, directory))
+
+def run_sharded_server(args: argparse.Namespace) -> None:
+    directory = Directory(args.workers)
+    links = []
+    for index in range(args.workers):
+        #SEQPACKET keeps every handed over descriptor in its own message
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        multiprocessing.Process(target=run_worker, args=(index, theirs, directory, args, links + [ours]),
+                                daemon=True).start()
+        theirs.close()
+        links.append(ours)
+
+    listeners = [(make_listener(args.host, args.port, args.backlog), False)]
+    if args.spectator_port:
+        listeners.append((make_listener(args.host, args.spectator_port, args.backlog), True))
+        print(f"Spectators can join on {args.host}:{args.spectator_port}")
+    print(f"Pong server is running on {args.host}:{args.port} with {args.workers} worker processes")
+    print("Waiting for 2 players")
+    Acceptor(links, directory, args.max_matches).run(listeners)
+
+#gauges read from the matchmaker whenever the metrics are scraped
+def register_gauges(matchmaker: Matchmaker) -> None:
+    METRICS.gauge("pong_matches", "Open matches", lambda: len(matchmaker.matches))
+    METRICS.gauge("pong_matches_started", "Matches with both players paired",
+                  lambda: sum(match.started for match in matchmaker.running()))
+    METRICS.gauge("pong_clients", "Connected players and spectators", lambda: len(matchmaker.connections()))
+    METRICS.gauge("pong_send_queue_items", "Messages waiting in send queues (all clients together)",
+                  lambda: sum(len(conn.queue.items) for conn in matchmaker.connections()))
+
+    def per_connection(attribute):
+        return lambda: [(f'match="{conn.match.match_id}",player="{conn.player_id}",addr="{conn.addr[0]}:{conn.addr[1]}"',
+                         getattr(conn, attribute)) for conn in matchmaker.connections()]
+
+    METRICS.gauge("pong_connection_bytes_received", "Bytes read from each connected client", per_connection("bytes_in"))
+    METRICS.gauge("pong_connection_bytes_sent", "Bytes written to each connected client", per_connection("bytes_out"))
+    METRICS.gauge("pong_connection_update_rate", "States a second each client gets (0 is every update)",
+                  per_connection("rate"))
+    METRICS.gauge("pong_connection_rtt_seconds", "Newest PING round trip of each client that answers them",
+                  per_connection("rtt"))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Networked Pong server")
+    parser.add_argument("--host", default=Host, help="address to listen on")
+    parser.add_argument("--port", type=int, default=Port, help="port to listen on")
+    parser.add_argument("--mode", choices=("threaded", "eventloop"), default="threaded",
+                        help="threaded runs one thread per client, eventloop serves every client from one thread")
+    parser.add_argument("--max-matches", type=int, default=1,
+                        help="matches played at once, extra players spectate once reached (0 means no limit)")
+    parser.add_argument("--spectator-port", type=int, default=None,
+                        help="optional second port whose connections always join as spectators")
+    parser.add_argument("--tick-rate", type=int, default=0,
+                        help="simulate every match on the server at this many ticks per second and only take paddle "
+                             "input from players (0 keeps player 1 in charge of the ball)")
+    parser.add_argument("--swept", action="store_true",
+                        help="with --tick-rate, find exactly when the ball touches a paddle or wall during a tick so "
+                             "a fast ball can't pass through one")
+    parser.add_argument("--frames-per-tick", type=int, default=1,
+                        help="with --swept, move the ball and paddles this many frames' worth every tick, e.g. "
+                             "--tick-rate 20 --frames-per-tick 3 plays at the usual speed with a third of the updates")
+    parser.add_argument("--text-only", action="store_true",
+                        help="never agree to binary frames, every client stays on the text protocol")
+    parser.add_argument("--udp", action="store_true",
+                        help="also listen for UDP on the same port and send state updates over it to clients that "
+                             "ask for it")
+    parser.add_argument("--udp-loss", type=float, default=0.0,
+                        help="testing: fraction of outgoing UDP datagrams to throw away")
+    parser.add_argument("--udp-latency", type=float, default=0.0,
+                        help="testing: milliseconds to hold outgoing UDP datagrams back (plus up to half again at "
+                             "random, so they also arrive out of order)")
+    parser.add_argument("--max-lag", type=float, default=MAX_LAG,
+                        help="seconds a client may go without taking the updates queued for it before it is "
+                             "disconnected")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="record every match to a file in this directory, see pongReplay.py")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve counters and timings over HTTP on this port (Prometheus text format)")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="address the metrics endpoint listens on")
+    parser.add_argument("--backlog", type=int, default=BACKLOG,
+                        help="connections the kernel queues for the server before it accepts them")
+    parser.add_argument("--resume-grace", type=float, default=RESUME_GRACE,
+                        help="seconds a dropped player's slot is kept for them to resume before anyone else can "
+                             "take it (0 turns resuming off)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run matches in this many worker processes (event loop each) behind one acceptor, "
+                             "0 serves everything from this process")
+    args = parser.parse_args()
+    if args.swept and not args.tick_rate:
+        parser.error("--swept needs --tick-rate, only the server's simulation has swept collisions")
+    if args.frames_per_tick < 1 or (args.frames_per_tick > 1 and not args.swept):
+        parser.error("--frames-per-tick needs --swept and must be at least 1, the ball would go through paddles")
+    if args.workers and args.udp:
+        parser.error("--udp can't be used with --workers, datagrams can't be routed to the worker with the match")
+
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    if args.workers:
+        run_sharded_server(args)
+        return
+
+    udp = UdpChannel(args.host, args.port, args.udp_loss, args.udp_latency / 1000) if args.udp else None
+    matchmaker = Matchmaker(args.max_matches, args.tick_rate, not args.text_only, udp, args.record, args.resume_grace,
+                            args.swept, args.frames_per_tick)
+    if args.metrics_port:
+        register_gauges(matchmaker)
+        serve_metrics(args.metrics_host, args.metrics_port)
+        print(f"Metrics on http://{args.metrics_host}:{args.metrics_port}/metrics")
+    if args.mode == "eventloop":
+        run_event_loop_server(args.host, args.port, matchmaker, args.spectator_port, args.max_lag, args.backlog)
+    else:
+        run_threaded_server(args.host, args.port, matchmaker, args.spectator_port, args.max_lag, args.backlog)
 
-    time.sleep(0.01)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Pieces of the sharded server (pongServer.py --workers N): the acceptor process
+#                           takes every connection and passes its socket over a Unix socket to one of N worker
+#                           processes, each running the event loop server over its own matches, so matches are
+#                           spread over as many cores as there are workers.
+# Misc:                     Workers publish how many matches, free player slots and spectators they have in a
+#                           directory in shared memory, which the acceptor reads to keep pairs of players on the
+#                           same worker and spread matches and spectators evenly.  Linux/macOS only (fd passing).
+# =================================================================================================
+
+import selectors
+import socket
+from multiprocessing import RawArray
+from typing import NamedTuple
+
+from pongConnection import accept_batch
+
+#the worker (index) whose match a session token ("<match id>-<random>") belongs to, None if it isn't one.
+#Worker i numbers its matches i + 1, i + 1 + workers, ...
+def session_worker(token: str, workers: int) -> int | None:
+    match_id = token.split("-")[0]
+    if not match_id.isdigit() or int(match_id) < 1:
+        return None
+    return (int(match_id) - 1) % workers
+
+#one worker's row in the directory
+class ShardLoad(NamedTuple):
+    matches: int
+    started: int
+    #player slots free in open matches, a new player fills one before a new match is opened
+    open: int
+    spectators: int
+    #connections the worker has taken so far, the acceptor compares these with what it has sent to know what
+    #is still on its way
+    players_received: int
+    spectators_received: int
+
+#worker rows in shared memory.  Each row is only written by its own worker, so there is no lock: a reader may
+#see a row half updated, which only costs a slightly worse placement
+class Directory:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.width = len(ShardLoad._fields)
+        self.table = RawArray("q", workers * self.width)
+
+    def publish(self, index: int, load: ShardLoad) -> None:
+        row = index * self.width
+        #received counts last, a reader that sees them new sees the rest new too
+        self.table[row:row + 4] = list(load[:4])
+        self.table[row + 4:row + self.width] = list(load[4:])
+
+    def load(self, index: int) -> ShardLoad:
+        row = index * self.width
+        received = self.table[row + 4:row + self.width]
+        return ShardLoad(*self.table[row:row + 4], *received)
+
+#the worker's end: takes the connections the acceptor hands over and keeps the worker's directory row current
+class Shard:
+    def __init__(self, index: int, sock: socket.socket, directory: Directory) -> None:
+        self.index = index
+        self.sock = sock
+        self.directory = directory
+        self.players_received = 0
+        self.spectators_received = 0
+
+    #every connection waiting on the handoff socket as (socket, spectator, session token to resume or None),
+    #None once the acceptor is gone
+    def receive(self) -> list | None:
+        adopted = []
+        while True:
+            try:
+                msg, fds, _, _ = socket.recv_fds(self.sock, 256, 1)
+            except BlockingIOError:
+                return adopted
+            except OSError:
+                return None
+            if not msg:
+                return None
+            spectator = msg == b"s"
+            token = msg[1:].decode(errors="replace") if msg[:1] == b"r" else None
+            if spectator:
+                self.spectators_received += 1
+            elif token is None:
+                self.players_received += 1
+            for fd in fds:
+                adopted.append((socket.socket(fileno=fd), spectator, token))
+
+    #passes a connection that wants to RESUME a session of another worker back to the acceptor to route
+    def forward(self, sock: socket.socket, token: str) -> None:
+        socket.send_fds(self.sock, [b"r" + token.encode()], [sock.fileno()])
+
+    #publishes the worker's matches, called whenever a connection comes or goes
+    def publish(self, matchmaker) -> None:
+        matches = list(matchmaker.matches.values())
+        self.directory.publish(self.index, ShardLoad(
+            len(matches),
+            sum(match.started for match in matches),
+            sum(2 - len(match.players) - len(match.reserved) for match in matches),
+            sum(len(match.spectators) for match in matches),
+            self.players_received,
+            self.spectators_received))
+
+#the acceptor's side: picks a worker for every new connection and passes the socket to it
+class Acceptor:
+    def __init__(self, links: list, directory: Directory, max_matches: int) -> None:
+        #one handoff socket per worker, None once that worker has gone
+        self.links = links
+        self.directory = directory
+        self.max_matches = max_matches
+        self.players_sent = [0] * len(links)
+        self.spectators_sent = [0] * len(links)
+
+    #a worker's row as it will be once the connections still on their way to it have arrived
+    def expected(self, index: int) -> ShardLoad:
+        load = self.directory.load(index)
+        players = self.players_sent[index] - load.players_received
+        spectators = self.spectators_sent[index] - load.spectators_received
+        matches, free = load.matches, load.open
+        if players > free:
+            #same as Matchmaker: fill free slots first, then open a match for every two players
+            extra = players - free
+            matches += (extra + 1) // 2
+            free = extra % 2
+        else:
+            free -= players
+        return load._replace(matches=matches, open=free, spectators=load.spectators + spectators)
+
+    #the worker for a new connection and whether it joins as a spectator there, None if every worker has gone
+    def place(self, spectator: bool) -> tuple[int, bool] | None:
+        alive = [index for index, link in enumerate(self.links) if link is not None]
+        if not alive:
+            return None
+        loads = {index: self.expected(index) for index in alive}
+        if not spectator:
+            waiting = [index for index in alive if loads[index].open]
+            if waiting:
+                return waiting[0], False
+            if not self.max_matches or sum(load.matches for load in loads.values()) < self.max_matches:
+                return min(alive, key=lambda index: loads[index].matches), False
+        #spectators go where running matches have the smallest audiences
+        watched = [index for index in alive if loads[index].started] or alive
+        return min(watched, key=lambda index: loads[index].spectators / max(1, loads[index].started)), True
+
+    #passes an accepted connection to a worker, closing it if there is none left
+    def hand_off(self, sock: socket.socket, spectator: bool) -> None:
+        while True:
+            placed = self.place(spectator)
+            if placed is None:
+                print("No workers left to take the connection")
+                break
+            index, as_spectator = placed
+            try:
+                socket.send_fds(self.links[index], [b"s" if as_spectator else b"p"], [sock.fileno()])
+            except OSError:
+                print(f"Worker {index + 1} has gone")
+                self.links[index] = None
+                continue
+            if as_spectator:
+                self.spectators_sent[index] += 1
+            else:
+                self.players_sent[index] += 1
+            break
+        #the worker has its own copy of the descriptor now
+        sock.close()
+
+    #a connection a worker passed back to resume a session: on to the worker that has the session's match
+    def route(self, index: int, link: socket.socket, selector: selectors.BaseSelector) -> None:
+        try:
+            msg, fds, _, _ = socket.recv_fds(link, 256, 1)
+        except OSError:
+            msg, fds = b"", []
+        if not msg or self.links[index] is None:
+            if self.links[index] is not None:
+                print(f"Worker {index + 1} has gone")
+            selector.unregister(link)
+            self.links[index] = None
+            for fd in fds:
+                socket.socket(fileno=fd).close()
+            return
+        for fd in fds:
+            sock = socket.socket(fileno=fd)
+            owner = session_worker(msg[1:].decode(errors="replace"), len(self.links))
+            if owner is not None and self.links[owner] is not None:
+                try:
+                    socket.send_fds(self.links[owner], [msg], [fd])
+                except OSError:
+                    pass
+            sock.close()
+
+    #accepts on every listener (data is whether it only takes spectators) and routes resumed connections
+    #between workers (data is the worker's index) until every worker has gone
+    def run(self, listeners: list) -> None:
+        selector = selectors.DefaultSelector()
+        for server, spectator in listeners:
+            selector.register(server, selectors.EVENT_READ, spectator)
+        for index, link in enumerate(self.links):
+            selector.register(link, selectors.EVENT_READ, index)
+        while any(link is not None for link in self.links):
+            for key, _ in selector.select():
+                if isinstance(key.data, bool):
+                    for sock, _ in accept_batch(key.fileobj):
+                        self.hand_off(sock, key.data)
+                else:
+                    self.route(key.data, key.fileobj, selector)
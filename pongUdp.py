@@ -0,0 +1,168 @@
+# =================================================================================================
+# Contributing Authors:	    <Ryan Goin, James Parker, Nathan Rink >
+# Email Addresses:          <Ryan.Goin@uky.edu, James.Parker@uky.edu, Nathan.Rink@uky.edu>
+# Date:                     11/26/2025
+# Purpose:                  Optional UDP channel for the updates that replace themselves every tick.  On
+#                           TCP one lost segment holds up every update behind it until it is resent; over
+#                           UDP a lost state is simply replaced by the next one.  Everything that must
+#                           arrive (CONFIG, WELCOME, GAME_OVER, RESET, PLAY_AGAIN, paddle INPUT) stays on
+#                           the TCP connection.
+# Misc:                     A client asks for it with "udp=1" in HELLO and gets "udp=<token>" back in
+#                           WELCOME.  Every datagram is that token followed by one binary frame, and sync
+#                           is the sequence number that stale or reordered datagrams are dropped by.
+# =================================================================================================
+
+import heapq
+import random
+import secrets
+import socket
+import struct
+import threading
+import time
+
+from pongMetrics import METRICS
+from pongProtocol import HEADER, MSG_STATE, MSG_UDP_HELLO, MSG_UPDATE, decode_frame
+
+TOKEN = struct.Struct("!I")
+#a sync this far below the newest one seen is a new game rather than a late datagram
+SEQUENCE_WINDOW = 60
+#how often a client repeats its UDP_HELLO so the server keeps its address (and NATs keep the mapping)
+KEEPALIVE_INTERVAL = 1.0
+#frame types that are allowed to arrive over UDP, in each direction
+SERVER_FRAMES = (MSG_STATE,)
+CLIENT_FRAMES = (MSG_UPDATE, MSG_UDP_HELLO)
+
+#the token the server handed out followed by one frame
+def pack_datagram(token: int, frame: bytes) -> bytes:
+    return TOKEN.pack(token) + frame
+
+#splits a datagram into its token and fields, the fields are None unless it holds exactly one frame of
+#one of the allowed types
+def unpack_datagram(data: bytes, allowed: tuple) -> tuple[int | None, list | None]:
+    if len(data) < TOKEN.size + HEADER.size:
+        return None, None
+    (token,) = TOKEN.unpack_from(data)
+    length, msg_type = HEADER.unpack_from(data, TOKEN.size)
+    payload = data[TOKEN.size + HEADER.size:]
+    if msg_type not in allowed or len(payload) != length:
+        return token, None
+    if msg_type == MSG_UDP_HELLO:
+        return token, ["UDP_HELLO"]
+    return token, decode_frame(msg_type, payload)
+
+#drops updates older than the newest one already taken, using the sync they carry as a sequence number
+#updates with the same sync are kept (the other player's paddle can move within one tick of the ball)
+class SequenceFilter:
+    def __init__(self, window: int = SEQUENCE_WINDOW) -> None:
+        self.window = window
+        self.last = None
+
+    def accept(self, sync: int) -> bool:
+        if self.last is not None and sync < self.last and self.last - sync < self.window:
+            return False
+        self.last = sync
+        return True
+
+#sends datagrams through a socket, throwing away a share of them and delaying the rest to try the UDP
+#channel out over loopback.  Each delayed datagram waits latency plus a random extra of up to half of it, so
+#they also arrive out of order.  With no loss or latency it just sends.
+class LossyLink:
+    def __init__(self, sock: socket.socket, loss: float = 0.0, latency: float = 0.0) -> None:
+        self.sock = sock
+        self.loss = loss
+        self.latency = latency
+        self.delayed = []
+        self.count = 0
+        self.ready = threading.Condition()
+        if latency:
+            threading.Thread(target=self._deliver, daemon=True).start()
+
+    def sendto(self, data: bytes, addr) -> None:
+        if self.loss and random.random() < self.loss:
+            return
+        if not self.latency:
+            self._send(data, addr)
+            return
+        due = time.monotonic() + self.latency * (1 + random.random() / 2)
+        with self.ready:
+            self.count += 1
+            heapq.heappush(self.delayed, (due, self.count, data, addr))
+            self.ready.notify()
+
+    def _send(self, data: bytes, addr) -> None:
+        try:
+            if addr is None:
+                self.sock.send(data)
+            else:
+                self.sock.sendto(data, addr)
+        except OSError:
+            #a full socket buffer or an unreachable peer loses the datagram, like the network would
+            pass
+
+    def _deliver(self) -> None:
+        while True:
+            with self.ready:
+                while not self.delayed or self.delayed[0][0] > time.monotonic():
+                    self.ready.wait(self.delayed[0][0] - time.monotonic() if self.delayed else None)
+                _, _, data, addr = heapq.heappop(self.delayed)
+            self._send(data, addr)
+
+#the server's UDP socket, bound to the same port number as its TCP listener
+#a connection that asked for UDP gets a token, and the address datagrams with that token come from is where
+#its states are sent from then on
+class UdpChannel:
+    def __init__(self, host: str, port: int, loss: float = 0.0, latency: float = 0.0) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.link = LossyLink(self.sock, loss, latency)
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    #gives a connection a token and the attributes the channel uses
+    def register(self, conn) -> int:
+        if conn.udp is self:
+            return conn.token
+        with self.lock:
+            token = secrets.randbits(32)
+            while token in self.connections:
+                token = secrets.randbits(32)
+            self.connections[token] = conn
+        conn.udp = self
+        conn.token = token
+        conn.udp_addr = None
+        conn.udp_sequence = SequenceFilter()
+        return token
+
+    def forget(self, conn) -> None:
+        with self.lock:
+            if self.connections.get(conn.token) is conn:
+                del self.connections[conn.token]
+
+    #sends one binary frame to a connection whose address is known
+    def send(self, conn, frame: bytes) -> None:
+        datagram = pack_datagram(conn.token, frame)
+        METRICS.udp_bytes_out.inc(len(datagram))
+        self.link.sendto(datagram, conn.udp_addr)
+
+    #reads up to limit datagrams, stopping early once none are waiting (the socket is non-blocking in event
+    #loop mode).  Returns the (connection, parts) messages in them that need handling; a datagram with a known
+    #token also updates where that connection's states go.
+    def receive(self, limit: int = 1) -> list:
+        received = []
+        for _ in range(limit):
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            METRICS.udp_bytes_in.inc(len(data))
+            token, parts = unpack_datagram(data, CLIENT_FRAMES)
+            with self.lock:
+                conn = self.connections.get(token)
+            if conn is None or parts is None:
+                continue
+            conn.udp_addr = addr
+            if parts[0] != "UDP_HELLO" and conn.udp_sequence.accept(parts[-1]):
+                received.append((conn, parts))
+        return received